@@ -1,4 +1,6 @@
-from typing import Union, List, Dict, Iterable, Callable
+from collections import OrderedDict
+from datetime import datetime
+from typing import Union, List, Dict, Iterable, Callable, Set
 
 from drepr import DRepr
 from drepr.models import SemanticModel
@@ -21,38 +23,111 @@ class ShardedClassID(str):
 
 
 class ShardedBackend(BaseOutputSM):
-    def __init__(self, n_chunks: int):
+    def __init__(self, n_chunks: int, max_loaded: int = None):
+        """
+        :param n_chunks: number of shards
+        :param max_loaded: maximum number of lazily loaded shards (LazyLoadBackend) kept in memory, the least recently
+            used ones are unloaded beyond it and reloaded when they are accessed again. All shards are kept if None
+        """
+        assert max_loaded is None or max_loaded >= 1, "max_loaded must be at least 1"
         # list of datasets in the reverse order
         self.n_chunks = n_chunks
         self.datasets: List[BaseOutputSM] = [None] * n_chunks
+        # metadata of the shards (in the order they are added) to skip them without loading them, see `match`
+        self.metadata: List[dict] = [None] * n_chunks
         self.count = 0
+        self.max_loaded = max_loaded
+        # indices of the loaded lazy shards, from the least to the most recently used
+        self.loaded: Dict[int, None] = OrderedDict()
+        # indices of the shards whose classes are returned by `c`, which are never unloaded as they are still referenced
+        self.pinned: Set[int] = set()
 
     @classmethod
     def from_drepr(cls, ds_model: Union[DRepr, str], resources: Union[str, Dict[str, str]], inject_class_id: Callable[[str], str] = None) -> BaseOutputSM:
         raise NotImplementedError("This method should never be called")
 
-    def add(self, dataset):
+    def add(self, dataset, metadata: dict = None):
+        """
+        :param metadata: what is known about the shard without loading it: `start_time` and `end_time` (datetime) of
+            its data, and `variables` (set of standard names) it contains
+        """
         self.datasets[self.n_chunks - self.count - 1] = dataset
+        self.metadata[self.count] = metadata or {}
         self.count += 1
 
     def inject_class_id(self, class_id: str) -> ShardedClassID:
         return ShardedClassID(self.count, class_id)
 
+    def shard(self, idx: int) -> BaseOutputSM:
+        """
+        Get a shard by its index (in the order shards are added). Lazy shards are tracked as loaded, and the least
+        recently used ones are unloaded if more than max_loaded of them are loaded (unless they are pinned)
+        """
+        dataset = self.datasets[self.n_chunks - idx - 1]
+        if isinstance(dataset, LazyLoadBackend) and idx not in self.pinned:
+            self.loaded[idx] = None
+            self.loaded.move_to_end(idx)
+            if self.max_loaded is not None:
+                while len(self.loaded) > self.max_loaded:
+                    lru_idx, _ = self.loaded.popitem(last=False)
+                    self.datasets[self.n_chunks - lru_idx - 1].unload()
+        return dataset
+
+    def match(self, idx: int, start_time: datetime = None, end_time: datetime = None,
+              variables: Iterable[str] = None) -> bool:
+        """
+        Check if a shard may have data in the time range [start_time, end_time] or of the variables, from its metadata.
+        Shards whose metadata is unknown always match
+        """
+        metadata = self.metadata[idx]
+        if start_time is not None and metadata.get('end_time') is not None and metadata['end_time'] < start_time:
+            return False
+        if end_time is not None and metadata.get('start_time') is not None and metadata['start_time'] > end_time:
+            return False
+        if variables is not None and metadata.get('variables') is not None and \
+                len(set(variables).intersection(metadata['variables'])) == 0:
+            return False
+        return True
+
+    def iter_shards(self, start_time: datetime = None, end_time: datetime = None,
+                    variables: Iterable[str] = None, reverse: bool = False) -> Iterable[BaseOutputSM]:
+        """
+        Iterate over the shards (in the order they are added, or the reverse order) which may have data in the time
+        range or of the variables, without loading the others. Iterating over the shards one by one keeps at most
+        max_loaded of them in memory
+        """
+        for idx in (reversed(range(self.count)) if reverse else range(self.count)):
+            if self.match(idx, start_time, end_time, variables):
+                yield self.shard(idx)
+
     def iter_classes(self) -> Iterable[BaseOutputClass]:
-        return (c for d in reversed(self.datasets) for c in d.iter_classes())
+        return (c for d in self.iter_shards() for c in d.iter_classes())
 
     def get_record_by_id(self, rid: RecordID) -> BaseRecord:
-        return self.datasets[rid.class_id.idx].get_record_by_id(rid)
+        return self.shard(rid.class_id.idx).get_record_by_id(rid)
+
+    def pin(self, idx: int) -> BaseOutputSM:
+        """
+        Get a shard by its index and keep it loaded for the lifetime of the backend, regardless of max_loaded
+        """
+        self.pinned.add(idx)
+        self.loaded.pop(idx, None)
+        return self.datasets[self.n_chunks - idx - 1]
 
     def c(self, class_uri: str) -> BaseLstOutputClass:
+        """
+        Get the classes of every shard. As the returned classes reference the data of the shards, all shards are loaded
+        and pinned: the memory is not bounded by max_loaded, use iter_shards to load the shards one by one instead
+        """
+        shards = [self.pin(idx) for idx in range(self.count)]
         if isinstance(self.datasets[0], ArrayBackend) or \
                 (isinstance(self.datasets[0], LazyLoadBackend) and self.datasets[0].backend == ArrayBackend):
-            return LstArrayClass([c for d in reversed(self.datasets) for c in d.c(class_uri).classes])
+            return LstArrayClass([c for d in shards for c in d.c(class_uri).classes])
         else:
-            return LstGraphClass([c for d in reversed(self.datasets) for c in d.c(class_uri).classes])
+            return LstGraphClass([c for d in shards for c in d.c(class_uri).classes])
 
     def cid(self, class_id: str) -> BaseOutputClass:
-        return self.datasets[class_id.idx].cid(class_id)
+        return self.shard(class_id.idx).cid(class_id)
 
     def get_sm(self) -> SemanticModel:
         return self.datasets[0].get_sm()
@@ -84,8 +159,17 @@ class LazyLoadBackend(BaseOutputSM):
         self.dataset = self.backend.from_drepr(self.drepr, self.load_fn(), self.inject_class_id)
         return self.dataset
 
+    def unload(self):
+        """
+        Release the loaded dataset and its resources, it is loaded again on its next access
+        """
+        if self.dataset is not None:
+            self.dataset = None
+            self.del_fn()
+
     def __del__(self):
-        self.del_fn()
+        # resources are only acquired when the dataset is loaded
+        self.unload()
 
     @classmethod
     def from_drepr(cls, ds_model: Union[DRepr, str], resources: Union[str, Dict[str, str]], inject_class_id: Callable[[str], str] = None) -> BaseOutputSM:
@@ -0,0 +1,122 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+import hashlib
+import logging
+import os
+import pickle
+from pathlib import Path
+from threading import Lock
+from typing import Any, List, Optional, Union
+from uuid import uuid4
+
+
+class ResultCache:
+    """
+    On-disk store of adapter results, addressed by a key derived from the adapter class, its inputs and the keys of its
+    wired inputs. When the total size of the store exceeds max_size, the least recently used results are evicted
+    """
+    logger = logging.getLogger(__name__)
+    extension = ".pkl"
+
+    def __init__(self, cache_dir: Union[str, Path], max_size: int = None):
+        self.cache_dir = Path(os.path.abspath(str(cache_dir)))
+        self.cache_dir.mkdir(exist_ok=True, parents=True)
+        self.max_size = max_size
+        self.lock = Lock()
+        self.size = sum(f.stat().st_size for f in self.cache_dir.glob(f"*{self.extension}"))
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = Lock()
+
+    @staticmethod
+    def key(name: str, values: Any) -> str:
+        return hashlib.sha256(f"{name}|{ResultCache.canonical(values)}".encode()).hexdigest()
+
+    @staticmethod
+    def canonical(value: Any) -> str:
+        # a representation of the value which doesn't depend on the order of the keys of dictionaries
+        if isinstance(value, dict):
+            items = sorted((ResultCache.canonical(k), ResultCache.canonical(v)) for k, v in value.items())
+            return "{" + ", ".join(f"{k}: {v}" for k, v in items) + "}"
+        if isinstance(value, (list, tuple)):
+            return "[" + ", ".join(ResultCache.canonical(v) for v in value) + "]"
+        return repr(value)
+
+    def path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}{self.extension}"
+
+    def get(self, key: str) -> Optional[List[dict]]:
+        path = self.path(key)
+        try:
+            with open(str(path), "rb") as f:
+                results = pickle.load(f)
+            # marking the result as recently used for eviction
+            os.utime(str(path))
+        except FileNotFoundError:
+            return None
+        except (pickle.UnpicklingError, EOFError, AttributeError, ImportError) as e:
+            self.logger.warning(f"Ignoring corrupted cached result {key}: {e}")
+            return None
+        self.logger.debug(f"Found cached result {key}")
+        return results
+
+    def put(self, key: str, results: List[dict]) -> bool:
+        try:
+            data = pickle.dumps(results, protocol=pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, TypeError, AttributeError) as e:
+            self.logger.warning(f"Cannot cache result {key} because it cannot be pickled: {e}")
+            return False
+        if self.max_size is not None and len(data) > self.max_size:
+            self.logger.warning(f"Cannot cache result {key} because it is larger than the cache")
+            return False
+
+        path = self.path(key)
+        # writing to a temporary file first, so that other processes never read a partially written result
+        tmp_path = self.cache_dir / f".{key}.{uuid4()}.tmp"
+        with open(str(tmp_path), "wb") as f:
+            f.write(data)
+        with self.lock:
+            if path.exists():
+                self.size -= path.stat().st_size
+            os.replace(str(tmp_path), str(path))
+            self.size += len(data)
+            self.evict()
+        return True
+
+    def delete(self, key: str) -> None:
+        path = self.path(key)
+        with self.lock:
+            try:
+                size = path.stat().st_size
+                path.unlink()
+            except FileNotFoundError:
+                return
+            self.size -= size
+
+    def evict(self):
+        if self.max_size is None or self.size <= self.max_size:
+            return
+        files = []
+        for path in self.cache_dir.glob(f"*{self.extension}"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        # the total size is recomputed as other processes may share the same cache directory
+        self.size = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files, key=lambda x: x[0]):
+            if self.size <= self.max_size:
+                break
+            self.logger.debug(f"Evicting cached result {path.stem}")
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            self.size -= size
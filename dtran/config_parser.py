@@ -9,6 +9,9 @@ from marshmallow import Schema, fields, validate, ValidationError, post_load
 from ruamel.yaml import YAML
 
 from dtran import Pipeline
+from dtran.cache import ResultCache
+from dtran.helpers import parse_size
+from dtran.pipeline import AdapterOptions, EXECUTOR_TYPES
 from dtran.ifunc import IFunc
 from dtran.wireio import WiredIOArg
 
@@ -25,6 +28,36 @@ class AdapterSchema(Schema):
     adapter = fields.Str(required=True)
     comment = fields.Str()
     inputs = OrderedDictField(keys=fields.Str(validate=validate.Regexp(keys_pattern)), values=fields.Raw(allow_none=True))
+    # overrides the pipeline's executor type for this adapter, null runs it in the event loop
+    executor = fields.Str(allow_none=True, validate=validate.OneOf(EXECUTOR_TYPES))
+    # overrides the pipeline's buffer_size for the wired inputs of this adapter
+    buffer_size = fields.Int(validate=validate.Range(min=1))
+    # number of wired inputs executed concurrently by separate instances of the adapter
+    parallelism = fields.Int(validate=validate.Range(min=1))
+    # emit results of concurrent executions in the order of their inputs (default) or in completion order
+    ordered = fields.Bool()
+    # store results of the adapter in the pipeline's cache, by default enabled unless the adapter is a writer, has no
+    # outputs or reads data which can change between runs
+    cache = fields.Bool()
+
+    class Meta:
+        ordered = True
+
+
+class ExecutorSchema(Schema):
+    # default executor type of every adapter, null runs adapters in the event loop
+    type = fields.Str(allow_none=True, validate=validate.OneOf(EXECUTOR_TYPES))
+    max_workers = fields.Int(allow_none=True, validate=validate.Range(min=1))
+
+    class Meta:
+        ordered = True
+
+
+class CacheSchema(Schema):
+    # directory of the result cache, which can be shared by several pipelines
+    dir = fields.Str(required=True)
+    # size limit of the cache, in bytes or with a unit (e.g. 10GB), least recently used results are evicted first
+    max_size = fields.Function(deserialize=lambda value: parse_size(value), allow_none=True)
 
     class Meta:
         ordered = True
@@ -49,6 +82,10 @@ class PipelineSchema(Schema):
     adapters = OrderedDictField(required=True, validate=validate.Length(min=1),
                                 keys=fields.Str(validate=validate.Regexp(keys_pattern)),
                                 values=fields.Nested(AdapterSchema()))
+    executor = fields.Nested(ExecutorSchema())
+    # number of outputs a producer can run ahead of the consumer of each wired input
+    buffer_size = fields.Int(validate=validate.Range(min=1))
+    cache = fields.Nested(CacheSchema())
 
     class Meta:
         ordered = True
@@ -111,9 +148,16 @@ class PipelineSchema(Schema):
         inputs = {}
         wired = []
         func_classes = []
+        options = []
+        executor = data.get('executor', {})
         # processing data and populating inputs
         for name, adapter in data['adapters'].items():
             func_classes.append(mappings[name][0])
+            options.append(AdapterOptions(executor=adapter.get('executor', executor.get('type')),
+                                          buffer_size=adapter.get('buffer_size', data.get('buffer_size', 1)),
+                                          parallelism=adapter.get('parallelism', 1),
+                                          ordered=adapter.get('ordered', True),
+                                          cache=adapter.get('cache')))
             if 'inputs' not in adapter:
                 continue
             for input, value in adapter['inputs'].items():
@@ -152,7 +196,8 @@ class PipelineSchema(Schema):
                             raise ValidationError([str(e), f"type casting failed in input {input} for {name}"])
                     inputs[WiredIOArg.get_arg_name(mappings[name][0].id, mappings[name][1], input)] = value
 
-        return Pipeline(func_classes, wired), inputs
+        cache = ResultCache(data['cache']['dir'], data['cache'].get('max_size')) if 'cache' in data else None
+        return Pipeline(func_classes, wired, options, executor.get('max_workers'), cache), inputs
 
 
 class ConfigParser:
@@ -1,10 +1,16 @@
+import hashlib
 import logging
 import os
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-from typing import List, Dict
+from pathlib import Path
+from threading import Lock
+from typing import List, Dict, Iterator
 
 import requests
+import ujson
+from requests.adapters import HTTPAdapter
 
 
 class StandardVariableForm:
@@ -20,36 +26,126 @@ class DCatAPI:
     logger_api_resp = logging.getLogger("dcat_api.handle_response")
 
     BATCH_SIZE = 200
+    # number of resources fetched per request
+    PAGE_SIZE = 1000
+    # number of resources fetched in one request if the data catalog doesn't support pagination
+    UNPAGINATED_LIMIT = 100000
 
-    def __init__(self, dcat_url: str):
+    def __init__(self, dcat_url: str, cache_dir: str = None, cache_ttl: float = 3600, max_retries: int = 3,
+                 timeout: float = 60):
+        """
+        :param cache_dir: directory where metadata of datasets is cached across processes, it is only cached in memory if
+            not given
+        :param cache_ttl: time (in seconds) metadata of datasets is cached
+        :param max_retries: number of times a query is retried (with exponential backoff) when it fails with a
+            connection error or a server error
+        :param timeout: time (in seconds) to wait for the data catalog to accept a connection or to send data, before a
+            request fails with a timeout
+        """
         self.dcat_url = dcat_url
         self.api_key = None
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(exist_ok=True, parents=True)
+        self.cache_ttl = cache_ttl
+        self.cache = {}
+        self.cache_lock = Lock()
+        self.max_retries = max_retries
+        self.timeout = timeout
+        # reusing connections across requests
+        self.session = requests.Session()
+        self.session.mount("http://", HTTPAdapter(pool_maxsize=16))
+        self.session.mount("https://", HTTPAdapter(pool_maxsize=16))
 
     @staticmethod
-    def get_instance():
+    def get_instance(dcat_url: str = None):
         if DCatAPI.instance is None:
-            DCatAPI.instance = DCatAPI(os.environ['DCAT_URL'])
+            DCatAPI.instance = DCatAPI(dcat_url or os.environ['DCAT_URL'], os.environ.get('DCAT_CACHE_DIR'),
+                                       float(os.environ.get('DCAT_CACHE_TTL', 3600)),
+                                       timeout=float(os.environ.get('DCAT_TIMEOUT', 60)))
         return DCatAPI.instance
 
-    def delete_datasets(self, provenance_id, dataset_ids):
+    def query(self, endpoint: str, query: dict) -> requests.Response:
+        """
+        Send a read-only query to the data catalog, retrying it with exponential backoff on connection errors and
+        server errors
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                resp = self.session.post(
+                    f"{self.dcat_url}/{endpoint}",
+                    headers={"Content-Type": "application/json", "X-Api-Key": self.get_api_key()},
+                    json=query,
+                    timeout=self.timeout,
+                )
+                if resp.status_code < 500 or attempt == self.max_retries:
+                    return resp
+                self.logger.warning(f"Query {endpoint} failed with status {resp.status_code}, retrying it")
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == self.max_retries:
+                    raise
+                self.logger.warning(f"Query {endpoint} failed ({e}), retrying it")
+            time.sleep(0.5 * 2 ** attempt)
+
+    def cached_query(self, endpoint: str, query: dict):
+        """
+        Send a read-only query to the data catalog, whose response is cached in memory and in cache_dir for cache_ttl
+        seconds
+        """
+        key = hashlib.sha1(ujson.dumps([self.dcat_url, endpoint, query], sort_keys=True).encode()).hexdigest()
+        with self.cache_lock:
+            if key in self.cache and time.time() - self.cache[key][0] < self.cache_ttl:
+                return self.cache[key][1]
+
+        path = self.cache_dir / f"{key}.json" if self.cache_dir is not None else None
+        if path is not None and path.exists() and time.time() - path.stat().st_mtime < self.cache_ttl:
+            try:
+                with open(str(path), "r") as f:
+                    value = ujson.load(f)
+                with self.cache_lock:
+                    self.cache[key] = (path.stat().st_mtime, value)
+                return value
+            except (ValueError, OSError):
+                # the file is being written by another process
+                pass
+
+        resp = self.query(endpoint, query)
+        assert resp.status_code == 200, resp.text
+        value = resp.json()
+        with self.cache_lock:
+            self.cache[key] = (time.time(), value)
+        if path is not None:
+            # writing to a temporary file first, so that other processes never read a partially written file
+            tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+            with open(str(tmp_path), "w") as f:
+                ujson.dump(value, f)
+            os.replace(str(tmp_path), str(path))
+        return value
+
+    def delete_datasets(self, provenance_id, dataset_ids, n_workers: int = 8):
+        """
+        Delete datasets concurrently (the data catalog deletes one dataset per request)
+        :return: ids of the deleted datasets
+        """
         request_headers = {"Content-Type": "application/json", "X-Api-Key": self.get_api_key()}
 
-        deleted_ids = []
-        # Walking through each resource in dataset_obj
-        for resource_id in dataset_ids:
-            resource_defs = {
-                "provenance_id": provenance_id,
-                "dataset_id": resource_id,
-            }
-
-            resp = requests.post(
-                f"{self.dcat_url}/datasets/delete_dataset", headers=request_headers, json=resource_defs
+        def delete(dataset_id):
+            resp = self.session.post(
+                f"{self.dcat_url}/datasets/delete_dataset", headers=request_headers,
+                json={"provenance_id": provenance_id, "dataset_id": dataset_id}, timeout=self.timeout
             )
-
             parsed_response = DCatAPI.handle_api_response(resp)
+            print(f"{dataset_id}: {parsed_response}")
+            return dataset_id
 
-            print(f"{resource_id}: {parsed_response}")
-
+        deleted_ids = []
+        with ThreadPoolExecutor(max_workers=n_workers) as pool:
+            futures = [pool.submit(delete, dataset_id) for dataset_id in dataset_ids]
+            for future in as_completed(futures):
+                try:
+                    deleted_ids.append(future.result())
+                except Exception as e:
+                    self.logger.error(f"Cannot delete dataset: {e}")
         return deleted_ids
 
     def find_resources_by_dataset_id(
@@ -60,13 +156,28 @@ class DCatAPI:
             limit: int = 100000,
     ):
         """start_time and end_time is inclusive"""
-        request_headers = {
-            "Content-Type": "application/json",
-            "X-Api-Key": self.get_api_key(),
-        }
+        resources = []
+        for resource in self.iter_resources_by_dataset_id(dataset_id, start_time, end_time):
+            if len(resources) >= limit:
+                break
+            resources.append(resource)
+        return resources
+
+    def iter_resources_by_dataset_id(
+            self,
+            dataset_id: str,
+            start_time: datetime = None,
+            end_time: datetime = None,
+            page_size: int = None,
+    ) -> Iterator[dict]:
+        """
+        Iterate over resources of a dataset, which are fetched page by page as they are consumed.
+        start_time and end_time is inclusive
+        """
+        page_size = page_size or self.PAGE_SIZE
         query = {
             "dataset_id": dataset_id,
-            "limit": limit,
+            "limit": page_size,
         }
         if start_time is not None or end_time is not None:
             query["filter"] = {}
@@ -75,43 +186,38 @@ class DCatAPI:
             if end_time is not None:
                 query["filter"]["end_time__lte"] = end_time.isoformat()
 
-        resp = requests.post(
-            f"{self.dcat_url}/datasets/dataset_resources",
-            headers=request_headers,
-            json=query,
-        )
-        assert resp.status_code == 200, resp.text
-        return resp.json()["resources"]
+        offset = 0
+        first_ids = set()
+        while True:
+            resp = self.query("datasets/dataset_resources", {**query, "offset": offset})
+            assert resp.status_code == 200, resp.text
+            resources = resp.json()["resources"]
+            if len(resources) > 0:
+                if resources[0]["resource_id"] in first_ids:
+                    # the server ignores the offset and returns the same page again, so all resources are fetched in
+                    # one request instead, skipping those which are already yielded
+                    self.logger.warning("The data catalog doesn't support pagination of resources, fetching them in "
+                                        "one request")
+                    resp = self.query("datasets/dataset_resources", {**query, "limit": self.UNPAGINATED_LIMIT})
+                    assert resp.status_code == 200, resp.text
+                    yield from resp.json()["resources"][offset:]
+                    return
+                first_ids.add(resources[0]["resource_id"])
+            yield from resources
+            if len(resources) < page_size:
+                return
+            offset += len(resources)
 
     def find_dataset_by_id(self, dataset_id):
-        request_headers = {
-            "Content-Type": "application/json",
-            "X-Api-Key": self.get_api_key(),
-        }
-        resp = requests.post(
-            f"{self.dcat_url}/datasets/get_dataset_info",
-            headers=request_headers,
-            json={"dataset_id": dataset_id},
-        )
-        assert resp.status_code == 200, resp.text
-        return resp.json()
+        return self.cached_query("datasets/get_dataset_info", {"dataset_id": dataset_id})
 
     def find_standard_variables_by_dataset_id(self, dataset_id):
-        request_headers = {
-            "Content-Type": "application/json",
-            "X-Api-Key": self.get_api_key(),
-        }
-        resp = requests.post(
-            f"{self.dcat_url}/datasets/dataset_standard_variables",
-            headers=request_headers,
-            json={"dataset_id": dataset_id},
-        )
-        assert resp.status_code == 200, resp.text
-        return resp.json()['dataset']['standard_variables']
+        return self.cached_query(
+            "datasets/dataset_standard_variables", {"dataset_id": dataset_id})['dataset']['standard_variables']
 
     def update_dataset_metadata(self, provenance_id, dataset_id, metadata):
         request_headers = {"Content-Type": "application/json", "X-Api-Key": self.get_api_key()}
-        resp = requests.post(
+        resp = self.session.post(
             f"{self.dcat_url}/datasets/update_dataset",
             headers=request_headers,
             json={
@@ -119,6 +225,7 @@ class DCatAPI:
                 "provenance_id": provenance_id,
                 "metadata": metadata
             },
+            timeout=self.timeout,
         )
         assert resp.status_code == 200, resp.text
         parsed_response = DCatAPI.handle_api_response(resp)
@@ -134,9 +241,15 @@ class DCatAPI:
         record_id=None,
         dataset_metadata=None,
     ):
-        request_headers = {"Content-Type": "application/json", "X-Api-Key": self.get_api_key()}
+        dataset = self.register_dataset(provenance_id, name, description, dataset_metadata, record_id)
+        variables = self.register_dataset_variables(dataset["record_id"], variables)
+        resources = self.register_resources(
+            provenance_id, dataset["record_id"], [v["record_id"] for v in variables], resources_metadata)
+        return dataset, resources, variables
 
-        # TODO: register a dataset
+    def register_dataset(self, provenance_id: str, name: str, description: str, dataset_metadata: dict = None,
+                         record_id: str = None) -> dict:
+        request_headers = {"Content-Type": "application/json", "X-Api-Key": self.get_api_key()}
         dataset = {
             "provenance_id": provenance_id,
             "name": name,
@@ -145,24 +258,27 @@ class DCatAPI:
         }
         if record_id is not None:
             dataset["record_id"] = record_id
-        resp = requests.post(
+        resp = self.session.post(
             f"{self.dcat_url}/datasets/register_datasets",
             headers=request_headers,
             json={"datasets": [dataset]},
+            timeout=self.timeout,
         )
 
         parsed_response = DCatAPI.handle_api_response(resp)
         dataset["record_id"] = parsed_response["datasets"][0]["record_id"]
         self.logger.debug("register dataset: %s", dataset)
+        return dataset
 
-        # TODO: register all variables
-        resp = requests.post(
+    def register_dataset_variables(self, dataset_id: str, variables: List[Dict[str, str]]) -> List[dict]:
+        request_headers = {"Content-Type": "application/json", "X-Api-Key": self.get_api_key()}
+        resp = self.session.post(
             f"{self.dcat_url}/datasets/register_variables",
             headers=request_headers,
             json={
                 "variables": [
                     {
-                        "dataset_id": dataset["record_id"],
+                        "dataset_id": dataset_id,
                         "name": var["name"],
                         "metadata": var["metadata"],
                         "standard_variable_ids": var["standard_name_id"],
@@ -170,52 +286,43 @@ class DCatAPI:
                     for var in variables
                 ]
             },
+            timeout=self.timeout,
         )
         variables = DCatAPI.handle_api_response(resp)["variables"]
         self.logger.debug("register variables: %s", variables)
+        return variables
 
-        # Register resources
-        num_resources = len(resources_metadata)
-        num_steps = num_resources // self.BATCH_SIZE + 1
-        variable_records_ids = [v["record_id"] for v in variables]
-
-        for step in range(num_steps):
-            start_idx = step * self.BATCH_SIZE
-            if (step + 1) * self.BATCH_SIZE > num_resources:
-                last_idx = num_resources
-            else:
-                last_idx = (step + 1) * self.BATCH_SIZE
-            resources = resources_metadata[start_idx:last_idx]
-
-            # TODO: register all resources
-            resource_defs = {"resources": []}
-            # Walking through each resource in dataset_obj
-            for resource in resources:
-                resource_defs["resources"].append(
+    def register_resources(self, provenance_id: str, dataset_id: str, variable_ids: List[str],
+                           resources_metadata: List[Dict]) -> List[dict]:
+        """
+        Register resources of a dataset in bulk, BATCH_SIZE resources per request
+        :param resources_metadata: name, resource_type, data_url and metadata of every resource
+        """
+        request_headers = {"Content-Type": "application/json", "X-Api-Key": self.get_api_key()}
+        resources = []
+        for start_idx in range(0, len(resources_metadata), self.BATCH_SIZE):
+            resource_defs = {
+                "resources": [
                     {
                         "provenance_id": provenance_id,
-                        "dataset_id": dataset["record_id"],
-                        "variable_ids": variable_records_ids,
+                        "dataset_id": dataset_id,
+                        "variable_ids": variable_ids,
                         "name": resource["name"],
                         "resource_type": resource["resource_type"],
                         "data_url": resource["data_url"],
                         "metadata": resource["metadata"],
                     }
-                )
-
-            # self.logger.debug(f"register resources index {start_idx} to {last_idx - 1} ")
-            print(f"register resources index {start_idx} to {last_idx - 1} ")
-
-            # ... and register them in bulk
-            resp = requests.post(
-                f"{self.dcat_url}/datasets/register_resources", headers=request_headers, json=resource_defs
+                    for resource in resources_metadata[start_idx:start_idx + self.BATCH_SIZE]
+                ]
+            }
+            self.logger.debug(f"register resources index {start_idx} to "
+                              f"{start_idx + len(resource_defs['resources']) - 1}")
+            resp = self.session.post(
+                f"{self.dcat_url}/datasets/register_resources", headers=request_headers, json=resource_defs,
+                timeout=self.timeout
             )
-
-            parsed_response = DCatAPI.handle_api_response(resp)
-            resources = parsed_response["resources"]
-            print(f"Registered dataset_id is: {resources[0]['dataset_id']}")
-
-        return dataset, resources, variables
+            resources.extend(DCatAPI.handle_api_response(resp)["resources"])
+        return resources
 
     def register_special_variables(
         self, variable_data: List
@@ -250,10 +357,11 @@ class DCatAPI:
         """
         DCatAPI.logger.debug("register variables: %s", variable_forms)
         request_headers = {"Content-Type": "application/json", "X-Api-Key": self.get_api_key()}
-        resp = requests.post(
+        resp = self.session.post(
             f"{self.dcat_url}/knowledge_graph/register_standard_variables",
             headers=request_headers,
             json={"standard_variables": [var.__dict__ for var in variable_forms]},
+            timeout=self.timeout,
         )
 
         parsed_resp = self.handle_api_response(resp)
@@ -271,7 +379,7 @@ class DCatAPI:
         """
         if self.api_key is None or time.time() - self.api_key["time"] > 600:
             # Obtaining the API Key which allows us to make posts
-            resp = requests.get(f"{self.dcat_url}/get_session_token").json()
+            resp = self.session.get(f"{self.dcat_url}/get_session_token", timeout=self.timeout).json()
             self.api_key = {"key": resp["X-Api-Key"], "time": time.time()}
         return self.api_key["key"]
 
@@ -0,0 +1,133 @@
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from threading import Lock
+from typing import List, Dict, Union, Tuple, Optional
+
+import requests
+import ujson
+from requests.adapters import HTTPAdapter
+
+from dtran.dcat.api import DCatAPI
+
+
+class Publisher:
+    """
+    Publishes many files as the resources of a dataset of the data catalog: files are uploaded concurrently, and then
+    registered in batches of DCatAPI.BATCH_SIZE. The progress is saved in a manifest file (uploaded urls, registered
+    dataset, variables and resources), so that an interrupted publication continues where it stopped
+    """
+    logger = logging.getLogger(__name__)
+    # minimum time (in seconds) between two saves of the manifest while files are uploaded
+    save_interval = 1.0
+
+    def __init__(self, dcat: DCatAPI, upload_url: str, auth: Optional[Tuple[str, str]] = None, n_workers: int = 8):
+        self.dcat = dcat
+        self.upload_url = upload_url.rstrip("/")
+        self.n_workers = n_workers
+        self.session = requests.Session()
+        self.session.auth = auth
+        self.session.mount("http://", HTTPAdapter(pool_maxsize=n_workers))
+        self.session.mount("https://", HTTPAdapter(pool_maxsize=n_workers))
+
+    def upload(self, path: Union[str, Path]) -> str:
+        """
+        Upload a file to the upload server, returning its url
+        """
+        path = Path(path)
+        with open(str(path), "rb") as f:
+            resp = self.session.put(f"{self.upload_url}/{path.name}", data=f, timeout=self.dcat.timeout)
+        resp.raise_for_status()
+        if "https://" in resp.text:
+            # the upload server replies with the url of the file
+            return f'https://{resp.text.split("https://")[-1].strip()}'
+        if "Location" in resp.headers:
+            return resp.headers["Location"]
+        raise Exception(f"Cannot find the url of the uploaded file {path} in the response: {resp.text}")
+
+    def upload_files(self, files: List[Union[str, Path]], manifest: dict, manifest_path: Union[str, Path]):
+        uploaded = manifest["uploaded"]
+        files = [Path(file) for file in files if Path(file).name not in uploaded]
+        if len(files) == 0:
+            return
+        self.logger.info(f"Uploading {len(files)} files ({len(uploaded)} already uploaded)")
+        lock = Lock()
+        last_save = time.time()
+        with ThreadPoolExecutor(max_workers=self.n_workers) as pool:
+            futures = {pool.submit(self.upload, file): file for file in files}
+            try:
+                for future in as_completed(futures):
+                    url = future.result()
+                    with lock:
+                        uploaded[futures[future].name] = url
+                        if time.time() - last_save > self.save_interval:
+                            self.save_manifest(manifest, manifest_path)
+                            last_save = time.time()
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+            finally:
+                # keeping the uploads which have completed, even if some failed
+                for future, file in futures.items():
+                    if future.done() and not future.cancelled() and future.exception() is None:
+                        uploaded[file.name] = future.result()
+                self.save_manifest(manifest, manifest_path)
+
+    def publish(self, provenance_id: str, name: str, description: str, files: List[Union[str, Path]],
+                manifest_path: Union[str, Path], resource_type: str, variable_data: dict = None,
+                dataset_metadata: dict = None, resource_metadata: Dict[str, dict] = None) -> dict:
+        """
+        Upload files and register them as the resources of a new dataset. If the manifest file exists, the publication
+        it records is continued: only the files which are not uploaded or registered yet are
+        :param resource_metadata: metadata of the resources by file name
+        :return: the manifest
+        """
+        manifest = self.load_manifest(manifest_path)
+        self.upload_files(files, manifest, manifest_path)
+
+        if manifest["dataset"] is None:
+            manifest["dataset"] = self.dcat.register_dataset(provenance_id, name, description, dataset_metadata)
+            self.save_manifest(manifest, manifest_path)
+        dataset_id = manifest["dataset"]["record_id"]
+
+        if manifest["variables"] is None:
+            variables = self.dcat.register_special_variables(variable_data or {})
+            manifest["variables"] = self.dcat.register_dataset_variables(dataset_id, variables)
+            self.save_manifest(manifest, manifest_path)
+        variable_ids = [variable["record_id"] for variable in manifest["variables"]]
+
+        registered = set(manifest["registered"])
+        names = [Path(file).name for file in files if Path(file).name not in registered]
+        for i in range(0, len(names), self.dcat.BATCH_SIZE):
+            batch = names[i:i + self.dcat.BATCH_SIZE]
+            self.dcat.register_resources(provenance_id, dataset_id, variable_ids, [
+                {
+                    "name": file_name,
+                    "resource_type": resource_type,
+                    "data_url": manifest["uploaded"][file_name],
+                    "metadata": (resource_metadata or {}).get(file_name, {}),
+                }
+                for file_name in batch
+            ])
+            manifest["registered"].extend(batch)
+            self.save_manifest(manifest, manifest_path)
+            self.logger.info(f"Registered {len(manifest['registered'])}/{len(files)} resources")
+        return manifest
+
+    @staticmethod
+    def load_manifest(manifest_path: Union[str, Path]) -> dict:
+        if Path(manifest_path).exists():
+            with open(str(manifest_path), "r") as f:
+                return ujson.load(f)
+        return {"uploaded": {}, "dataset": None, "variables": None, "registered": []}
+
+    @staticmethod
+    def save_manifest(manifest: dict, manifest_path: Union[str, Path]):
+        # writing to a temporary file first, so that the manifest is never partially written
+        tmp_path = f"{manifest_path}.tmp"
+        with open(tmp_path, "w") as f:
+            ujson.dump(manifest, f, indent=4, escape_forward_slashes=False)
+        os.replace(tmp_path, str(manifest_path))
@@ -1,6 +1,9 @@
 from dtran.dcat.api import DCatAPI
+from dtran.dcat.publisher import Publisher
 import click
+import glob
 import json
+import os
 
 PROVENANCE_ID = "b3e79dc2-8fa1-4203-ac82-b5267925191f"
 
@@ -74,6 +77,64 @@ def register_dataset(name, description, metadata_path, resource_path, variable_p
     print(f"variables is {variables}")
 
 
+@cli.command(name="publish_dataset", context_settings=dict(
+    ignore_unknown_options=True,
+    allow_extra_args=False,
+))
+@click.option("--dir", help="directory of files to be uploaded", default=".")
+@click.option("--ext", help="file extension of files to be uploaded", default="zip")
+@click.option("--manifest_path", help="manifest of the publication, it is resumed if the file exists",
+              default="publish_manifest.json")
+@click.option("--name", help="DCAT dataset name", default="test-dataset")
+@click.option("--description", help="DCAT dataset description", default="test-description")
+@click.option("--metadata_path", help="DCAT dataset metadata file path", default=None)
+@click.option("--resource_type", help="DCAT dataset resource type", default="zip")
+@click.option("--variable_path", help="DCAT dataset variable json path", default=None)
+@click.option("--upload_url", help="url of the upload server", default="https://publisher.mint.isi.edu")
+@click.option("--dcat_url", help="url of the data catalog", default="https://api.mint-data-catalog.org")
+@click.option("--workers", help="number of concurrent uploads", default=8)
+def publish_dataset(dir, ext, manifest_path, name, description, metadata_path, resource_type, variable_path,
+                    upload_url, dcat_url, workers):
+    """
+    Uploads files concurrently and registers them as resources of a new DCAT dataset. The credentials of the upload
+    server are read from MINT_UPLOAD_USER and MINT_UPLOAD_PASSWORD. Run the same command again to resume an interrupted
+    publication.
+    Example: PYTHONPATH=$(pwd):$(pwd):$PYTHONPATH python dtran/dcat/scripts/register_datasets.py publish_dataset
+    --dir=./data --ext=zip --variable_path=variables.json
+    """
+    dcat = DCatAPI.get_instance(dcat_url)
+
+    if metadata_path is None:
+        metadata = {}
+    else:
+        with open(metadata_path, "r") as f:
+            metadata = json.load(f)
+
+    if variable_path is None:
+        variable_data = {}
+    else:
+        with open(variable_path, "r") as f:
+            variable_data = json.load(f)
+
+    auth = None
+    if "MINT_UPLOAD_USER" in os.environ:
+        auth = (os.environ["MINT_UPLOAD_USER"], os.environ.get("MINT_UPLOAD_PASSWORD", ""))
+
+    publisher = Publisher(dcat, upload_url, auth, n_workers=workers)
+    manifest = publisher.publish(
+        PROVENANCE_ID,
+        name,
+        description,
+        sorted(glob.glob(f"{dir}/*.{ext}")),
+        manifest_path,
+        resource_type.lower(),
+        variable_data=variable_data,
+        dataset_metadata=metadata,
+    )
+    print(f"dataset is {manifest['dataset']}")
+    print(f"registered {len(manifest['registered'])} resources")
+
+
 @cli.command(name="delete_dataset", context_settings=dict(
     ignore_unknown_options=True,
     allow_extra_args=False,
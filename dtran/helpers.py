@@ -1,5 +1,7 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
+from datetime import datetime, timezone
+from typing import Union
 
 
 # noinspection PyPep8Naming
@@ -9,3 +11,36 @@ class classproperty(object):
 
     def __get__(self, obj, owner):
         return self.f(owner)
+
+
+UNITS_MAPPING = {
+    'PB': 1 << 50,
+    'TB': 1 << 40,
+    'GB': 1 << 30,
+    'MB': 1 << 20,
+    'KB': 1 << 10,
+    'B': 1
+}
+
+
+def parse_size(size: Union[int, float, str]) -> int:
+    """
+    Convert a size such as 1024, "200MB" or "1.5 GB" to a number of bytes
+    """
+    if isinstance(size, (int, float)):
+        return int(size)
+    size = size.strip().upper()
+    for unit, multiplier in UNITS_MAPPING.items():
+        if size.endswith(unit):
+            return int(float(size[:-len(unit)].strip()) * multiplier)
+    return int(size)
+
+
+def to_utc(value: datetime) -> datetime:
+    """
+    Convert a datetime to UTC without a time zone, so that times with and without a time zone can be compared. Times
+    without a time zone are assumed to be UTC already
+    """
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.replace(tzinfo=None)
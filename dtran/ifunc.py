@@ -40,6 +40,9 @@ class IFunc(metaclass=IFuncIO):
     inputs: Dict[str, ArgType] = {}
     outputs: Dict[str, ArgType] = {}
     preferences: Dict[str, str] = {}
+    # whether the results of the adapter only depend on its inputs, results of adapters reading data which can change
+    # between runs (e.g. the data catalog) are only cached if the pipeline opts in
+    deterministic: bool = True
 
     @abc.abstractmethod
     def validate(self) -> bool:
@@ -57,6 +60,19 @@ class IFunc(metaclass=IFuncIO):
         """
         raise NotImplementedError()
 
+    @classmethod
+    def estimate(cls, inputs: Dict[str, any]) -> Optional[Dict[str, Union[int, float, str]]]:
+        """
+        Estimate the cost of executing the adapter without executing it, used to explain a pipeline before running it.
+        Only the inputs which are not wired are given. The estimation may contain:
+            results: number of results of each execution (for generator adapters)
+            resources: number of resources to read in all executions
+            download_bytes: number of bytes to download in all executions
+            cache_capacity: capacity (in bytes) of the cache that downloaded resources are stored into
+        :return: None if the adapter cannot estimate its cost
+        """
+        return None
+
     @staticmethod
     def filter_func(filter):
         if filter is None:
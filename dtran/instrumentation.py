@@ -0,0 +1,185 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+import logging
+import resource
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from threading import Lock, Thread
+from typing import Any, Callable, Dict, Tuple, Union
+
+import ujson
+
+
+@dataclass
+class AdapterStats:
+    # time from the start to the end of the adapter's task
+    wall_time: float = 0.0
+    # time spent executing the adapter (initialization included), excluding time blocked on its wired inputs/outputs
+    exec_time: float = 0.0
+    # CPU time of the threads/processes executing the adapter
+    cpu_time: float = 0.0
+    executions: int = 0
+    # executions whose results were served from the cache or checkpoint instead
+    cache_hits: int = 0
+    items_in: int = 0
+    items_out: int = 0
+    # bytes of arrays in the outputs of the adapter
+    bytes_out: int = 0
+    # time spent waiting for the producers of its wired inputs (its inputs are not ready)
+    blocked_on_input: float = 0.0
+    # time spent waiting for its consumers to receive its outputs (their buffers are full)
+    blocked_on_output: float = 0.0
+
+    def add(self, exec_time: float, cpu_time: float = 0.0):
+        self.exec_time += exec_time
+        self.cpu_time += cpu_time
+
+
+@dataclass
+class EdgeStats:
+    items: int = 0
+    bytes: int = 0
+
+
+def nbytes(value: Any) -> int:
+    """
+    Estimate the number of bytes of arrays in a value, looking into dicts, lists, tuples and objects holding an array
+    in their `data` attribute (e.g. Raster)
+    """
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(nbytes(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(nbytes(v) for v in value)
+    size = getattr(value, 'nbytes', None)
+    if isinstance(size, int):
+        return size
+    if hasattr(value, 'data') and not callable(value.data) and value.data is not value:
+        size = getattr(value.data, 'nbytes', None)
+        if isinstance(size, int):
+            return size
+    return 0
+
+
+def timed(func: Callable, *args, **kwargs) -> Tuple[Any, float, float]:
+    """
+    Call a function, returning its result with the wall time and CPU time (of the calling thread) it took.
+    It is defined at module level so that it can be sent to a process pool
+    """
+    start_time, start_cpu_time = time.perf_counter(), time.thread_time()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start_time, time.thread_time() - start_cpu_time
+
+
+def peak_rss() -> int:
+    """
+    Peak resident set size (in bytes) of this process and of its terminated children (e.g. process pool workers)
+    """
+    # ru_maxrss is in kilobytes on Linux
+    return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss +
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss) * 1024
+
+
+class Instrumentation:
+    """
+    Statistics of a pipeline execution: per adapter timing and throughput, and per wired edge throughput. They can be
+    saved as a JSON report and exposed in the Prometheus text format while the pipeline is running
+    """
+    logger = logging.getLogger(__name__)
+
+    def __init__(self):
+        self.adapters: Dict[str, AdapterStats] = OrderedDict()
+        self.edges: Dict[Tuple[str, str], EdgeStats] = OrderedDict()
+        self.start_time = None
+        self.end_time = None
+        self.lock = Lock()
+        self.server = None
+
+    def adapter(self, name: str) -> AdapterStats:
+        if name not in self.adapters:
+            with self.lock:
+                self.adapters.setdefault(name, AdapterStats())
+        return self.adapters[name]
+
+    def edge(self, output_name: str, input_name: str) -> EdgeStats:
+        if (output_name, input_name) not in self.edges:
+            with self.lock:
+                self.edges.setdefault((output_name, input_name), EdgeStats())
+        return self.edges[(output_name, input_name)]
+
+    def start(self):
+        self.start_time = time.time()
+        self.end_time = None
+
+    def stop(self):
+        self.end_time = time.time()
+
+    def report(self) -> dict:
+        with self.lock:
+            adapters = {name: asdict(stats) for name, stats in self.adapters.items()}
+            edges = [{'from': output_name, 'to': input_name, **asdict(stats)}
+                     for (output_name, input_name), stats in self.edges.items()]
+        end_time = self.end_time or time.time()
+        return {
+            'wall_time': end_time - self.start_time if self.start_time is not None else 0.0,
+            'peak_rss': peak_rss(),
+            'adapters': adapters,
+            'edges': edges,
+        }
+
+    def save(self, path: Union[str, Path]):
+        with open(str(path), "w") as f:
+            ujson.dump(self.report(), f, indent=4)
+
+    def prometheus(self) -> str:
+        report = self.report()
+        lines = [
+            "# TYPE dtran_pipeline_wall_seconds gauge",
+            f"dtran_pipeline_wall_seconds {report['wall_time']}",
+            "# TYPE dtran_pipeline_peak_rss_bytes gauge",
+            f"dtran_pipeline_peak_rss_bytes {report['peak_rss']}",
+        ]
+        for field in AdapterStats.__dataclass_fields__:
+            lines.append(f"# TYPE dtran_adapter_{field} gauge")
+            for name, stats in report['adapters'].items():
+                lines.append(f'dtran_adapter_{field}{{adapter="{name}"}} {stats[field]}')
+        for field in EdgeStats.__dataclass_fields__:
+            lines.append(f"# TYPE dtran_edge_{field} gauge")
+            for edge in report['edges']:
+                lines.append(f'dtran_edge_{field}{{from="{edge["from"]}",to="{edge["to"]}"}} {edge[field]}')
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int, host: str = "127.0.0.1"):
+        """
+        Expose the statistics in the Prometheus text format at http://host:port/metrics, from a daemon thread
+        """
+        instrumentation = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") not in {"", "/metrics"}:
+                    self.send_error(404)
+                    return
+                body = instrumentation.prometheus().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                instrumentation.logger.debug(format % args)
+
+        self.server = ThreadingHTTPServer((host, port), MetricsHandler)
+        Thread(target=self.server.serve_forever, daemon=True).start()
+        self.logger.info(f"Serving pipeline metrics at http://{host}:{port}/metrics")
+
+    def shutdown(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
@@ -1,6 +1,10 @@
 import click
+import ujson
 
+from dtran import Pipeline
 from dtran.config_parser import ConfigParser
+from dtran.helpers import UNITS_MAPPING
+from dtran.instrumentation import Instrumentation
 
 
 @click.group(invoke_without_command=False)
@@ -13,15 +17,135 @@ def cli():
     allow_extra_args=True,
 ))
 @click.option("--config", help="full path to config")
+@click.option("--checkpoint_dir", help="directory to persist the progress of the pipeline, so that it can be resumed")
+@click.option("--resume", is_flag=True, help="resume the pipeline persisted in checkpoint_dir instead of starting over")
+@click.option("--report", help="path of the JSON report of adapters' timing and throughput, written at the end")
+@click.option("--metrics_port", type=int, help="port to expose adapters' metrics in the Prometheus text format")
 @click.pass_context
-def exec_pipeline(ctx, config=None):
+def exec_pipeline(ctx, config=None, checkpoint_dir=None, resume=False, report=None, metrics_port=None):
     """
     Creates a pipeline and execute it based on given config and input(optional).
     To specify the input to pipeline, use (listed in ascending priority):
     1) config file option: --config path_to_file
     2) arg params: e.g. --FuncName.Attr=value
+    An interrupted pipeline executed with --checkpoint_dir can be resumed with: --checkpoint_dir dir --resume
     """
+    if resume and checkpoint_dir is None:
+        print("--resume requires --checkpoint_dir")
+        return
 
+    instrumentation = Instrumentation()
+    if metrics_port is not None:
+        instrumentation.serve(metrics_port)
+    try:
+        if resume:
+            Pipeline.resume(checkpoint_dir, instrumentation)
+        else:
+            run_pipeline(ctx, config, checkpoint_dir, instrumentation)
+    finally:
+        if report is not None:
+            instrumentation.save(report)
+        instrumentation.shutdown()
+
+
+def run_pipeline(ctx, config, checkpoint_dir, instrumentation):
+    user_inputs = parse_user_inputs(ctx)
+    if user_inputs is None:
+        return
+
+    parser = ConfigParser(user_inputs)
+    parsed_pipeline, parsed_inputs = parser.parse(path=config)
+
+    # Execute the pipeline
+    parsed_pipeline.exec(parsed_inputs, checkpoint_dir, instrumentation)
+
+
+@cli.command(name="explain_pipeline", context_settings=dict(
+    ignore_unknown_options=True,
+    allow_extra_args=True,
+))
+@click.option("--config", help="full path to config")
+@click.option("--json", "as_json", is_flag=True, help="print the plan as JSON")
+@click.pass_context
+def explain_pipeline(ctx, config=None, as_json=False):
+    """
+    Prints the execution plan of a pipeline and its estimated cost without executing it.
+    Inputs are given as in exec_pipeline. Adapters reading the data catalog query its metadata (DCAT_URL), which can
+    point to a local stand-in of the catalog
+    """
+    user_inputs = parse_user_inputs(ctx)
+    if user_inputs is None:
+        return
+
+    parser = ConfigParser(user_inputs)
+    parsed_pipeline, parsed_inputs = parser.parse(path=config)
+    plan = parsed_pipeline.explain(parsed_inputs)
+    if as_json:
+        print(ujson.dumps(plan, indent=4))
+        return
+
+    print("Execution order:")
+    for i, adapter in enumerate(plan['adapters']):
+        executions = '?' if adapter['executions'] is None else adapter['executions']
+        results = '?' if adapter['results'] is None else adapter['results']
+        print(f"  {i + 1}. {adapter['name']} ({adapter['adapter']}, {adapter['type']}, "
+              f"executor: {adapter['executor'] or 'event loop'}, parallelism: {adapter['parallelism']}): "
+              f"{executions} executions, {results} results")
+        for output, backend in adapter['datasets'].items():
+            print(f"       dataset {output}: {backend} backend")
+        for key, value in adapter['estimation'].items():
+            print(f"       {key}: {format_size(value) if key.endswith('bytes') or key.endswith('capacity') else value}")
+    print("Streaming edges:")
+    for edge in plan['edges']:
+        print(f"  {edge['from']} -> {edge['to']} (buffer size: {edge['buffer_size']})")
+    print(f"Estimated download: {format_size(plan['download_bytes'])}")
+    if plan['cache_capacity'] is not None:
+        print(f"Resource cache capacity: {format_size(plan['cache_capacity'])}")
+        if plan['download_bytes'] > plan['cache_capacity']:
+            print("WARNING: the estimated download exceeds the capacity of the resource cache")
+
+
+@cli.command(name="resource_cache_stats")
+@click.option("--json", "as_json", is_flag=True, help="print the statistics as JSON")
+def resource_cache_stats(as_json=False):
+    """
+    Prints the usage of the download directory of the data catalog resources (DATA_CATALOG_DOWNLOAD_DIR) and the
+    effectiveness of its cache
+    """
+    from funcs.readers.dcat_read_func import ResourceManager
+
+    stats = ResourceManager.get_instance().stats()
+    if as_json:
+        print(ujson.dumps(stats, indent=4))
+        return
+
+    print(f"Eviction policy: {stats['policy']}")
+    print(f"Size: {format_size(stats['current_size'])} / {format_size(stats['capacity'])} "
+          f"({stats['resources']} resources, watermarks: {stats['low_watermark']:.0%}-{stats['high_watermark']:.0%})")
+    print(f"Hits: {stats['hits']}, misses: {stats['misses']}, hit ratio: {stats['hit_ratio']:.1%}")
+    print(f"Downloaded: {format_size(stats['bytes_downloaded'])}, saved: {format_size(stats['bytes_saved'])}")
+    print(f"Evicted: {stats['evictions']} resources, {format_size(stats['bytes_evicted'])}")
+
+
+@cli.command(name="refresh_resource_index")
+@click.option("--dataset_id", multiple=True, help="id of a dataset to refresh, every indexed dataset by default")
+def refresh_resource_index(dataset_id=()):
+    """
+    Fetches again all resources of datasets in the local index of the data catalog resources, removing those which are
+    deleted from the data catalog
+    """
+    from funcs.readers.dcat_resource_index import ResourceIndex
+
+    index = ResourceIndex.get_instance()
+    if len(dataset_id) == 0:
+        dataset_id = index.refresh_all()
+    else:
+        for dataset in dataset_id:
+            index.refresh(dataset, full=True)
+    print(f"Refreshed {len(dataset_id)} datasets")
+
+
+def parse_user_inputs(ctx):
     # Accept user-specified inputs: expect format of --key=value
     user_inputs = {}
     for arg in ctx.args:
@@ -31,13 +155,15 @@ def exec_pipeline(ctx, config=None):
             user_inputs[(func_name, attr_name)] = value
         except ValueError:
             print(f"user input: '{arg}' should have format '--FuncName.Attr=value'")
-            return
+            return None
+    return user_inputs
 
-    parser = ConfigParser(user_inputs)
-    parsed_pipeline, parsed_inputs = parser.parse(path=config)
 
-    # Execute the pipeline
-    parsed_pipeline.exec(parsed_inputs)
+def format_size(size: int) -> str:
+    for unit, multiplier in UNITS_MAPPING.items():
+        if size >= multiplier:
+            return f"{size / multiplier:.1f}{unit}"
+    return f"{size}B"
 
 
 if __name__ == "__main__":
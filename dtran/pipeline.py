@@ -1,25 +1,99 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
+import asyncio
+import logging
+import pickle
+import time
 from collections import Counter
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from functools import partial
 from pathlib import Path
 from typing import *
 
 from inspect import isasyncgenfunction, isgeneratorfunction, iscoroutinefunction, signature
-from asyncio import Event, gather, get_event_loop, sleep
+import ujson
+from asyncio import Queue, Semaphore, ensure_future, gather, get_event_loop
 from marshmallow import Schema, fields, ValidationError
-from networkx import DiGraph, lexicographical_topological_sort, bfs_edges, NetworkXUnfeasible
+from networkx import DiGraph, lexicographical_topological_sort, bfs_edges, find_cycle, NetworkXNoCycle, NetworkXUnfeasible
 
-from dtran.ifunc import IFunc
+from dtran.cache import ResultCache
+from dtran.ifunc import IFunc, IFuncType
+from dtran.instrumentation import AdapterStats, Instrumentation, nbytes, timed
 from dtran.metadata import Metadata
 from dtran.wireio import WiredIOArg
 
+EXECUTOR_TYPES = ('thread', 'process')
+# marker put in the buffer of a wired input after its producer has finished
+END_OF_STREAM = object()
+# files of a checkpoint directory: definition of the pipeline, its inputs, progress of its adapters and their results
+CHECKPOINT_PIPELINE_FILE = "pipeline.pkl"
+CHECKPOINT_INPUTS_FILE = "inputs.pkl"
+CHECKPOINT_PROGRESS_FILE = "progress.json"
+CHECKPOINT_RESULTS_DIR = "results"
+# minimum interval (in seconds) between two writes of the progress of a checkpointed pipeline
+CHECKPOINT_PROGRESS_INTERVAL = 1
+
+
+@dataclass
+class AdapterOptions:
+    # run the blocking exec (and __init__) of the adapter in a "thread" or "process" pool instead of the event loop
+    executor: Optional[str] = None
+    # maximum number of outputs buffered for each wired input of the adapter before its producer waits
+    buffer_size: int = 1
+    # number of wired inputs executed concurrently, each by its own instance of the adapter
+    parallelism: int = 1
+    # whether concurrent executions emit results in the order of their wired inputs or as soon as they complete
+    ordered: bool = True
+    # whether results of the adapter are stored in and served from the pipeline's cache (if it has one). By default,
+    # it is disabled for writers, adapters without outputs and non-deterministic adapters (see AdapterOptions.resolve)
+    cache: Optional[bool] = None
+
+    def resolve(self, func_cls: Type[IFunc]) -> 'AdapterOptions':
+        """
+        Fill the options left to their default for the given adapter
+        """
+        if self.cache is not None:
+            return self
+        # a writer (or any adapter without outputs) is executed for its side effects, which must happen on every run
+        is_writer = getattr(func_cls, "func_type", None) == IFuncType.WRITER
+        return replace(self, cache=not is_writer and len(func_cls.outputs) > 0 and func_cls.deterministic)
+
 
 class Pipeline(object):
-    def __init__(self, func_classes: List[Type[IFunc]], wired: List[any] = None):
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, func_classes: List[Type[IFunc]], wired: List[any] = None,
+                 options: List[AdapterOptions] = None, max_workers: int = None, cache: ResultCache = None):
         """
         :param func_classes:
         :param wired: input, output
+        :param options: execution options of each adapter, in the same order as func_classes
+        :param max_workers: size of the thread/process pools used by adapters with an executor
+        :param cache: store of adapter results, reused across runs when the adapter and its inputs are unchanged
         """
+        options = list(options or [AdapterOptions() for _ in func_classes])
+        if len(options) != len(func_classes):
+            raise ValidationError("Pipeline requires exactly one AdapterOptions per adapter")
+        for i, option in enumerate(options):
+            if option.executor is not None and option.executor not in EXECUTOR_TYPES:
+                raise ValidationError(
+                    f"Invalid executor {option.executor} of {func_classes[i].id}. Expected one of {EXECUTOR_TYPES}")
+            if option.buffer_size < 1:
+                raise ValidationError(f"Invalid buffer_size {option.buffer_size} of {func_classes[i].id}. Expected at least 1")
+            if option.parallelism < 1:
+                raise ValidationError(f"Invalid parallelism {option.parallelism} of {func_classes[i].id}. Expected at least 1")
+            if option.parallelism > 1:
+                if isasyncgenfunction(func_classes[i].exec):
+                    raise ValidationError(
+                        f"Cannot run {func_classes[i].id} in parallel because it is an async generator adapter")
+                if option.executor is None:
+                    # blocking adapters can only run concurrently outside of the event loop
+                    options[i] = replace(option, executor='thread')
+            options[i] = options[i].resolve(func_classes[i])
+        self.max_workers = max_workers
+        self.cache = cache
+
         # map from function id to a tuple (idx of function, order of function (start from 1)).
         self.id2order = {}
         # map from idx of function to its order
@@ -80,12 +154,18 @@ class Pipeline(object):
                     preference_graph.add_edge((o[0], o[1], 'i', output_arg.input_ref), node, preference='n/a')
                 preference_graph.add_edge(node, (i[0], i[1], 'i', i[2]), preference=input_arg.preference)
 
+        # arguments of the constructor, normalized so that the pipeline can be saved and loaded again
+        self.definition = {'func_classes': list(func_classes), 'wired': [(list(i), list(o)) for i, o in wired],
+                           'options': options, 'max_workers': max_workers}
+
         self.func_classes = []
+        self.options = []
         self.idx2order = {}
         try:
             # reordering func_classes in topologically sorted order for execution
             for i in lexicographical_topological_sort(graph):
                 self.func_classes.append(func_classes[i])
+                self.options.append(options[i])
                 # changing idx of functions to map to their new order
                 self.idx2order[len(self.func_classes) - 1] = idx2order[i]
 
@@ -116,31 +196,61 @@ class Pipeline(object):
                 preference = 'array'
             self.preferences[(root[0], root[1])][root[3]] = preference
 
-    def exec(self, inputs: dict) -> None:
-        inputs_copy = {}
-        for arg in inputs:
-            if isinstance(arg, WiredIOArg):
-                if arg.func_idx is None:
-                    func_idx = self.get_func_order(arg.func_id)
-                else:
-                    func_idx = arg.func_idx
-                inputs_copy[WiredIOArg.get_arg_name(arg.func_id, func_idx, arg.name)] = inputs[arg]
-            else:
-                inputs_copy[arg] = inputs[arg]
-        inputs = inputs_copy
+    def exec(self, inputs: dict, checkpoint_dir: Union[str, Path] = None,
+             instrumentation: Instrumentation = None) -> None:
+        """
+        :param checkpoint_dir: directory where the pipeline, its inputs and the results of every adapter are persisted
+            as they complete, so that an interrupted execution can be resumed (see Pipeline.resume)
+        :param instrumentation: collector of the statistics of the execution, a new one is created if it isn't given.
+            It is kept in the instrumentation attribute of the pipeline afterward
+        """
+        inputs = self.normalize_inputs(inputs)
         self.validate(inputs)
 
-        # asyncio events to notify consumer of an input that it is ready
-        self.input_ready_events = {}
-        # asyncio events to notify the producer of an output that a particular wired input has been consumed
-        self.input_received_events = {}
+        self.checkpoint_dir = None
+        # store of the results of the execution, kept apart from the pipeline's cache: it keeps every result (even of
+        # adapters which opted out of the cache) and never evicts them, as they are only replayed by the same execution
+        self.checkpoint_store = None
+        if checkpoint_dir is not None:
+            self.checkpoint_dir = Path(checkpoint_dir)
+            self.checkpoint_dir.mkdir(exist_ok=True, parents=True)
+            self.save(self.checkpoint_dir / CHECKPOINT_PIPELINE_FILE)
+            with open(str(self.checkpoint_dir / CHECKPOINT_INPUTS_FILE), "wb") as f:
+                pickle.dump(inputs, f)
+            self.checkpoint_store = ResultCache(self.checkpoint_dir / CHECKPOINT_RESULTS_DIR)
+        # results of adapters which opted out of the cache are not addressable by other runs, and neither are their
+        # consumers' results, so only the adapters whose producers are all in the cache (transitively) are
+        self.cached_tasks = set()
+        for i, func_cls in enumerate(self.func_classes):
+            if self.options[i].cache and all(
+                    self.wired[(func_cls.id, self.idx2order[i], argname)][:2] in self.cached_tasks
+                    for argname in func_cls.inputs if (func_cls.id, self.idx2order[i], argname) in self.wired):
+                self.cached_tasks.add((func_cls.id, self.idx2order[i]))
+        self.progress_time = time.time()
+        self.instrumentation = instrumentation or Instrumentation()
+        for i, func_cls in enumerate(self.func_classes):
+            self.instrumentation.adapter(f"{func_cls.id}__{self.idx2order[i]}")
+
+        # bounded asyncio queues, one for each wired input, holding (cache key, output) of the producer until they are
+        # consumed
+        self.input_queues = {}
+        # cache key of the last output received by each wired input
+        self.input_keys = {}
         # set of inputs whose consumer is waiting for it to be ready
         self.waiting_ready_inputs = set()
         # set of inputs whose producer is waiting for it to be consumed
         self.waiting_received_inputs = set()
         # set of tasks which are finished, so that any of their consumers/producers can stop
         self.finished_tasks = set()
-        self.output = {}
+        # number of running executions of each task, which is not waiting even if it is waiting for its wired inputs
+        self.busy_tasks = Counter()
+        # thread/process pools shared by all adapters which are configured to use them
+        executor_types = {option.executor for option in self.options if option.executor is not None}
+        self.executors = {}
+        if 'thread' in executor_types:
+            self.executors['thread'] = ThreadPoolExecutor(max_workers=self.max_workers)
+        if 'process' in executor_types:
+            self.executors['process'] = ProcessPoolExecutor(max_workers=self.max_workers)
         # list of async tasks, one for each adapter
         tasks = []
         for i, func_cls in enumerate(self.func_classes):
@@ -149,8 +259,7 @@ class Pipeline(object):
                 input_gname = (func_cls.id, self.idx2order[i], argname)
                 if input_gname in self.wired:
                     # wired has higher priority
-                    self.input_ready_events[input_gname] = Event()
-                    self.input_received_events[input_gname] = Event()
+                    self.input_queues[input_gname] = Queue(maxsize=self.options[i].buffer_size)
                     # passing an async generator (or stream) for a wired input
                     func_args[argname] = self.wait_for_input(input_gname)
                 else:
@@ -162,97 +271,287 @@ class Pipeline(object):
                         raise e
 
             tasks.append(self.create_task(i, func_args))
-        # run all tasks concurrently in asyncio event loop
-        get_event_loop().run_until_complete(gather(*tasks, self.detect_deadlock()))
+        loop = get_event_loop()
+        # resolved once all tasks are finished, or failed as soon as the pipeline goes into a deadlock
+        self.deadlock = loop.create_future()
+        tasks = [ensure_future(task, loop=loop) for task in tasks]
+        self.instrumentation.start()
+        try:
+            # run all tasks concurrently in asyncio event loop
+            loop.run_until_complete(gather(*tasks, self.detect_deadlock()))
+        finally:
+            # cancelling tasks which are left waiting after a failure
+            for task in tasks:
+                task.cancel()
+            loop.run_until_complete(gather(*tasks, return_exceptions=True))
+            for executor in self.executors.values():
+                executor.shutdown()
+            self.instrumentation.stop()
+            self.save_progress()
 
     async def create_task(self, i: int, func_args: dict):
         func_cls = self.func_classes[i]
+        stats = self.instrumentation.adapter(f"{func_cls.id}__{self.idx2order[i]}")
+        start_time = time.perf_counter()
+        cached = self.cache is not None and (func_cls.id, self.idx2order[i]) in self.cached_tasks
+        # results are addressed by the same keys in the cache and in the checkpoint
+        keyed = cached or self.checkpoint_store is not None
         if not isasyncgenfunction(func_cls.exec):
             # use a wrapper for regular or generator adapter
             func_cls = default_wrapper(func_cls, {
                 argname for argname in func_cls.inputs.keys()
                 if (func_cls.id, self.idx2order[i], argname) in self.wired.keys()
-            })
+            }, self.executors.get(self.options[i].executor), self.options[i],
+                partial(self.set_busy, (func_cls.id, self.idx2order[i])),
+                self.cache if cached else None, partial(self.cache_key, i) if keyed else None, stats,
+                self.checkpoint_store)
+        is_native = isasyncgenfunction(self.func_classes[i].exec)
+        # time of async generator adapters is measured between their results, excluding time blocked on their wired
+        # inputs. It is approximate, as other adapters running in the event loop thread may be interleaved
+        timer = time.perf_counter(), time.thread_time(), stats.blocked_on_input
         try:
             func = func_cls(**func_args)
         except TypeError:
             print(f"Cannot initialize cls: {func_cls}")
             raise
         func.set_preferences(self.preferences[(func_cls.id, self.idx2order[i])])
-        # list of inputs which have been successfully wired
-        wired = []
-        # default wired inputs for the case if it never goes inside the async for loop below
-        for argname in func_cls.outputs.keys():
-            output_gname = (func_cls.id, self.idx2order[i], argname)
-            if output_gname in self.inv_wired:
-                for input_gname in self.inv_wired[output_gname]:
-                    wired.append(input_gname)
+        key = None
+        if is_native and keyed and not any(
+                (func_cls.id, self.idx2order[i], argname) in self.wired for argname in func_cls.inputs.keys()):
+            # outputs of an async generator adapter can only be addressed by its inputs if none of them is wired
+            key = self.cache_key(i, func_args)
 
         # looping Async Generator Adapter
-        async for result in func.exec():
-            wired = []
+        if is_native:
+            stats.executions += 1
+            results = keyed_stream(func.exec(), key, self.checkpoint_store)
+        else:
+            results = ((func.result_key, result) async for result in func.exec())
+        async for result_key, result in results:
+            if is_native:
+                stats.add(time.perf_counter() - timer[0] - (stats.blocked_on_input - timer[2]),
+                          time.thread_time() - timer[1])
+            stats.items_out += 1
+            if self.checkpoint_dir is not None and time.time() - self.progress_time >= CHECKPOINT_PROGRESS_INTERVAL:
+                self.save_progress()
             for argname in func_cls.outputs.keys():
                 output_gname = (func_cls.id, self.idx2order[i], argname)
                 try:
-                    self.output[output_gname] = result[argname]
+                    output = result[argname]
                 except TypeError:
                     print(
                         f"Error while wiring output of {func_cls} from {argname} to {WiredIOArg.get_arg_name(func_cls.id, self.idx2order[i], argname)}"
                     )
                     raise
+                size = nbytes(output)
+                stats.bytes_out += size
                 if output_gname in self.inv_wired:
                     for input_gname in self.inv_wired[output_gname]:
                         if input_gname[:2] not in self.finished_tasks:
-                            # notifying consumer of an input that it is ready
-                            self.input_ready_events[input_gname].set()
-                            self.waiting_ready_inputs.discard(input_gname)
-                            wired.append(input_gname)
-
-            # waiting for all wired inputs to be consumed
-            for input_gname in wired:
-                # adding input to the waiting set only if it's not already consumed
-                if not self.input_received_events[input_gname].is_set():
-                    self.waiting_received_inputs.add(input_gname)
-                # waiting for an input to be consumed
-                await self.input_received_events[input_gname].wait()
-                self.input_received_events[input_gname].clear()
+                            edge = self.instrumentation.edge(WiredIOArg.get_arg_name(*output_gname),
+                                                             WiredIOArg.get_arg_name(*input_gname))
+                            edge.items += 1
+                            edge.bytes += size
+                            # waiting only if the consumer has fallen behind by more than the size of the buffer
+                            await self.put_input(input_gname, (result_key, output))
+            timer = time.perf_counter(), time.thread_time(), stats.blocked_on_input
+        if is_native:
+            stats.add(time.perf_counter() - timer[0] - (stats.blocked_on_input - timer[2]), time.thread_time() - timer[1])
 
-        self.finished_tasks.add((func_cls.id, self.idx2order[i]))
         # notifying all wired inputs that producer has finished
-        for input_gname in wired:
-            if input_gname[:2] not in self.finished_tasks:
-                self.input_ready_events[input_gname].set()
-                self.waiting_ready_inputs.discard(input_gname)
+        for argname in func_cls.outputs.keys():
+            for input_gname in self.inv_wired.get((func_cls.id, self.idx2order[i], argname), []):
+                if input_gname[:2] not in self.finished_tasks:
+                    await self.put_input(input_gname, END_OF_STREAM)
+        self.finished_tasks.add((func_cls.id, self.idx2order[i]))
+        stats.wall_time = time.perf_counter() - start_time
+        if len(self.finished_tasks) == len(self.func_classes):
+            if not self.deadlock.done():
+                self.deadlock.set_result(None)
 
         # notifying all producers which are still running that consumer has finished
         for argname in func_cls.inputs.keys():
             input_gname = (func_cls.id, self.idx2order[i], argname)
             if (input_gname in self.wired) and (self.wired[input_gname][:2] not in self.finished_tasks):
-                self.input_received_events[input_gname].set()
+                # discarding the buffered outputs unblocks a producer waiting for space in the buffer
+                queue = self.input_queues[input_gname]
+                while not queue.empty():
+                    queue.get_nowait()
                 self.waiting_received_inputs.discard(input_gname)
+        # remaining tasks may all be waiting for each other now
+        self.check_deadlock()
+
+    async def put_input(self, input_gname: Tuple[str, int, str], output: Union[Tuple[str, Any], object]):
+        queue = self.input_queues[input_gname]
+        start_time = time.perf_counter()
+        # adding input to the waiting set only if its buffer is full
+        if queue.full():
+            self.waiting_received_inputs.add(input_gname)
+            self.check_deadlock()
+        await queue.put(output)
+        self.instrumentation.adapter(f"{self.wired[input_gname][0]}__{self.wired[input_gname][1]}").blocked_on_output += \
+            time.perf_counter() - start_time
+        self.waiting_received_inputs.discard(input_gname)
+        # consumer of the input (if it is waiting) can continue now
+        self.waiting_ready_inputs.discard(input_gname)
 
     async def wait_for_input(self, input_gname: Tuple[str, int, str]):
+        queue = self.input_queues[input_gname]
+        stats = self.instrumentation.adapter(f"{input_gname[0]}__{input_gname[1]}")
         while True:
-            # adding input to the waiting set only if it's not already ready
-            if not self.input_ready_events[input_gname].is_set():
+            start_time = time.perf_counter()
+            # adding input to the waiting set only if its buffer is empty
+            if queue.empty():
                 self.waiting_ready_inputs.add(input_gname)
-            # waiting for an input to be ready
-            await self.input_ready_events[input_gname].wait()
-            self.input_ready_events[input_gname].clear()
+                self.check_deadlock()
+            output = await queue.get()
+            stats.blocked_on_input += time.perf_counter() - start_time
+            self.waiting_ready_inputs.discard(input_gname)
+            # producer of the input (if it is waiting) can continue now
+            self.waiting_received_inputs.discard(input_gname)
             # break out of the loop if producer has finished
-            if self.wired[input_gname][:2] in self.finished_tasks:
+            if output is END_OF_STREAM:
                 break
-            # notifying producer of an input that it has been consumed
-            self.input_received_events[input_gname].set()
-            self.waiting_received_inputs.discard(input_gname)
-            yield self.output[self.wired[input_gname]]
+            self.input_keys[input_gname], output = output
+            stats.items_in += 1
+            yield output
+
+    def cache_key(self, i: int, func_args: dict) -> Optional[str]:
+        """
+        Compute the key of the results of the i-th adapter when invoked with the given arguments. Wired arguments are
+        addressed by the keys of the outputs they were received from, so the key is None if any of them is unknown
+        """
+        func_cls = self.func_classes[i]
+        values = {}
+        for argname, arg in func_args.items():
+            input_gname = (func_cls.id, self.idx2order[i], argname)
+            if input_gname in self.wired:
+                if self.input_keys.get(input_gname) is None:
+                    return None
+                values[argname] = ('wired', self.input_keys[input_gname])
+            else:
+                values[argname] = arg
+        return ResultCache.key(f"{func_cls.__module__}.{func_cls.__qualname__}", values)
 
     async def detect_deadlock(self):
-        while len(self.finished_tasks) < len(self.func_classes):
-            # checking if all running tasks are waiting, the deadlock condition
-            if len(self.func_classes) - len(self.finished_tasks) == len(self.waiting_ready_inputs) + len(self.waiting_received_inputs):
-                raise RuntimeError("Pipeline went into a deadlock")
-            await sleep(0)
+        await self.deadlock
+
+    def check_deadlock(self) -> None:
+        """
+        Check for the deadlock condition, i.e. all running tasks are waiting for each other. It is called whenever a task
+        starts waiting or finishes, as those are the only moments when the condition can become true
+        """
+        if self.deadlock.done():
+            return
+        # mapping from a waiting task to the tasks it is waiting for, through which wired input
+        graph = DiGraph()
+        for input_gname in self.waiting_ready_inputs:
+            graph.add_edge(input_gname[:2], self.wired[input_gname][:2], input=input_gname, reason="ready")
+        for input_gname in self.waiting_received_inputs:
+            graph.add_edge(self.wired[input_gname][:2], input_gname[:2], input=input_gname, reason="received")
+
+        running_tasks = {(func_cls.id, self.idx2order[i]) for i, func_cls in enumerate(self.func_classes)} - self.finished_tasks
+        waiting_tasks = {u for u, _ in graph.edges if self.busy_tasks[u] == 0}
+        if len(running_tasks) == 0 or not running_tasks.issubset(waiting_tasks):
+            return
+
+        try:
+            edges = find_cycle(graph)
+        except NetworkXNoCycle:
+            edges = graph.edges
+        waits = []
+        for u, v in edges:
+            edge = graph.edges[u, v]
+            if edge['reason'] == "ready":
+                waits.append(f"{u[0]}__{u[1]} is waiting for input {WiredIOArg.get_arg_name(*edge['input'])} from {v[0]}__{v[1]}")
+            else:
+                waits.append(f"{u[0]}__{u[1]} is waiting for {v[0]}__{v[1]} to consume input {WiredIOArg.get_arg_name(*edge['input'])}")
+        self.deadlock.set_exception(RuntimeError("Pipeline went into a deadlock: " + "; ".join(waits)))
+
+    def set_busy(self, task: Tuple[str, int], delta: int) -> None:
+        self.busy_tasks[task] += delta
+        if self.busy_tasks[task] == 0:
+            self.check_deadlock()
+
+    def normalize_inputs(self, inputs: dict) -> dict:
+        # mapping WiredIOArg keys of inputs to their argument names
+        inputs_copy = {}
+        for arg in inputs:
+            if isinstance(arg, WiredIOArg):
+                if arg.func_idx is None:
+                    func_idx = self.get_func_order(arg.func_id)
+                else:
+                    func_idx = arg.func_idx
+                inputs_copy[WiredIOArg.get_arg_name(arg.func_id, func_idx, arg.name)] = inputs[arg]
+            else:
+                inputs_copy[arg] = inputs[arg]
+        return inputs_copy
+
+    def explain(self, inputs: dict) -> dict:
+        """
+        Describe the execution plan of the pipeline without executing it: the execution order, the wired (streaming)
+        edges, the backend chosen for every dataset, and the cost estimated by every adapter (see IFunc.estimate).
+        Number of executions are propagated along the wired edges, as an adapter is executed once for each set of its
+        wired inputs
+        """
+        inputs = self.normalize_inputs(inputs)
+        self.validate(inputs)
+
+        adapters = []
+        # number of results of each task, None if unknown
+        n_results = {}
+        download_bytes, cache_capacity = 0, None
+        for i, func_cls in enumerate(self.func_classes):
+            task = (func_cls.id, self.idx2order[i])
+            func_inputs = {argname: inputs[WiredIOArg.get_arg_name(*task, argname)] for argname in func_cls.inputs
+                           if WiredIOArg.get_arg_name(*task, argname) in inputs}
+            wired_tasks = {self.wired[(*task, argname)][:2] for argname in func_cls.inputs if (*task, argname) in self.wired}
+            if len(wired_tasks) == 0:
+                executions = 1
+            elif any(n_results[wired_task] is None for wired_task in wired_tasks):
+                executions = None
+            else:
+                # an adapter stops as soon as one of its wired inputs has finished
+                executions = min(n_results[wired_task] for wired_task in wired_tasks)
+
+            estimation = func_cls.estimate(func_inputs) or {}
+            if isasyncgenfunction(func_cls.exec) or isgeneratorfunction(func_cls.exec):
+                results = estimation.get('results')
+            else:
+                results = 1
+            n_results[task] = executions * results if executions is not None and results is not None else None
+            download_bytes += estimation.get('download_bytes', 0)
+            if 'cache_capacity' in estimation:
+                cache_capacity = estimation['cache_capacity']
+
+            adapters.append({
+                'name': f"{task[0]}__{task[1]}",
+                'adapter': f"{func_cls.__module__}.{func_cls.__qualname__}",
+                'type': 'async generator' if isasyncgenfunction(func_cls.exec) else
+                'generator' if isgeneratorfunction(func_cls.exec) else 'function',
+                'executor': self.options[i].executor,
+                'parallelism': self.options[i].parallelism,
+                'executions': executions,
+                'results': n_results[task],
+                # adapters read the array backend unless the graph backend is preferred
+                'datasets': {output: preference or 'array' for output, preference in self.preferences[task].items()},
+                'estimation': estimation,
+            })
+
+        task2idx = {(func_cls.id, self.idx2order[i]): i for i, func_cls in enumerate(self.func_classes)}
+        edges = []
+        for input_gname, output_gname in self.wired.items():
+            edges.append({
+                'from': WiredIOArg.get_arg_name(*output_gname),
+                'to': WiredIOArg.get_arg_name(*input_gname),
+                'buffer_size': self.options[task2idx[input_gname[:2]]].buffer_size,
+            })
+        return {
+            'adapters': adapters,
+            'edges': edges,
+            'download_bytes': download_bytes,
+            'cache_capacity': cache_capacity,
+        }
 
     def validate(self, inputs: dict) -> None:
         errors = self.schema().validate(inputs)
@@ -271,14 +570,128 @@ class Pipeline(object):
         return self.id2order[func_id][0][-1]
 
     def save(self, save_path: Union[str, Path]):
-        pass
+        """
+        Save the definition of the pipeline (adapters, wiring, options and cache) to a file. Adapters are saved by
+        reference, so they must be importable when the pipeline is loaded
+        """
+        with open(str(save_path), "wb") as f:
+            pickle.dump({**self.definition, 'cache': self.cache}, f)
 
     @staticmethod
-    def load(load_path: Union[str, Path]):
-        pass
+    def load(load_path: Union[str, Path]) -> 'Pipeline':
+        with open(str(load_path), "rb") as f:
+            return Pipeline(**pickle.load(f))
 
+    @staticmethod
+    def resume(checkpoint_dir: Union[str, Path], instrumentation: Instrumentation = None) -> 'Pipeline':
+        """
+        Resume an execution from its checkpoint directory. Adapters are executed again from the beginning, but the
+        invocations which have completed before are replayed from the stored results instead of being executed. Results
+        streamed by the invocations which were interrupted (including the stream of an async generator adapter without
+        wired inputs) are replayed too, and skipped when they are emitted again
+        """
+        checkpoint_dir = Path(checkpoint_dir)
+        pipeline = Pipeline.load(checkpoint_dir / CHECKPOINT_PIPELINE_FILE)
+        with open(str(checkpoint_dir / CHECKPOINT_INPUTS_FILE), "rb") as f:
+            inputs = pickle.load(f)
+        if (checkpoint_dir / CHECKPOINT_PROGRESS_FILE).exists():
+            with open(str(checkpoint_dir / CHECKPOINT_PROGRESS_FILE), "r") as f:
+                progress = ujson.load(f)
+            for task, n_results in progress['results'].items():
+                pipeline.logger.info(f"Resuming {task}: {n_results} results were emitted before the interruption, "
+                                     f"they are replayed from the checkpoint")
+        pipeline.exec(inputs, checkpoint_dir, instrumentation)
+        return pipeline
+
+    def save_progress(self) -> None:
+        if self.checkpoint_dir is None:
+            return
+        progress = {
+            'results': {name: stats.items_out for name, stats in self.instrumentation.adapters.items()},
+            'finished': [f"{task[0]}__{task[1]}" for task in self.finished_tasks],
+        }
+        # writing to a temporary file first, so that the progress is never partially written
+        path = self.checkpoint_dir / CHECKPOINT_PROGRESS_FILE
+        tmp_path = path.with_suffix(".tmp")
+        with open(str(tmp_path), "w") as f:
+            ujson.dump(progress, f, indent=4)
+        tmp_path.replace(path)
+        self.progress_time = time.time()
+
+
+def load_stream(checkpoint: ResultCache, key: str) -> List[dict]:
+    """
+    Get the results streamed by an invocation from a checkpoint, in which they are stored one by one as they are
+    emitted (see keyed_stream)
+    """
+    results = []
+    while True:
+        result = checkpoint.get(ResultCache.key(key, len(results)))
+        if result is None:
+            return results
+        results.extend(result)
+
+
+async def keyed_stream(results: AsyncIterator[dict], key: Optional[str],
+                       checkpoint: ResultCache = None) -> AsyncGenerator[Tuple[Optional[str], dict], None]:
+    """
+    Pair the results of an invocation with their keys, derived from the key of the invocation (None if it is unknown).
+    If a checkpoint is given, each result is stored in it before it is emitted, and the results stored by an
+    interrupted execution of the same invocation are replayed first, then skipped when the invocation emits them again
+    """
+    if key is None or checkpoint is None:
+        j = 0
+        async for result in results:
+            yield (ResultCache.key(key, j) if key is not None else None), result
+            j += 1
+        return
+    loop = get_event_loop()
+    replayed = await loop.run_in_executor(None, load_stream, checkpoint, key)
+    for j, result in enumerate(replayed):
+        yield ResultCache.key(key, j), result
+    j = 0
+    async for result in results:
+        if j >= len(replayed):
+            await loop.run_in_executor(None, checkpoint.put, ResultCache.key(key, j), [result])
+            yield ResultCache.key(key, j), result
+        j += 1
+
+
+def exec_adapter(func_cls: Type[IFunc], func_args: dict, preferences: Dict[str, str]) -> List[dict]:
+    """
+    Initialize and execute a regular, generator or coroutine adapter, collecting all of its results.
+    It is defined at module level so that it can be pickled and sent to a process pool
+    """
+    func = func_cls(**func_args)
+    func.set_preferences(preferences)
+    if isgeneratorfunction(func.exec):
+        return list(func.exec())
+    elif iscoroutinefunction(func.exec):
+        return [asyncio.run(func.exec())]
+    return [func.exec()]
+
+
+def default_wrapper(cls: Type[IFunc], inputs: Set[str], executor: Executor = None, options: AdapterOptions = None,
+                    set_busy: Callable[[int], None] = None, cache: ResultCache = None,
+                    cache_key: Callable[[dict], Optional[str]] = None, stats: AdapterStats = None,
+                    checkpoint: ResultCache = None) -> Type[IFunc]:
+    """
+    :param options: execution options of the adapter, only parallelism and ordered are used here: the number of wired
+        inputs (and their adapter's instances) which are executed concurrently, and whether results are emitted in the
+        order of their wired inputs or in the order in which they are completed
+    :param set_busy: callback notified when executions start (+1) and when their results are emitted (-1),
+        as the adapter is still busy when one of its executions is waiting for the next wired inputs
+    :param cache: store of results, which are served from it instead of executing the adapter when found
+    :param cache_key: function computing the key of the results of an execution from its arguments, it must be called
+        right after the wired inputs are received. The key of each emitted result is exposed as `result_key`
+    :param stats: statistics of the adapter, updated with the time and CPU time of every execution
+    :param checkpoint: store of the results of the current execution, which is looked up before the cache and keeps
+        every result of the adapter
+    """
+    stats = stats or AdapterStats()
+    parallelism = options.parallelism if options is not None else 1
+    ordered = options.ordered if options is not None else True
 
-def default_wrapper(cls: Type[IFunc], inputs: Set[str]) -> Type[IFunc]:
     class DefaultWrapper(IFunc):
         func_cls = cls
 
@@ -290,30 +703,194 @@ def default_wrapper(cls: Type[IFunc], inputs: Set[str]) -> Type[IFunc]:
                 print(f"Cannot initialize cls: {DefaultWrapper.func_cls}")
                 raise
             self.func_args = kwargs
+            self.result_key = None
 
         async def exec(self) -> Union[dict, Generator[dict, None, None], AsyncGenerator[dict, None]]:
+            if parallelism > 1:
+                async for result in self.exec_parallel():
+                    yield result
+                return
             while True:
-                func_args = self.func_args.copy()
-                # waiting for all wired inputs, and break out of the loop if any one of them has finished
+                func_args = await self.next_args()
+                if func_args is None:
+                    break
+                async for self.result_key, result in self.exec_keyed(func_args, self.next_key(func_args)):
+                    yield result
+                # if there are no wired inputs, break out to avoid looping infinitely
+                if len(inputs) == 0:
+                    break
+
+        async def exec_parallel(self) -> AsyncGenerator[dict, None]:
+            # results of every execution as tuples (sequence number, (key, result) pairs, error), ended by
+            # (count, None, None)
+            executions = Queue()
+            # bounds the number of executions which are running or whose results are not emitted yet
+            slots = Semaphore(parallelism)
+            tasks = set()
+
+            async def run(seq: int, func_args: dict, key: Optional[str]):
                 try:
-                    for argname in inputs:
-                        func_args[argname] = await self.func_args[argname].__anext__()
-                except StopAsyncIteration:
+                    await executions.put((seq, [item async for item in self.exec_keyed(func_args, key)], None))
+                except Exception as e:
+                    await executions.put((seq, None, e))
+
+            async def dispatch():
+                seq = 0
+                while True:
+                    await slots.acquire()
+                    func_args = await self.next_args()
+                    if func_args is None:
+                        break
+                    set_busy(1)
+                    tasks.add(ensure_future(run(seq, func_args, self.next_key(func_args))))
+                    seq += 1
+                    # if there are no wired inputs, break out to avoid looping infinitely
+                    if len(inputs) == 0:
+                        break
+                await executions.put((seq, None, None))
+
+            tasks.add(ensure_future(dispatch()))
+            try:
+                pending, n_emitted, n_executions = {}, 0, None
+                while n_executions is None or n_emitted < n_executions:
+                    seq, results, error = await executions.get()
+                    if error is not None:
+                        raise error
+                    if results is None:
+                        n_executions = seq
+                        continue
+                    pending[seq] = results
+                    # results are emitted as soon as they are completed, unless some earlier execution is still running
+                    while len(pending) > 0:
+                        seq = n_emitted if ordered else next(iter(pending))
+                        if seq not in pending:
+                            break
+                        for self.result_key, result in pending.pop(seq):
+                            yield result
+                        n_emitted += 1
+                        set_busy(-1)
+                        slots.release()
+            finally:
+                for task in tasks:
+                    task.cancel()
+
+        async def next_args(self) -> Optional[dict]:
+            func_args = self.func_args.copy()
+            # waiting for all wired inputs, and return None if any one of them has finished
+            try:
+                for argname in inputs:
+                    func_args[argname] = await self.func_args[argname].__anext__()
+            except StopAsyncIteration:
+                return None
+            return func_args
+
+        def next_key(self, func_args: dict) -> Optional[str]:
+            return cache_key(func_args) if cache_key is not None else None
+
+        async def exec_keyed(self, func_args: dict, key: Optional[str]) -> AsyncGenerator[Tuple[str, dict], None]:
+            # pairing each result with its key, so that consumers of the result can be cached as well
+            if key is None:
+                async for result in self.exec_args(func_args):
+                    yield None, result
+                return
+            loop = get_event_loop()
+            stores = [store for store in (checkpoint, cache) if store is not None]
+            results, missed = None, []
+            for store in stores:
+                results = await loop.run_in_executor(None, store.get, key)
+                if results is not None:
                     break
-                func = self.func_cls(**func_args)
+                missed.append(store)
+            if results is None and not isgeneratorfunction(cls.exec):
+                # the result of a regular adapter is stored before it is emitted, so that it is replayed if the pipeline
+                # is interrupted while its consumers are processing it
+                results = [result async for result in self.exec_args(func_args)]
+                for store in stores:
+                    await loop.run_in_executor(None, store.put, key, results)
+                for j, result in enumerate(results):
+                    yield ResultCache.key(key, j), result
+                return
+            if results is None:
+                # results of generators are still streamed, and only stored once the execution is completed. They are
+                # also stored one by one in the checkpoint, so that they are replayed if the execution is interrupted
+                results = []
+                async for result_key, result in keyed_stream(self.exec_args(func_args), key, checkpoint):
+                    yield result_key, result
+                    results.append(result)
+                for store in stores:
+                    await loop.run_in_executor(None, store.put, key, results)
+                if checkpoint is not None:
+                    for j in range(len(results)):
+                        await loop.run_in_executor(None, checkpoint.delete, ResultCache.key(key, j))
+                return
+            stats.cache_hits += 1
+            # results served from the cache are added to the checkpoint too, so that they are still replayed on resume
+            # if the cache evicts them meanwhile
+            for store in missed:
+                await loop.run_in_executor(None, store.put, key, results)
+            for j, result in enumerate(results):
+                yield ResultCache.key(key, j), result
+
+        async def exec_args(self, func_args: dict) -> AsyncGenerator[dict, None]:
+            stats.executions += 1
+            if isinstance(executor, ProcessPoolExecutor):
+                # adapter's instance lives in the worker process, so only its results are sent back
+                results, exec_time, cpu_time = await get_event_loop().run_in_executor(
+                    executor, timed, exec_adapter, self.func_cls, func_args, self.preferences)
+                stats.add(exec_time, cpu_time)
+                for result in results:
+                    yield result
+            elif executor is not None:
+                async for result in self.exec_in_thread(func_args):
+                    yield result
+            else:
+                func, exec_time, cpu_time = timed(partial(self.func_cls, **func_args))
+                stats.add(exec_time, cpu_time)
                 # TODO: correctly handle validate and change_metadata in future
                 # correctly handle get_preference for wrapped adapter's instance
                 func.get_preference = self.get_preference
                 if isgeneratorfunction(func.exec):
-                    for result in func.exec():
+                    results, end = func.exec(), object()
+                    while True:
+                        result, exec_time, cpu_time = timed(next, results, end)
+                        stats.add(exec_time, cpu_time)
+                        if result is end:
+                            break
                         yield result
                 elif iscoroutinefunction(func.exec):
-                    yield await func.exec()
+                    # CPU time of coroutines is unknown, as other adapters run in the event loop while they are waiting
+                    start_time = time.perf_counter()
+                    result = await func.exec()
+                    stats.add(time.perf_counter() - start_time)
+                    yield result
                 else:
-                    yield func.exec()
-                # if there are no wired inputs, break out to avoid looping infinitely
-                if len(inputs) == 0:
-                    break
+                    result, exec_time, cpu_time = timed(func.exec)
+                    stats.add(exec_time, cpu_time)
+                    yield result
+
+        async def exec_in_thread(self, func_args: dict) -> AsyncGenerator[dict, None]:
+            loop = get_event_loop()
+            func, exec_time, cpu_time = await loop.run_in_executor(executor, partial(timed, self.func_cls, **func_args))
+            stats.add(exec_time, cpu_time)
+            func.get_preference = self.get_preference
+            if isgeneratorfunction(func.exec):
+                # advancing the generator in the thread pool one result at a time, so results are still streamed
+                results, end = func.exec(), object()
+                while True:
+                    result, exec_time, cpu_time = await loop.run_in_executor(executor, timed, next, results, end)
+                    stats.add(exec_time, cpu_time)
+                    if result is end:
+                        break
+                    yield result
+            elif iscoroutinefunction(func.exec):
+                start_time = time.perf_counter()
+                result = await func.exec()
+                stats.add(time.perf_counter() - start_time)
+                yield result
+            else:
+                result, exec_time, cpu_time = await loop.run_in_executor(executor, timed, func.exec)
+                stats.add(exec_time, cpu_time)
+                yield result
 
         def validate(self) -> bool:
             return True
@@ -324,6 +901,8 @@ def default_wrapper(cls: Type[IFunc], inputs: Set[str]) -> Type[IFunc]:
     # setting static properties of DefaultWrapper to proxy wrapped adapter
     for prop in dir(cls):
         if (not prop.startswith("__")) and \
-                (prop not in {'exec', 'validate', 'change_metadata', 'preferences', 'get_preference', 'set_preferences'}):
+                (prop not in {'exec', 'exec_parallel', 'next_args', 'next_key', 'exec_keyed', 'exec_args',
+                              'exec_in_thread', 'validate', 'change_metadata', 'preferences', 'get_preference',
+                              'set_preferences', 'result_key'}):
             setattr(DefaultWrapper, prop, getattr(cls, prop))
     return DefaultWrapper
@@ -1,25 +1,46 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
+import importlib
 
-from .readers.read_func import ReadFunc
-from .readers.dcat_read_func import DcatReadFunc
-from .readers.dcat_range_stream import DcatRangeStream
-from .readers.dcat_variable_stream import DcatVariableStream
-from .readers.dcat_read_no_repr import DcatReadNoReprFunc
-# from .trans_unit_func import UnitTransFunc
-from .writers.write_func import CSVWriteFunc
-from .writers.netcdf_write_func import NetCDFWriteFunc
-from .gdal.trans_cropping_func import CroppingTransFunc
-from .writers.geotiff_write_func import GeoTiffWriteFunc
-from .graph_str2str_func import GraphStr2StrFunc
-from .merge_func import MergeFunc
-from .gdal.trans_cropping_func import CroppingTransFunc
-from .gdal.trans_cropping_wrapper import CroppingTransWrapper
-from .aggregations.variable_aggregation_func import VariableAggregationFunc
-from .dcat_write_func import DcatWriteFunc
-# from .calendar_change_func import CalendarChangeFunc
-from .topoflow.nc2geotiff import NC2GeoTiff
-from .topoflow.write_topoflow4_climate_func import Topoflow4ClimateWriteFunc, Topoflow4ClimateWritePerMonthFunc
-from .topoflow.write_topoflow4_soil_func import Topoflow4SoilWriteFunc
-from .cycles.gldas2cycles import Gldas2CyclesFunc
-# from .topoflow.dcat_read__tf4_climate_trans__upload import DcatReadTopoflow4ClimateUploadFunc
+# adapters exported by the package and their modules. They are imported only when they are accessed, as their modules
+# depend on heavy libraries (GDAL, netCDF4, xarray, ...). Their attributes are listed in the manifest (funcs/registry.py)
+ADAPTERS = {
+    "ReadFunc": ".readers.read_func",
+    "DcatReadFunc": ".readers.dcat_read_func",
+    "DcatStreamReadFunc": ".readers.dcat_stream_read_func",
+    "DcatRangeStream": ".readers.dcat_range_stream",
+    "DcatVariableStream": ".readers.dcat_variable_stream",
+    "DcatReadNoReprFunc": ".readers.dcat_read_no_repr",
+    # "UnitTransFunc": ".trans_unit_func",
+    "CSVWriteFunc": ".writers.write_func",
+    "NetCDFWriteFunc": ".writers.netcdf_write_func",
+    "CroppingTransFunc": ".gdal.trans_cropping_func",
+    "GeoTiffWriteFunc": ".writers.geotiff_write_func",
+    "GraphStr2StrFunc": ".graph_str2str_func",
+    "MergeFunc": ".merge_func",
+    "CroppingTransWrapper": ".gdal.trans_cropping_wrapper",
+    "VariableAggregationFunc": ".aggregations.variable_aggregation_func",
+    "DcatWriteFunc": ".dcat_write_func",
+    # "CalendarChangeFunc": ".calendar_change_func",
+    "NC2GeoTiff": ".topoflow.nc2geotiff",
+    "Topoflow4ClimateWriteFunc": ".topoflow.write_topoflow4_climate_func",
+    "Topoflow4ClimateWritePerMonthFunc": ".topoflow.write_topoflow4_climate_func",
+    "Topoflow4SoilWriteFunc": ".topoflow.write_topoflow4_soil_func",
+    "Gldas2CyclesFunc": ".cycles.gldas2cycles",
+    # "DcatReadTopoflow4ClimateUploadFunc": ".topoflow.dcat_read__tf4_climate_trans__upload",
+}
+
+__all__ = list(ADAPTERS.keys())
+
+
+def __getattr__(name: str):
+    if name not in ADAPTERS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    cls = getattr(importlib.import_module(ADAPTERS[name], __name__), name)
+    # caching the adapter, so that it is only imported once
+    globals()[name] = cls
+    return cls
+
+
+def __dir__():
+    return sorted(set(globals().keys()) | set(__all__))
@@ -7,7 +7,7 @@ import uuid
 from dataclasses import dataclass
 from datetime import datetime, timezone
 from itertools import chain
-from typing import List
+from typing import List, Optional, Tuple
 
 import numpy as np
 from drepr import DRepr, outputs
@@ -15,8 +15,9 @@ from drepr.executors.readers.np_dict import NPDictReader
 from drepr.executors.readers.reader_container import ReaderContainer
 
 from dtran.argtype import ArgType
+from dtran.backend import ShardedBackend
+from dtran.helpers import to_utc
 from dtran.ifunc import IFunc, IFuncType
-from funcs.readers.dcat_read_func import ShardedBackend
 
 
 @dataclass
@@ -70,29 +71,42 @@ class VariableAggregationFunc(IFunc):
     inputs = {
         "dataset": ArgType.DataSet(None),
         "group_by": ArgType.VarAggGroupBy,
-        "function": ArgType.VarAggFunc
+        "function": ArgType.VarAggFunc,
+        "start_time": ArgType.DateTime(optional=True),
+        "end_time": ArgType.DateTime(optional=True),
     }
     outputs = {"data": ArgType.DataSet(None)}
     example = {
         "group_by": "time, lat, long, place",
-        "function": "count, sum, average"
+        "function": "count, sum, average",
+        "start_time": "2020-03-02T12:30:55",
+        "end_time": "2020-03-02T12:30:55",
     }
     logger = logging.getLogger(__name__)
 
-    def __init__(self, dataset, group_by, function):
+    def __init__(self, dataset, group_by, function, start_time: datetime = None, end_time: datetime = None):
+        """
+        :param start_time: only the variables whose timestamp is in [start_time, end_time] are aggregated, times
+            without a time zone are in UTC
+        """
         self.dataset = dataset
         self.group_by = GroupBy([GroupByProp(**x) for x in group_by])
         self.function = AggregationFunc(function)
+        # times are compared in UTC without their time zone, as the time ranges of shards
+        self.start_time = to_utc(start_time) if start_time is not None else None
+        self.end_time = to_utc(end_time) if end_time is not None else None
 
     def exec(self) -> dict:
         groups = {}
+        time_range = (VariableAggregationFunc._to_timestamp(self.start_time),
+                      VariableAggregationFunc._to_timestamp(self.end_time))
 
         if isinstance(self.dataset, ShardedBackend):
-            # check if the data is partition
-            for dataset in reversed(self.dataset.datasets):
-                VariableAggregationFunc._group_by(dataset, self.group_by, groups)
+            # check if the data is partition, shards are loaded one by one and those outside the time range are skipped
+            for dataset in self.dataset.iter_shards(self.start_time, self.end_time):
+                VariableAggregationFunc._group_by(dataset, self.group_by, groups, time_range)
         else:
-            VariableAggregationFunc._group_by(self.dataset, self.group_by, groups)
+            VariableAggregationFunc._group_by(self.dataset, self.group_by, groups, time_range)
 
         values = VariableAggregationFunc._aggregate(groups, self.function)
 
@@ -135,13 +149,25 @@ class VariableAggregationFunc(IFunc):
         return True
 
     @staticmethod
-    def _group_by(sm, group_by: GroupBy, groups: dict):
+    def _to_timestamp(value: Optional[datetime]) -> Optional[float]:
+        return value.replace(tzinfo=timezone.utc).timestamp() if value is not None else None
+
+    @staticmethod
+    def _group_by(sm, group_by: GroupBy, groups: dict,
+                  time_range: Tuple[Optional[float], Optional[float]] = (None, None)):
         rdf = sm.ns(outputs.Namespace.RDF)
         mint_geo = sm.ns("https://mint.isi.edu/geo")
         mint = sm.ns("https://mint.isi.edu/")
         for c in sm.c(mint.Variable):
             index_keys = [p.prop for p in group_by.group_props if c.p(p.prop).ndarray_size() != 1]
             first_record = next(c.iter_records())
+            if time_range != (None, None) and c.p(mint.timestamp) is not None and \
+                    c.p(mint.timestamp).ndarray_size() == 1:
+                # skipping variables outside of the time range, in the shards which overlap it
+                timestamp = first_record.s(mint.timestamp)
+                if (time_range[0] is not None and timestamp < time_range[0]) or \
+                        (time_range[1] is not None and timestamp > time_range[1]):
+                    continue
             key_props = [p for p in group_by.group_props if c.p(p.prop).ndarray_size() == 1]
             sub_key = tuple([
                 p.to_key(first_record.s(p.prop)) for p in key_props
@@ -1,17 +1,28 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
 import datetime
+import glob
+import hashlib
+import math
 import os
+from collections import OrderedDict
+from threading import Lock, RLock
 from uuid import uuid4
 
 import numpy as np
+import ujson
 from pathlib import Path
-from osgeo import gdal, osr, gdal_array
-from typing import Tuple, Union
+from osgeo import gdal, osr, ogr, gdal_array
+from functools import lru_cache
+from typing import Tuple, Union, List, Optional, Callable, Dict
 from enum import Enum, IntEnum
 from dataclasses import dataclass, astuple
 from netCDF4 import Dataset
 
+# directory where the rasterized masks of cutlines are persisted across processes, they are only cached in memory if
+# it is not set
+CROP_MASK_CACHE_DIR = os.environ.get('CROP_MASK_CACHE_DIR')
+
 
 @dataclass
 class GeoTransform:
@@ -33,6 +44,44 @@ class GeoTransform:
     def to_gdal(self):
         return self.x_0, self.dx, self.x_slope, self.y_0, self.y_slope, self.dy
 
+    def to_coords(self, cols: Union[np.ndarray, float], rows: Union[np.ndarray, float]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Get the coordinates (x, y) of positions in pixels (+0.5 for the centers of the pixels)
+        """
+        cols, rows = np.asarray(cols), np.asarray(rows)
+        return self.x_0 + cols * self.dx + rows * self.x_slope, self.y_0 + cols * self.y_slope + rows * self.dy
+
+    def to_pixels(self, x: Union[np.ndarray, float], y: Union[np.ndarray, float]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Get the (fractional) positions in pixels (col, row) of coordinates, the inverse of to_coords
+        """
+        x, y = np.asarray(x), np.asarray(y)
+        if self.x_slope == 0 and self.y_slope == 0:
+            return (x - self.x_0) / self.dx, (y - self.y_0) / self.dy
+        det = self.dx * self.dy - self.x_slope * self.y_slope
+        return (self.dy * (x - self.x_0) - self.x_slope * (y - self.y_0)) / det, \
+               (self.dx * (y - self.y_0) - self.y_slope * (x - self.x_0)) / det
+
+    def center_latitudes(self, n_rows: int) -> np.ndarray:
+        """
+        Get the latitudes of the centers of the rows of a north-up raster, the array is cached and read-only
+        """
+        return _center_axis(self.y_0, self.dy, n_rows)
+
+    def center_longitudes(self, n_cols: int) -> np.ndarray:
+        """
+        Get the longitudes of the centers of the columns of a north-up raster, the array is cached and read-only
+        """
+        return _center_axis(self.x_0, self.dx, n_cols)
+
+
+@lru_cache(maxsize=256)
+def _center_axis(origin: float, step: float, size: int) -> np.ndarray:
+    axis = origin + step / 2 + step * np.arange(size)
+    # the array is shared by the rasters of the same grid
+    axis.setflags(write=False)
+    return axis
+
 
 class EPSG(IntEnum):
     WGS_84 = 4326
@@ -57,55 +106,337 @@ class ReSample(Enum):
     BILINEAR = 'bilinear'
 
 
+class CropPlan:
+    """
+    Crop of the rasters of a grid to a bounding box, computed once and applied to a stack of rasters (time x lat x lon)
+    in one vectorized pass. It reproduces gdal.Warp with outputBounds at the resolution of the grid: target pixels
+    whose center falls outside of the grid are nodata, and bilinear resampling ignores the neighbours which are outside
+    of the grid or nodata
+    """
+
+    def __init__(self, geotransform: GeoTransform, shape: Tuple[int, int], bounds: BoundingBox,
+                 resampling_algo: ReSample = None):
+        """
+        @param shape: number of rows (lat) and columns (long) of the grid
+        """
+        assert geotransform.x_slope == 0 and geotransform.y_slope == 0, "Only north-up grids are supported"
+        dx, dy = abs(geotransform.dx), abs(geotransform.dy)
+        n_cols = int((bounds.x_max - bounds.x_min) / dx + 0.5)
+        n_rows = int((bounds.y_max - bounds.y_min) / dy + 0.5)
+        self.shape = (n_rows, n_cols)
+        self.geotransform = GeoTransform(x_0=bounds.x_min, y_0=bounds.y_max, dx=dx, dy=-dy)
+        self.resampling_algo = resampling_algo or ReSample.NEAREST_NEIGHBOUR
+
+        # position of the target pixel centers in the pixels of the grid
+        src_x, src_y = geotransform.to_pixels(self.geotransform.center_longitudes(n_cols),
+                                              self.geotransform.center_latitudes(n_rows))
+        self.rows = self._axis_weights(src_y, shape[0])
+        self.cols = self._axis_weights(src_x, shape[1])
+        # window of the grid read by the plan, so that only this part of the rasters is touched
+        indices = [np.concatenate([index[weight > 0] for index, weight in axis] + [np.zeros(0, dtype=np.int64)])
+                   for axis in [self.rows, self.cols]]
+        self.window = tuple(
+            slice(int(index.min()), int(index.max()) + 1) if index.size > 0 else slice(0, 0) for index in indices)
+        # neighbours without weight (e.g. the right neighbour of a target pixel aligned with the grid) may be outside
+        # of the window, they point to its first pixel instead as they don't contribute to the result
+        self.rows = [(np.where(weight > 0, index - self.window[0].start, 0), weight) for index, weight in self.rows]
+        self.cols = [(np.where(weight > 0, index - self.window[1].start, 0), weight) for index, weight in self.cols]
+
+    @staticmethod
+    @lru_cache(maxsize=128)
+    def get(geotransform: Tuple[float, ...], shape: Tuple[int, int], bounds: Tuple[float, float, float, float],
+            resampling_algo: ReSample = None) -> 'CropPlan':
+        """
+        Get the (cached) plan of a grid given by its geotransform (in the gdal order) and shape
+        """
+        return CropPlan(GeoTransform.from_gdal(geotransform), shape, BoundingBox(*bounds), resampling_algo)
+
+    def _axis_weights(self, positions: np.ndarray, size: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Get the neighbours of the target pixels along an axis of the grid, with their weights (0 for neighbours
+        outside of the grid, and all neighbours of the target pixels whose center is outside of the grid)
+        """
+        inside = (positions >= 0) & (positions < size)
+        if self.resampling_algo == ReSample.NEAREST_NEIGHBOUR:
+            neighbours = [(np.floor(positions), np.ones_like(positions))]
+        else:
+            left = np.floor(positions - 0.5)
+            ratio = positions - 0.5 - left
+            neighbours = [(left, 1 - ratio), (left + 1, ratio)]
+        weights = []
+        for index, weight in neighbours:
+            valid = inside & (index >= 0) & (index < size)
+            weights.append((np.where(valid, index, 0).astype(np.int64), np.where(valid, weight, 0)))
+        return weights
+
+    def apply(self, data: np.ndarray, nodata: Optional[float] = None, windowed: bool = False) -> np.ndarray:
+        """
+        Crop a raster (lat x lon) or a stack of rasters (... x lat x lon) of the grid
+        @param windowed: whether the rasters are already cut to the window of the plan
+        """
+        if not windowed:
+            data = data[..., self.window[0], self.window[1]]
+        if data.shape[-2] == 0 or data.shape[-1] == 0:
+            # the bounding box doesn't overlap the grid
+            return np.full(data.shape[:-2] + self.shape, nodata if nodata is not None else 0, dtype=data.dtype)
+        if nodata is None:
+            valid = None
+        elif np.isnan(nodata):
+            valid = ~np.isnan(data)
+        else:
+            valid = data != nodata
+
+        values = np.zeros(data.shape[:-2] + self.shape, dtype=np.float64)
+        total_weight = np.zeros(data.shape[:-2] + self.shape, dtype=np.float64)
+        for row_index, row_weight in self.rows:
+            for col_index, col_weight in self.cols:
+                weight = np.outer(row_weight, col_weight)
+                neighbours = data[..., row_index[:, None], col_index[None, :]]
+                if valid is not None:
+                    weight = weight * valid[..., row_index[:, None], col_index[None, :]]
+                    neighbours = np.where(weight > 0, neighbours, 0)
+                values += neighbours * weight
+                total_weight += weight
+
+        has_value = total_weight > 1e-10
+        values = np.divide(values, total_weight, out=values, where=has_value)
+        if np.issubdtype(data.dtype, np.integer):
+            values = np.round(values)
+        values[~has_value] = nodata if nodata is not None else 0
+        return values.astype(data.dtype)
+
+
+class Cutline:
+    """
+    Polygon (or multipolygon) to crop rasters to, as gdal.Warp does with a cutline, cropToCutline, targetAlignedPixels
+    and CUTLINE_ALL_TOUCHED. Its mask on a target grid is rasterized once, and cached by the hash of the geometry and
+    the grid (in memory, and in CROP_MASK_CACHE_DIR if it is set)
+    """
+    masks = OrderedDict()
+    max_masks = 256
+    masks_lock = Lock()
+
+    def __init__(self, polygon: list, epsg: int):
+        """
+        @param polygon: coordinates of the polygon (or multipolygon) as in GeoJSON
+        """
+        self.polygon = polygon
+        self.epsg = int(epsg)
+        if isinstance(polygon[0][0][0], (int, float)):
+            self.shape_type = "Polygon"
+        else:
+            self.shape_type = "MultiPolygon"
+        self.geometry = ogr.CreateGeometryFromJson(ujson.dumps({"type": self.shape_type, "coordinates": polygon}))
+        self.hash = hashlib.sha256(bytes(self.geometry.ExportToWkb()) + str(self.epsg).encode()).hexdigest()
+        self.vector_file = None
+
+    def bounds(self, geotransform: GeoTransform) -> BoundingBox:
+        """
+        Get the bounds of the cutline aligned on the resolution of a grid
+        """
+        x_min, x_max, y_min, y_max = self.geometry.GetEnvelope()
+        dx, dy = abs(geotransform.dx), abs(geotransform.dy)
+        return BoundingBox(x_min=math.floor(x_min / dx) * dx, y_min=math.floor(y_min / dy) * dy,
+                           x_max=math.ceil(x_max / dx) * dx, y_max=math.ceil(y_max / dy) * dy)
+
+    def mask(self, geotransform: GeoTransform, shape: Tuple[int, int]) -> np.ndarray:
+        """
+        Get the pixels of a grid touched by the cutline
+        """
+        key = hashlib.sha256(ujson.dumps([self.hash, geotransform.to_gdal(), shape]).encode()).hexdigest()
+        with Cutline.masks_lock:
+            if key in Cutline.masks:
+                Cutline.masks.move_to_end(key)
+                return Cutline.masks[key]
+
+        path = os.path.join(CROP_MASK_CACHE_DIR, f"{key}.npy") if CROP_MASK_CACHE_DIR is not None else None
+        if path is not None and os.path.exists(path):
+            mask = np.load(path)
+        else:
+            mask = self.rasterize(geotransform, shape)
+            if path is not None:
+                Path(CROP_MASK_CACHE_DIR).mkdir(exist_ok=True, parents=True)
+                # writing to a temporary file first, so that other processes never read a partially written file
+                tmp_path = f"{path[:-4]}.{os.getpid()}.tmp.npy"
+                np.save(tmp_path, mask)
+                os.replace(tmp_path, path)
+
+        with Cutline.masks_lock:
+            Cutline.masks[key] = mask
+            while len(Cutline.masks) > Cutline.max_masks:
+                Cutline.masks.popitem(last=False)
+        return mask
+
+    def rasterize(self, geotransform: GeoTransform, shape: Tuple[int, int]) -> np.ndarray:
+        raster = gdal.GetDriverByName("MEM").Create("", shape[1], shape[0], 1, gdal.GDT_Byte)
+        raster.SetGeoTransform(geotransform.to_gdal())
+        # the cutline and the grid are in the same projection, so they don't have spatial references to not be
+        # transformed
+        vector = ogr.GetDriverByName("Memory").CreateDataSource("")
+        layer = vector.CreateLayer("cutline", None, ogr.wkbUnknown)
+        feature = ogr.Feature(layer.GetLayerDefn())
+        feature.SetGeometry(self.geometry)
+        layer.CreateFeature(feature)
+        gdal.RasterizeLayer(raster, [1], layer, burn_values=[1], options=["ALL_TOUCHED=TRUE"])
+        return raster.ReadAsArray().astype(bool)
+
+    def to_shapefile(self, fname: str):
+        driver = ogr.GetDriverByName("ESRI Shapefile")
+        ds = driver.CreateDataSource(fname)
+        srs = osr.SpatialReference()
+        srs.ImportFromEPSG(self.epsg)
+        if self.shape_type == "Polygon":
+            layer = ds.CreateLayer("TempCroppingPolygon", srs, ogr.wkbPolygon)
+        else:
+            layer = ds.CreateLayer("TempCroppingPolygon", srs, ogr.wkbMultiPolygon)
+        field = ogr.FieldDefn("name", ogr.OFTString)
+        layer.CreateField(field)
+        feature = ogr.Feature(layer.GetLayerDefn())
+        feature.SetGeometry(self.geometry)
+        feature.SetField("name", "TempCroppingPolygon")
+        layer.CreateFeature(feature)
+        ds = None
+
+    def get_vector_file(self) -> str:
+        """
+        Get a shapefile of the cutline, for the rasters which are warped by gdal
+        """
+        if self.vector_file is None:
+            self.vector_file = f"/tmp/{uuid4()}.shp"
+            self.to_shapefile(self.vector_file)
+        return self.vector_file
+
+    def close(self):
+        if self.vector_file is not None:
+            for f in glob.glob(f"{self.vector_file[:-4]}*"):
+                os.remove(f)
+            self.vector_file = None
+
+
 class Raster:
     def __init__(self,
-                 array: np.ndarray,
+                 array: Optional[np.ndarray],
                  geotransform: GeoTransform,
                  epsg: Union[int, EPSG],
-                 nodata: float = None):
+                 nodata: float = None,
+                 loader: Callable[[], np.ndarray] = None,
+                 shape: Tuple[int, ...] = None,
+                 dtype: np.dtype = None):
         """
         @param nodata: which value should be no data
+        @param loader: function reading the array when it is first accessed, if the array is not given
+        @param shape: shape of the array read by the loader, so that it isn't read to get it
+        @param dtype: type of the array read by the loader, so that it isn't read to get it
         """
-        self.data = array
+        self._data = array
+        self.loader = loader
+        self._shape = shape
+        self._dtype = np.dtype(dtype) if dtype is not None else None
         self.geotransform = geotransform
         self.epsg = epsg
         self.nodata = nodata
+        # the gdal dataset of the raster may be warped by several threads, which gdal doesn't support
+        self.lock = RLock()
+        # gdal dataset viewing the array, created when a gdal operation needs it
+        self._raster = None
+        # gdal dataset the array is mapped from, which must stay open while the array is used
+        self.source = None
+        assert array is not None or loader is not None, "Please specify either array or loader of the raster."
 
-        self.raster = gdal_array.OpenNumPyArray(array, True)
-        self.raster.SetGeoTransform(geotransform.to_gdal())
-        srs = osr.SpatialReference()
-        srs.ImportFromEPSG(epsg)
-        self.raster.SetSpatialRef(srs)
+    @property
+    def data(self) -> np.ndarray:
+        if self._data is None and self.loader is not None:
+            self._data = self.loader()
+            self.loader = None
+        return self._data
+
+    @data.setter
+    def data(self, array: np.ndarray):
+        self._data = array
+        self.loader = None
+        self._raster = None
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        if self._data is None and self._shape is not None:
+            return self._shape
+        return self.data.shape
+
+    @property
+    def dtype(self) -> np.dtype:
+        if self._data is None and self._dtype is not None:
+            return self._dtype
+        return self.data.dtype
+
+    @property
+    def raster(self):
+        with self.lock:
+            if self._raster is None:
+                raster = gdal_array.OpenNumPyArray(self.data, True)
+                raster.SetGeoTransform(self.geotransform.to_gdal())
+                srs = osr.SpatialReference()
+                srs.ImportFromEPSG(int(self.epsg))
+                raster.SetSpatialRef(srs)
+                self._raster = raster
+            return self._raster
 
     def __del__(self):
-        self.raster = None
-        self.data = None
+        self._raster = None
+        self._data = None
+        self.loader = None
+        self.source = None
 
     @staticmethod
-    def from_geotiff(infile: str) -> 'Raster':
+    def from_geotiff(infile: str, bounds: BoundingBox = None, use_mmap: bool = False) -> Optional['Raster']:
+        """
+        Open a raster file (GeoTIFF, or any other format read by gdal such as ENVI). Its array is only read when it is
+        accessed, and only the pixels intersecting the bounds if they are given (None if there is none)
+        @param use_mmap: memory-map the array instead of reading it, for a single band uncompressed (or raw, e.g. ENVI)
+            file. It falls back to reading the array if gdal can't map the file
+        """
         ds = gdal.Open(infile)
         proj = osr.SpatialReference(wkt=ds.GetProjection())
         epsg = int(proj.GetAttrValue('AUTHORITY', 1) or '4326')
-        data = ds.ReadAsArray()
-        nodata = set(
-            ds.GetRasterBand(i).GetNoDataValue()
-            for i in range(1, data.shape[0] + 1 if len(data.shape) > 2 else 2))
+        nodata = set(ds.GetRasterBand(i).GetNoDataValue() for i in range(1, ds.RasterCount + 1))
         assert len(nodata) == 1, "Do not support multiple no data value by now"
         nodata = list(nodata)[0]
-        return Raster(data, GeoTransform.from_gdal(ds.GetGeoTransform()), epsg, nodata)
+        geotransform = GeoTransform.from_gdal(ds.GetGeoTransform())
+
+        x_off, y_off, x_size, y_size = 0, 0, ds.RasterXSize, ds.RasterYSize
+        if bounds is not None:
+            assert geotransform.x_slope == 0 and geotransform.y_slope == 0, \
+                "Only north-up rasters can be read in a window"
+            # pixels intersecting the bounds
+            cols, rows = geotransform.to_pixels([bounds.x_min, bounds.x_max], [bounds.y_max, bounds.y_min])
+            cols, rows = sorted(cols.tolist()), sorted(rows.tolist())
+            x_off, x_end = max(math.floor(cols[0]), 0), min(math.ceil(cols[1]), ds.RasterXSize)
+            y_off, y_end = max(math.floor(rows[0]), 0), min(math.ceil(rows[1]), ds.RasterYSize)
+            if x_end <= x_off or y_end <= y_off:
+                return None
+            x_size, y_size = x_end - x_off, y_end - y_off
+            geotransform = GeoTransform(x_0=geotransform.x_0 + x_off * geotransform.dx, dx=geotransform.dx,
+                                        y_0=geotransform.y_0 + y_off * geotransform.dy, dy=geotransform.dy)
+
+        if use_mmap and ds.RasterCount == 1:
+            try:
+                array = ds.GetRasterBand(1).GetVirtualMemAutoArray(gdal.GF_Read)
+                if array is not None:
+                    raster = Raster(array[y_off:y_off + y_size, x_off:x_off + x_size], geotransform, epsg, nodata)
+                    raster.source = ds
+                    return raster
+            except RuntimeError:
+                pass
+        # only the blocks of the window are read by gdal
+        shape = (y_size, x_size) if ds.RasterCount == 1 else (ds.RasterCount, y_size, x_size)
+        dtype = gdal_array.GDALTypeCodeToNumericTypeCode(ds.GetRasterBand(1).DataType)
+        return Raster(None, geotransform, epsg, nodata, loader=lambda: ds.ReadAsArray(x_off, y_off, x_size, y_size),
+                      shape=shape, dtype=dtype)
 
     def get_center_latitude(self):
-        # np.linspace won't work
-        return np.asarray([
-            self.geotransform.y_0 + self.geotransform.dy / 2 + self.geotransform.dy * i
-            for i in range(self.data.shape[0])
-        ])
+        return self.geotransform.center_latitudes(self.shape[0])
 
     def get_center_longitude(self):
-        return np.asarray([
-            self.geotransform.x_0 + self.geotransform.dx / 2 + self.geotransform.dx * i
-            for i in range(self.data.shape[1])
-        ])
+        return self.geotransform.center_longitudes(self.shape[1])
 
     def crop(self,
              bounds: BoundingBox = None,
@@ -136,7 +467,8 @@ class Raster:
 
         if touch_cutline:
             warp_options['warpOptions'] = ['CUTLINE_ALL_TOUCHED=TRUE']
-        tmp_ds = gdal.Warp(tmp_file, self.raster, **warp_options)
+        with self.lock:
+            tmp_ds = gdal.Warp(tmp_file, self.raster, **warp_options)
         if tmp_ds is None:
             gdal.Unlink(tmp_file)
             return None
@@ -147,6 +479,78 @@ class Raster:
 
         return Raster(cropped_array, cropped_geotransform, self.epsg, self.nodata)
 
+    @staticmethod
+    def crop_many(rasters: List['Raster'], bounds: BoundingBox = None, resampling_algo: ReSample = None,
+                  cutline: Cutline = None) -> List[Union['Raster', None]]:
+        """
+        Crop rasters to a bounding box or a cutline. Rasters sharing the same grid (geotransform, epsg, shape, nodata)
+        are cropped together with a CropPlan: only the window of the plan is stacked, and the arrays of lazy rasters are
+        only read when their group is cropped. The others are warped one by one with Raster.crop
+        """
+        assert (bounds is None) != (cutline is None), "Please specify either bounds or cutline to crop."
+        groups = Raster.group_by_grid(rasters, cutline)
+
+        results = [None] * len(rasters)
+        try:
+            for key, indices in groups.items():
+                if isinstance(key, int):
+                    if cutline is not None:
+                        results[key] = rasters[key].crop(vector_file=cutline.get_vector_file(),
+                                                         resampling_algo=resampling_algo, touch_cutline=True)
+                    else:
+                        results[key] = rasters[key].crop(bounds=bounds, resampling_algo=resampling_algo)
+                    continue
+                first = rasters[indices[0]]
+                plan_bounds = bounds if cutline is None else cutline.bounds(first.geotransform)
+                plan = CropPlan.get(key[0], key[2], plan_bounds.to_gdal(), resampling_algo)
+                cropped = plan.apply(np.stack([rasters[i].data[plan.window] for i in indices]), first.nodata,
+                                     windowed=True)
+                if cutline is not None:
+                    cropped[:, ~cutline.mask(plan.geotransform, plan.shape)] = \
+                        first.nodata if first.nodata is not None else 0
+                for i, data in zip(indices, cropped):
+                    results[i] = Raster(data, plan.geotransform, first.epsg, first.nodata)
+        finally:
+            if cutline is not None:
+                cutline.close()
+        return results
+
+    @staticmethod
+    def group_by_grid(rasters: List['Raster'], cutline: Cutline = None) -> Dict[Union[tuple, int], List[int]]:
+        """
+        Group the rasters cropped together by crop_many by their grid (geotransform, epsg, shape, dtype, nodata). Rasters
+        which can't be cropped with a CropPlan are alone in their group, whose key is their index
+        """
+        groups = {}
+        for i, raster in enumerate(rasters):
+            if raster.geotransform.x_slope != 0 or raster.geotransform.y_slope != 0 or len(raster.shape) != 2 \
+                    or (cutline is not None and int(raster.epsg) != cutline.epsg):
+                key = i
+            else:
+                key = (raster.geotransform.to_gdal(), int(raster.epsg), raster.shape, raster.dtype, raster.nodata)
+            groups.setdefault(key, []).append(i)
+        return groups
+
+    @staticmethod
+    def crop_many_size(rasters: List['Raster'], bounds: BoundingBox = None, resampling_algo: ReSample = None,
+                       cutline: Cutline = None) -> int:
+        """
+        Estimate the number of bytes allocated by crop_many: the stack of the windows of every grid, the weights and
+        values computed for it, and the results. Rasters warped one by one count for their whole array
+        """
+        assert (bounds is None) != (cutline is None), "Please specify either bounds or cutline to crop."
+        size = 0
+        for key, indices in Raster.group_by_grid(rasters, cutline).items():
+            if isinstance(key, int):
+                size += int(np.prod(rasters[key].shape)) * rasters[key].dtype.itemsize
+                continue
+            plan_bounds = bounds if cutline is None else cutline.bounds(rasters[indices[0]].geotransform)
+            plan = CropPlan.get(key[0], key[2], plan_bounds.to_gdal(), resampling_algo)
+            window = (plan.window[0].stop - plan.window[0].start) * (plan.window[1].stop - plan.window[1].start)
+            # values and total weights are float64
+            size += len(indices) * (window * key[3].itemsize + plan.shape[0] * plan.shape[1] * (16 + key[3].itemsize))
+        return size
+
     def to_geotiff(self, outfile: str):
         driver = gdal.GetDriverByName("GTiff")
         if len(self.data.shape) == 2:
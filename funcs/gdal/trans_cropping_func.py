@@ -1,11 +1,6 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
 
-import os
-import glob
-import uuid
-from osgeo import osr, ogr
-from shapely.geometry import shape
 from typing import Optional, Dict
 
 from dtran.argtype import ArgType
@@ -14,7 +9,7 @@ from dtran.ifunc import IFunc, IFuncType
 from dtran.metadata import Metadata
 from drepr import outputs
 from drepr.executors.readers.reader_container import ReaderContainer
-from funcs.gdal.raster import Raster, GeoTransform, BoundingBox, ReSample
+from funcs.gdal.raster import Raster, GeoTransform, BoundingBox, ReSample, Cutline
 from funcs.gdal.raster_to_dataset import raster_to_dataset
 
 
@@ -56,6 +51,9 @@ class CroppingTransFunc(IFunc):
         self.xmax = xmax
         self.ymax = ymax
         self.region_label = region_label
+        # rasters of the dataset, extracted when the function is executed unless they are given
+        self.rasters = None
+        self.shapes = None
 
         self.use_temp = True
         if self.shape_sm is None:
@@ -67,23 +65,7 @@ class CroppingTransFunc(IFunc):
 
     @staticmethod
     def shape_array_to_shapefile(data, fname):
-        driver = ogr.GetDriverByName("ESRI Shapefile")
-        ds = driver.CreateDataSource(fname)
-        srs = osr.SpatialReference()
-        srs.ImportFromEPSG(data['epsg'])
-        if isinstance(data['polygon'][0][0][0], (int, float)):
-            shape_type = "Polygon"
-            layer = ds.CreateLayer("TempCroppingPolygon", srs, ogr.wkbPolygon)
-        else:
-            shape_type = "MultiPolygon"
-            layer = ds.CreateLayer("TempCroppingPolygon", srs, ogr.wkbMultiPolygon)
-        field = ogr.FieldDefn("name", ogr.OFTString)
-        layer.CreateField(field)
-        feature = ogr.Feature(layer.GetLayerDefn())
-        feature.SetGeometry(ogr.CreateGeometryFromWkt(shape({"type": shape_type, "coordinates": data['polygon']}).wkt))
-        feature.SetField("name", "TempCroppingPolygon")
-        layer.CreateFeature(feature)
-        ds = None
+        Cutline(data['polygon'], data['epsg']).to_shapefile(fname)
 
     @staticmethod
     def get_namespaces(sm: ArgType.DataSet):
@@ -94,6 +76,14 @@ class CroppingTransFunc(IFunc):
 
     @staticmethod
     def extract_raster(sm: ArgType.DataSet, variable_name: str):
+        if isinstance(sm, ShardedBackend):
+            # extracting rasters shard by shard, skipping the shards which don't have the variable
+            return [
+                raster
+                for shard in sm.iter_shards(variables=[variable_name] if variable_name else None)
+                for raster in CroppingTransFunc.extract_raster(shard, variable_name)
+            ]
+
         mint_ns, mint_geo_ns, rdf_ns = CroppingTransFunc.get_namespaces(sm)
 
         rasters = []
@@ -150,44 +140,61 @@ class CroppingTransFunc(IFunc):
 
         return shapes
 
+    def crop_size(self) -> int:
+        """
+        Estimate the number of bytes allocated to crop the rasters of the dataset (see Raster.crop_many_size)
+        """
+        if self.rasters is None:
+            self.rasters = CroppingTransFunc.extract_raster(self.dataset, self.variable_name)
+        rasters = [r["raster"] for r in self.rasters]
+        if self.use_bbox:
+            bb = BoundingBox(x_min=self.xmin, y_min=self.ymin, x_max=self.xmax, y_max=self.ymax)
+            return Raster.crop_many_size(rasters, bb, ReSample.BILINEAR)
+        if self.shapes is None:
+            self.shapes = CroppingTransFunc.extract_shape(self.shape_sm)
+        return sum(Raster.crop_many_size(rasters, resampling_algo=ReSample.BILINEAR,
+                                         cutline=Cutline(shape['polygon'], shape['epsg']))
+                   for shape in self.shapes)
+
     def _crop_boundbox(self):
-        self.rasters = CroppingTransFunc.extract_raster(self.dataset, self.variable_name)
+        if self.rasters is None:
+            self.rasters = CroppingTransFunc.extract_raster(self.dataset, self.variable_name)
         bb = BoundingBox(x_min=self.xmin, y_min=self.ymin, x_max=self.xmax, y_max=self.ymax)
 
         results = []
-        for r in self.rasters:
-            cropped_raster = r["raster"].crop(bounds=bb, resampling_algo=ReSample.BILINEAR)
+        # rasters of the same grid (e.g. the timesteps of a variable) are cropped together in one pass
+        cropped_rasters = Raster.crop_many([r["raster"] for r in self.rasters], bb, ReSample.BILINEAR)
+        for r, cropped_raster in zip(self.rasters, cropped_rasters):
             if cropped_raster is None:
                 continue
-            results.append(raster_to_dataset(cropped_raster, r["variable_name"], timestamp=r["timestamp"], region_label=self.region_label))
+            results.append((raster_to_dataset(cropped_raster, r["variable_name"], timestamp=r["timestamp"], region_label=self.region_label), r["variable_name"]))
         assert len(results) > 0, "No overlapping data for the given region"
         self.results = ShardedBackend(len(results))
-        for result, temp_file in results:
-            self.results.add(result(self.results.inject_class_id))
+        for (result, temp_file), variable_name in results:
+            self.results.add(result(self.results.inject_class_id), {"variables": {variable_name}} if variable_name else None)
             ReaderContainer.get_instance().delete(temp_file)
 
     def _crop_shape_dataset(self):
-        self.rasters = CroppingTransFunc.extract_raster(self.dataset, self.variable_name)
-        self.shapes = CroppingTransFunc.extract_shape(self.shape_sm)
+        if self.rasters is None:
+            self.rasters = CroppingTransFunc.extract_raster(self.dataset, self.variable_name)
+        if self.shapes is None:
+            self.shapes = CroppingTransFunc.extract_shape(self.shape_sm)
 
         results = []
+        rasters = [r["raster"] for r in self.rasters]
         for shape in self.shapes:
-            tempfile_name = f"/tmp/{uuid.uuid4()}.shp"
-            CroppingTransFunc.shape_array_to_shapefile(shape, tempfile_name)
-            for r in self.rasters:
-                cropped_raster = r["raster"].crop(
-                    vector_file=tempfile_name, resampling_algo=ReSample.BILINEAR, touch_cutline=True
-                )
+            # masks of the shape are rasterized once per grid and cached, instead of warping every raster with it
+            cropped_rasters = Raster.crop_many(rasters, resampling_algo=ReSample.BILINEAR,
+                                               cutline=Cutline(shape['polygon'], shape['epsg']))
+            for r, cropped_raster in zip(self.rasters, cropped_rasters):
                 if cropped_raster is None:
                     continue
                 place = shape['place']
-                results.append(raster_to_dataset(cropped_raster, r["variable_name"], place=place, timestamp=r["timestamp"]))
-            for f in glob.glob(f"{tempfile_name[:-4]}*"):
-                os.remove(f)
+                results.append((raster_to_dataset(cropped_raster, r["variable_name"], place=place, timestamp=r["timestamp"]), r["variable_name"]))
         assert len(results) > 0, "No overlapping data for the given region"
         self.results = ShardedBackend(len(results))
-        for result, temp_file in results:
-            self.results.add(result(self.results.inject_class_id))
+        for (result, temp_file), variable_name in results:
+            self.results.add(result(self.results.inject_class_id), {"variables": {variable_name}} if variable_name else None)
             ReaderContainer.get_instance().delete(temp_file)
 
     def crop_shape_shardedbackend(self):
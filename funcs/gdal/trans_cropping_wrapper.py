@@ -1,6 +1,12 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
 from typing import *
 from inspect import signature
 
+from dtran.argtype import ArgType
+from dtran.helpers import parse_size
 from dtran.ifunc import IFunc
 from dtran.metadata import Metadata
 from funcs import CroppingTransFunc
@@ -10,19 +16,35 @@ class CroppingTransWrapper(IFunc):
     func_cls = CroppingTransFunc
     id = CroppingTransFunc.id
     description = CroppingTransFunc.description
-    inputs = CroppingTransFunc.inputs
+    inputs = {
+        **CroppingTransFunc.inputs,
+        "n_workers": ArgType.Number(optional=True),
+        "max_memory": ArgType.String(optional=True),
+    }
     outputs = CroppingTransFunc.outputs
     func_type = CroppingTransFunc.func_type
     friendly_name = CroppingTransFunc.friendly_name
-    example = CroppingTransFunc.example
+    example = {
+        **CroppingTransFunc.example,
+        "n_workers": "4",
+        "max_memory": "1GB",
+    }
 
-    def __init__(self, **kwargs):
+    def __init__(self, n_workers: int = None, max_memory: str = "1GB", **kwargs):
+        """
+        :param n_workers: number of regions and variables cropped at the same time, which is also the number of
+            results held in memory before they are consumed (number of CPUs by default)
+        :param max_memory: maximum number of bytes allocated by the regions and variables cropped at the same time
+            (e.g. "1GB"), estimated from the windows of the rasters they crop. A region larger than it is cropped alone
+        """
         try:
             signature(CroppingTransWrapper.func_cls.__init__).bind(CroppingTransWrapper.func_cls, **kwargs)
         except TypeError:
             print(f"Cannot initialize cls: {CroppingTransWrapper.func_cls}")
             raise
         self.func_args = kwargs
+        self.n_workers = int(n_workers) if n_workers is not None else (os.cpu_count() or 1)
+        self.max_memory = parse_size(max_memory)
 
     async def exec(self) -> Union[dict, Generator[dict, None, None], AsyncGenerator[dict, None]]:
         func_args = self.func_args.copy()
@@ -38,15 +60,45 @@ class CroppingTransWrapper(IFunc):
         else:
             async for variable in func_args['variable_name']:
                 variables.append(variable)
-        async for dataset in func_args['dataset']:
-            for shape in shapes:
+
+        loop = asyncio.get_event_loop()
+        # regions and variables are cropped by threads, which share the rasters of the dataset without copying them
+        with ThreadPoolExecutor(max_workers=self.n_workers) as pool:
+            async for dataset in func_args['dataset']:
+                # extracting the rasters of every variable once, instead of once per region
+                rasters = {}
                 for variable in variables:
-                    func = self.func_cls(**{**func_args, 'shape': shape, 'variable_name': variable, 'dataset': dataset})
-                    func.get_preference = self.get_preference
-                    try:
-                        yield func.exec()
-                    except AssertionError as e:
-                        print(e)
+                    rasters[variable] = await loop.run_in_executor(
+                        pool, self.func_cls.extract_raster, dataset, variable)
+
+                # tasks being computed or waiting, with the number of bytes they allocate
+                tasks = deque()
+                for shape in shapes:
+                    for variable in variables:
+                        func = self.func_cls(**{**func_args, 'shape': shape, 'variable_name': variable, 'dataset': dataset})
+                        func.get_preference = self.get_preference
+                        func.rasters = rasters[variable]
+                        size = await loop.run_in_executor(pool, func.crop_size)
+                        # yielding results in order, with at most n_workers of them and max_memory bytes being
+                        # computed or waiting
+                        while len(tasks) > 0 and (len(tasks) >= self.n_workers or
+                                                  sum(task_size for _, task_size in tasks) + size > self.max_memory):
+                            result = await self.next_result(tasks)
+                            if result is not None:
+                                yield result
+                        tasks.append((loop.run_in_executor(pool, func.exec), size))
+                while len(tasks) > 0:
+                    result = await self.next_result(tasks)
+                    if result is not None:
+                        yield result
+
+    @staticmethod
+    async def next_result(tasks: Deque[Tuple[asyncio.Future, int]]) -> Optional[dict]:
+        try:
+            return await tasks.popleft()[0]
+        except AssertionError as e:
+            print(e)
+            return None
 
     def validate(self) -> bool:
         return True
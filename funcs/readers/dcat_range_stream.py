@@ -1,15 +1,183 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
 
+import atexit
+import logging
+from collections import OrderedDict, Counter
+from concurrent.futures import ThreadPoolExecutor, Future
 from datetime import datetime
-from typing import Union, Generator, AsyncGenerator, Optional, Dict
+from threading import Lock, local
+from typing import Union, Generator, AsyncGenerator, Optional, Dict, Iterator, Tuple, List
 from isodate import parse_duration
 from dateutil import parser
 
 from dtran.argtype import ArgType
+from dtran.helpers import parse_size
 from dtran.ifunc import IFunc, IFuncType
 from dtran.dcat.api import DCatAPI
 from dtran.metadata import Metadata
+from funcs.readers.dcat_read_func import ResourceManager, DcatReadFunc
+from funcs.readers.dcat_resource_index import ResourceIndex
+
+Window = Tuple[datetime, datetime]
+
+
+class WindowPrefetcher:
+    """
+    Downloads the resources of upcoming windows of a dataset in the background, so that their downloads overlap the
+    processing of the current window. A prefetched resource is kept from being evicted until a reader of the window
+    takes its own reference to it (by downloading it), and the estimated bytes of the prefetched resources which are not
+    taken yet are bounded by max_bytes
+    """
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, dataset_id: str, max_bytes: int):
+        self.dataset_id = dataset_id
+        self.max_bytes = max_bytes
+        self.resource_manager = ResourceManager.get_instance()
+        # windows are prefetched one after another, the resources of a window are downloaded concurrently
+        self.pool = ThreadPoolExecutor(max_workers=1)
+        self.futures: Dict[Window, Future] = OrderedDict()
+        # estimated bytes of every reference held on the prefetched resources which are not taken by a reader yet
+        self.held: Dict[str, List[int]] = {}
+        # number of running prefetches of each resource
+        self.prefetching = Counter()
+        # downloads of resources by readers which are not matched with a held reference yet, as a reader may download a
+        # resource before its prefetch is done
+        self.taken = Counter()
+        self.held_bytes = 0
+        self.closed = False
+        # whether all references are released, then resources are released as soon as they are prefetched
+        self.released = False
+        self.lock = Lock()
+        # marks the threads downloading for the prefetcher, whose downloads are not taken by readers
+        self.local = local()
+        self.resource_manager.download_listeners.append(self.on_download)
+
+    def schedule(self, windows: List[Window]):
+        """
+        Prefetch windows, in order, which are not prefetched yet (or were skipped because of the byte budget)
+        """
+        for window in windows:
+            future = self.futures.get(window)
+            if future is None or (future.done() and not future.result()):
+                self.futures[window] = self.pool.submit(self.fetch, window)
+
+    def fetch(self, window: Window) -> bool:
+        """
+        :return: False if the window is skipped because it doesn't fit in the byte budget
+        """
+        try:
+            resources = ResourceIndex.get_instance().find_resources(self.dataset_id, *window)
+            size = self.resource_manager.estimate_size(resources)["download_bytes"]
+        except Exception as e:
+            self.logger.warning(f"Cannot prefetch window {window[0]} - {window[1]}: {e}")
+            return False
+        if len(resources) == 0:
+            return True
+        with self.lock:
+            if self.held_bytes + size > self.max_bytes:
+                return False
+            self.held_bytes += size
+            for resource in resources:
+                self.prefetching[resource['resource_id']] += 1
+
+        self.logger.debug(f"Prefetching {len(resources)} resources of window {window[0]} - {window[1]}")
+        futures = [
+            (resource['resource_id'], size // len(resources) + (1 if j < size % len(resources) else 0),
+             self.resource_manager.downloader.pool.submit(self.download, resource))
+            for j, resource in enumerate(resources)
+        ]
+        for resource_id, resource_size, future in futures:
+            try:
+                future.result()
+                is_held = True
+            except Exception as e:
+                # the reader of the window downloads the resource again, and reports the error if it fails again
+                self.logger.warning(f"Cannot prefetch resource {resource_id}: {e}")
+                is_held = False
+            with self.lock:
+                self.prefetching[resource_id] -= 1
+                if is_held and not self.released:
+                    self.held.setdefault(resource_id, []).append(resource_size)
+                else:
+                    self.held_bytes -= resource_size
+            if is_held and self.released:
+                self.resource_manager.unlink(resource_id)
+            self.hand_off(resource_id)
+        return True
+
+    def download(self, resource: dict):
+        self.local.is_prefetching = True
+        try:
+            self.resource_manager.download(resource['resource_id'], DcatReadFunc.get_resource_metadata(resource), False)
+        finally:
+            self.local.is_prefetching = False
+
+    def on_download(self, resource_id: str):
+        if getattr(self.local, 'is_prefetching', False):
+            return
+        with self.lock:
+            if resource_id not in self.held and self.prefetching[resource_id] == 0:
+                return
+            self.taken[resource_id] += 1
+        self.hand_off(resource_id)
+
+    def hand_off(self, resource_id: str):
+        """
+        Release the references held on a resource which are taken by readers, letting them decide when it is evicted
+        """
+        released = []
+        with self.lock:
+            held = self.held.get(resource_id, [])
+            while self.taken[resource_id] > 0 and len(held) > 0:
+                self.taken[resource_id] -= 1
+                released.append(held.pop(0))
+            if len(held) == 0:
+                self.held.pop(resource_id, None)
+                if self.prefetching[resource_id] == 0:
+                    # downloads which are not matched with any reference don't apply to later prefetches
+                    self.taken.pop(resource_id, None)
+                    self.prefetching.pop(resource_id, None)
+            self.held_bytes -= sum(released)
+            is_done = self.closed and len(self.held) == 0 and sum(self.prefetching.values()) == 0
+        for _ in released:
+            self.resource_manager.unlink(resource_id)
+        if is_done:
+            self.release()
+
+    def close(self, wait_for_readers: bool = False):
+        """
+        Stop prefetching, and release the resources which are not taken by readers.
+        :param wait_for_readers: keep the resources until readers take them instead, as readers of the last windows may
+            be behind the stream. Resources which are never taken are released when the process exits
+        """
+        for future in self.futures.values():
+            future.cancel()
+        self.pool.shutdown(wait=False)
+        with self.lock:
+            self.closed = True
+            is_done = len(self.held) == 0 and sum(self.prefetching.values()) == 0
+        if wait_for_readers and not is_done:
+            atexit.register(self.release)
+        else:
+            self.release()
+
+    def release(self):
+        """
+        Release all references held by the prefetcher, including those of the prefetches which are running
+        """
+        atexit.unregister(self.release)
+        with self.lock:
+            if self.released:
+                return
+            self.released = True
+            held, self.held = self.held, {}
+            self.held_bytes -= sum(sum(sizes) for sizes in held.values())
+        self.resource_manager.download_listeners.remove(self.on_download)
+        for resource_id, sizes in held.items():
+            for _ in sizes:
+                self.resource_manager.unlink(resource_id)
 
 
 class DcatRangeStream(IFunc):
@@ -22,7 +190,9 @@ class DcatRangeStream(IFunc):
         "dataset_id": ArgType.String,
         "start_time": ArgType.DateTime(optional=True),
         "end_time": ArgType.DateTime(optional=True),
-        "step_time": ArgType.String(optional=True)
+        "step_time": ArgType.String(optional=True),
+        "read_ahead": ArgType.Number(optional=True),
+        "read_ahead_size": ArgType.String(optional=True),
     }
     outputs = {
         "start_time": ArgType.DateTime,
@@ -33,9 +203,20 @@ class DcatRangeStream(IFunc):
         "start_time": "2020-03-02T12:30:55",
         "end_time": "2020-03-02T12:30:55",
         "step_time": "P3Y6M4DT12H30M5S",
+        "read_ahead": "2",
+        "read_ahead_size": "100MB",
     }
 
-    def __init__(self, dataset_id: str, start_time: datetime = None, end_time: datetime = None, step_time: str = None):
+    def __init__(self, dataset_id: str, start_time: datetime = None, end_time: datetime = None, step_time: str = None,
+                 read_ahead: int = 0, read_ahead_size: str = None):
+        """
+        :param read_ahead: number of upcoming windows whose resources are downloaded in the background
+        :param read_ahead_size: maximum number of bytes downloaded ahead (e.g. "100MB"), half of the capacity of the
+            resource cache by default
+        """
+        self.dataset_id = dataset_id
+        self.read_ahead = int(read_ahead or 0)
+        self.read_ahead_size = parse_size(read_ahead_size) if read_ahead_size is not None else None
         if (start_time is None) or (end_time is None):
             dataset = DCatAPI.get_instance().find_dataset_by_id(dataset_id)
             self.start_time = start_time or parser.parse(dataset['metadata']['temporal_coverage']['start_time'])
@@ -51,13 +232,43 @@ class DcatRangeStream(IFunc):
         else:
             self.step_time = parse_duration(step_time)
 
-    async def exec(self) -> Union[dict, Generator[dict, None, None], AsyncGenerator[dict, None]]:
+    @classmethod
+    def estimate(cls, inputs: Dict[str, any]) -> Optional[Dict[str, Union[int, float, str]]]:
+        if 'dataset_id' not in inputs:
+            return None
+        stream = cls(**inputs)
+        return {
+            "results": sum(1 for _ in stream.windows()),
+            "start_time": stream.start_time.isoformat(),
+            "end_time": stream.end_time.isoformat(),
+        }
+
+    def windows(self) -> Iterator[Tuple[datetime, datetime]]:
         start_time = self.start_time
         while start_time < self.end_time:
             end_time = min(start_time + self.step_time, self.end_time)
-            yield {"start_time": start_time, "end_time": end_time}
+            yield start_time, end_time
             start_time = end_time
 
+    async def exec(self) -> Union[dict, Generator[dict, None, None], AsyncGenerator[dict, None]]:
+        if self.read_ahead <= 0:
+            for start_time, end_time in self.windows():
+                yield {"start_time": start_time, "end_time": end_time}
+            return
+
+        windows = list(self.windows())
+        prefetcher = WindowPrefetcher(self.dataset_id, self.read_ahead_size if self.read_ahead_size is not None
+                                      else ResourceManager.get_instance().max_capacity // 2)
+        try:
+            for i, (start_time, end_time) in enumerate(windows):
+                prefetcher.schedule(windows[i:i + self.read_ahead + 1])
+                yield {"start_time": start_time, "end_time": end_time}
+        except BaseException:
+            prefetcher.close()
+            raise
+        # the readers consuming the stream may not have taken the last windows yet
+        prefetcher.close(wait_for_readers=True)
+
     def validate(self) -> bool:
         return True
 
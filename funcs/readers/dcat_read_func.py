@@ -1,43 +1,59 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
 
+import fcntl
 import logging
 import os
 import shutil
-import subprocess
+import tarfile
 import time
+import zipfile
 import requests
 from collections import OrderedDict
 from datetime import datetime
-from pathlib import Path
-from typing import Union, Dict
+from pathlib import Path, PurePosixPath
+from threading import Lock
+from typing import Union, Dict, List, Optional, Tuple, BinaryIO, Callable, Set
 from functools import partial
 from playhouse.kv import KeyValue
-from peewee import SqliteDatabase, Model, UUIDField, IntegerField, BooleanField, BigIntegerField, DoesNotExist
+from playhouse.migrate import SqliteMigrator, migrate
+from peewee import SqliteDatabase, Model, UUIDField, IntegerField, BooleanField, BigIntegerField, DateTimeField, \
+    TextField, DoesNotExist
 
 from drepr import DRepr
 from drepr.outputs import ArrayBackend, GraphBackend
 from dtran.argtype import ArgType
 from dtran.backend import ShardedBackend, ShardedClassID, LazyLoadBackend
 from dtran.dcat.api import DCatAPI
+from funcs.readers.dcat_resource_index import ResourceIndex
+from dtran.helpers import parse_size
 from dtran.ifunc import IFunc, IFuncType
+from funcs.readers.downloader import Downloader
 
 DATA_CATALOG_DOWNLOAD_DIR = os.path.abspath(os.environ["DATA_CATALOG_DOWNLOAD_DIR"])
-if os.environ['NO_CHECK_CERTIFICATE'].lower().strip() == 'true':
-    DOWNLOAD_CMD = "wget --no-check-certificate"
-else:
-    DOWNLOAD_CMD = "wget"
+VERIFY_CERTIFICATE = os.environ['NO_CHECK_CERTIFICATE'].lower().strip() != 'true'
+# number of resources downloaded concurrently
+DOWNLOAD_WORKERS = int(os.environ.get('DCAT_DOWNLOAD_WORKERS', 8))
 
-Path(DATA_CATALOG_DOWNLOAD_DIR).mkdir(exist_ok=True, parents=True)
+LOCK_DIR = os.path.join(DATA_CATALOG_DOWNLOAD_DIR, '.locks')
 
-UNITS_MAPPING = {
-    'PB': 1 << 50,
-    'TB': 1 << 40,
-    'GB': 1 << 30,
-    'MB': 1 << 20,
-    'KB': 1 << 10,
-    'B': 1
-}
+Path(DATA_CATALOG_DOWNLOAD_DIR).mkdir(exist_ok=True, parents=True)
+Path(LOCK_DIR).mkdir(exist_ok=True)
+
+# capacity of the download directory. Unused resources are evicted when a download would fill the directory above the
+# high watermark (fraction of the capacity), until it is filled below the low watermark
+CACHE_CAPACITY = parse_size(os.environ.get('DCAT_CACHE_CAPACITY', '200MB'))
+CACHE_HIGH_WATERMARK = float(os.environ.get('DCAT_CACHE_HIGH_WATERMARK', 1.0))
+CACHE_LOW_WATERMARK = float(os.environ.get('DCAT_CACHE_LOW_WATERMARK', 0.5))
+# eviction policy: lru (least recently used first), lfu (least frequently used first) or size (largest first)
+CACHE_POLICY = os.environ.get('DCAT_CACHE_POLICY', 'lru').lower()
+# compressed resources are extracted if true, otherwise they are kept as archives and their content is read through the
+# GDAL virtual file systems (e.g. /vsizip/), which requires the readers of the dataset to use GDAL
+EXTRACT_COMPRESSED = os.environ.get('DCAT_EXTRACT_COMPRESSED', 'true').lower().strip() == 'true'
+# prefixes of GDAL virtual file systems by type of compressed resources
+GDAL_VSI_PREFIXES = {".zip": "/vsizip/", ".tar": "/vsitar/", ".tar.gz": "/vsitar/"}
+# counters of the cache, stored with current_size
+CACHE_STATS = ['hits', 'misses', 'bytes_saved', 'bytes_downloaded', 'evictions', 'bytes_evicted']
 
 
 class Resource(Model):
@@ -45,26 +61,83 @@ class Resource(Model):
     ref_count = IntegerField(default=0, index=True)
     is_downloading = BooleanField(default=False)
     size = BigIntegerField(default=0)
+    last_access = DateTimeField(null=True)
+    hit_count = IntegerField(default=0)
+    # file of a compressed resource which is read, relative to its extracted folder or its archive
+    member = TextField(null=True)
 
     class Meta:
         database = SqliteDatabase(os.path.join(DATA_CATALOG_DOWNLOAD_DIR, 'dcat_read_func.db'), timeout=10)
 
 
+class ResourceLock:
+    """
+    Lock on a resource shared by the processes using the download directory (flock on a file of LOCK_DIR). It is held
+    exclusively while the resource is downloaded or evicted and shared while the resource is used, so that processes
+    waiting for a download, or for the users of a resource to release it, wake up as soon as the lock is released
+    """
+
+    def __init__(self, resource_id: str):
+        self.path = os.path.join(LOCK_DIR, resource_id + '.lock')
+        self.fd = None
+
+    def acquire(self, exclusive: bool, blocking: bool = True) -> bool:
+        if self.fd is None:
+            self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o666)
+        flags = (fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH) | (0 if blocking else fcntl.LOCK_NB)
+        try:
+            # acquiring a lock which is already held converts it (e.g. from exclusive to shared)
+            fcntl.flock(self.fd, flags)
+            return True
+        except BlockingIOError:
+            return False
+
+    def release(self):
+        if self.fd is not None:
+            # closing the file releases the lock
+            os.close(self.fd)
+            self.fd = None
+
+
 class ResourceManager:
     instance = None
 
     def __init__(self):
-        self.max_capacity = 200 * UNITS_MAPPING['MB']
-        self.max_clear_size = 100 * UNITS_MAPPING['MB']
-        assert self.max_capacity >= self.max_clear_size, "max_capacity cannot be less than max_clear_size"
-        self.poll_interval = 10
+        self.max_capacity = CACHE_CAPACITY
+        self.high_watermark = CACHE_HIGH_WATERMARK
+        self.low_watermark = CACHE_LOW_WATERMARK
+        assert 0 <= self.low_watermark <= self.high_watermark <= 1, \
+            "cache watermarks must satisfy 0 <= low watermark <= high watermark <= 1"
+        self.policy = CACHE_POLICY
+        assert self.policy in {'lru', 'lfu', 'size'}, f"Unknown cache eviction policy {self.policy}"
+        # delay before checking again the state of a resource whose lock was acquired before its download started
+        self.poll_interval = 0.1
         self.compressed_resource_types = {".zip", ".tar.gz", ".tar"}
+        self.extract_compressed = EXTRACT_COMPRESSED
+        self.downloader = Downloader(DOWNLOAD_WORKERS, verify=VERIFY_CERTIFICATE)
+        # shared locks of the resources used by this process
+        self.locks: Dict[str, List[ResourceLock]] = {}
+        self.locks_lock = Lock()
+        # callbacks notified with the id of a resource each time this process takes a reference to it by downloading it
+        self.download_listeners: List[Callable[[str], None]] = []
         self.db = Resource._meta.database
         self.db.connect()
         self.db.create_tables([Resource], safe=True)
+        # adding the access tracking columns to databases created before them
+        columns = {column.name for column in self.db.get_columns(Resource._meta.table_name)}
+        migrator = SqliteMigrator(self.db)
+        migrate(*[
+            migrator.add_column(Resource._meta.table_name, name, field)
+            for name, field in [('last_access', DateTimeField(null=True)), ('hit_count', IntegerField(default=0)),
+                                ('member', TextField(null=True))]
+            if name not in columns
+        ])
         self.db.close()
         self.kv = KeyValue(database=self.db, value_field=BigIntegerField())
         with self.db.atomic('EXCLUSIVE'):
+            for key in CACHE_STATS:
+                if key not in self.kv:
+                    self.kv[key] = 0
             # initializing current_size of DATA_CATALOG_DOWNLOAD_DIR in the database
             if 'current_size' not in self.kv:
                 self.kv['current_size'] = sum(f.stat().st_size for f in Path(DATA_CATALOG_DOWNLOAD_DIR).rglob('*'))
@@ -72,12 +145,9 @@ class ResourceManager:
                 for resource in Resource.select():
                     if resource.is_downloading:
                         continue
-                    path = Path(os.path.join(DATA_CATALOG_DOWNLOAD_DIR, str(resource.resource_id) + '.dat'))
-                    if not path.exists():
-                        path = Path(os.path.join(DATA_CATALOG_DOWNLOAD_DIR, str(resource.resource_id)))
-                        if not path.exists():
-                            self.kv['current_size'] -= resource.size
-                            resource.delete_instance()
+                    if len(self.files(str(resource.resource_id))) == 0:
+                        self.kv['current_size'] -= resource.size
+                        resource.delete_instance()
 
     @staticmethod
     def get_instance():
@@ -85,16 +155,70 @@ class ResourceManager:
             ResourceManager.instance = ResourceManager()
         return ResourceManager.instance
 
+    def estimate_size(self, resources: List[dict], should_redownload: bool = False, n_samples: int = 10) -> Dict[str, int]:
+        """
+        Estimate the number of bytes to download for resources of the data catalog. Sizes of resources which are not
+        in the cache yet are extrapolated from the Content-Length of a sample of them, to keep the estimation cheap
+        """
+        cached = set()
+        if not should_redownload:
+            cached = {
+                str(resource.resource_id) for resource in Resource.select().where(
+                    Resource.resource_id.in_([resource['resource_id'] for resource in resources]),
+                    Resource.is_downloading == False)
+            }
+        missing = [resource for resource in resources if resource['resource_id'] not in cached]
+        sizes = []
+        for size in self.downloader.pool.map(self.head, [resource['resource_data_url'] for resource in missing[:n_samples]]):
+            if size is not None:
+                sizes.append(size)
+        return {
+            "cached_resources": len(resources) - len(missing),
+            "download_bytes": sum(sizes) * len(missing) // len(sizes) if len(sizes) > 0 else 0,
+        }
+
+    def head(self, url: str) -> Optional[int]:
+        try:
+            return self.downloader.size(url)
+        except requests.RequestException:
+            return None
+
+    def prefetch(self, resources: Dict[str, Dict[str, str]], should_redownload: bool) -> Dict[str, str]:
+        """
+        Download resources concurrently (at most DCAT_DOWNLOAD_WORKERS at a time), which is much faster than downloading
+        them one by one when there are many small resources
+        :return: path of every resource, in the same order
+        """
+        futures = OrderedDict(
+            (resource_id, self.downloader.pool.submit(self.download, resource_id, resource_metadata, should_redownload))
+            for resource_id, resource_metadata in resources.items())
+        paths = OrderedDict()
+        error = None
+        # waiting for all downloads, so that the references of the successful ones are known when one of them fails
+        for resource_id, future in futures.items():
+            try:
+                paths[resource_id] = future.result()
+            except Exception as e:
+                error = error or e
+        if error is not None:
+            raise error
+        return paths
+
     def download(self, resource_id: str, resource_metadata: Dict[str, str], should_redownload: bool) -> str:
         is_compressed = resource_metadata['resource_type'] in self.compressed_resource_types
         if is_compressed:
-            if resource_metadata['resource_type'].startswith(".tar"):
-                raise NotImplementedError()
             path = os.path.join(DATA_CATALOG_DOWNLOAD_DIR, resource_id)
         else:
             path = os.path.join(DATA_CATALOG_DOWNLOAD_DIR, resource_id + '.dat')
 
+        # getting the size of the resource before locking the database, so that concurrent downloads don't wait on it
+        size = None
+        if should_redownload or not Resource.select().where(Resource.resource_id == resource_id).exists():
+            size = self.head(resource_metadata['resource_data_url'])
+
         download = True
+        exists = True
+        evicted = []
         with self.db.atomic('EXCLUSIVE'):
             try:
                 # if resource already exists
@@ -103,55 +227,77 @@ class ResourceManager:
                 if not should_redownload:
                     # TODO: comparing timestamp before skipping download
                     download = False
+                    resource.hit_count += 1
+                    self.kv['hits'] += 1
+                    self.kv['bytes_saved'] += resource.size
             except DoesNotExist:
                 resource = Resource.create(resource_id=resource_id, ref_count=1, is_downloading=True, size=0)
+                exists = False
+            resource.last_access = datetime.now()
 
             if download:
                 required_size = 0
-                if resource.ref_count > 1:
+                if exists:
                     # adjust required_size when the resource is to be redownloaded
                     required_size -= resource.size
-                try:
-                    resource.size = int(requests.head(resource_metadata['resource_data_url']).headers['Content-Length'])
+                if size is not None:
+                    resource.size = size
                     required_size += resource.size
-                except KeyError:
-                    pass
-                if self.max_capacity - self.kv['current_size'] < required_size:
+                self.kv['misses'] += 1
+                if self.kv['current_size'] + required_size > self.high_watermark * self.max_capacity:
                     # clear files to make space
-                    self.kv['current_size'] -= self.clear()
+                    cleared_size, evicted = self.clear(
+                        self.kv['current_size'] + required_size - self.low_watermark * self.max_capacity)
+                    self.kv['current_size'] -= cleared_size
+                    self.kv['evictions'] += len(evicted)
+                    self.kv['bytes_evicted'] += cleared_size
                     assert self.max_capacity - self.kv['current_size'] >= required_size, "Not enough disk space"
                 self.kv['current_size'] += required_size
             resource.save()
+        # removing files of evicted resources out of the transaction, their locks keep them from being downloaded again
+        # in the meantime
+        self.remove(evicted)
 
+        lock = ResourceLock(resource_id)
         if download:
+            # block until all other processes accessing the resource are finished, and make processes wanting to
+            # access it wait for the download
             if resource.ref_count > 1:
-                # block until all other processes accessing the resource are finished
                 DcatReadFunc.logger.debug(f"Waiting for some other process/thread to free resource {resource_id} ...")
-                while resource.ref_count > 1:
-                    time.sleep(self.poll_interval)
+            lock.acquire(exclusive=True)
+            try:
+                if exists:
                     with self.db.atomic('EXCLUSIVE'):
                         resource = Resource.select().where(Resource.resource_id == resource_id).get()
-                        if resource.ref_count == 1:
-                            # setting is_downloading before redownload
-                            resource.is_downloading = True
-                            resource.save()
-                # clear old resource before redownload
+                        # setting is_downloading before redownload
+                        resource.is_downloading = True
+                        resource.member = None
+                        resource.save()
+                    # clear old resource before redownload
+                    self.delete_files(resource_id)
+                DcatReadFunc.logger.debug(f"Downloading resource {resource_id} ...")
                 if is_compressed:
-                    shutil.rmtree(str(path))
+                    archive_path = path + resource_metadata['resource_type']
+                    required_size = self.downloader.fetch(resource_metadata['resource_data_url'], archive_path, size,
+                                                          resource_metadata.get('checksum')) - resource.size
+                    if self.extract_compressed:
+                        self.uncompress(resource_metadata['resource_type'], archive_path, path)
+                        # adjust required_size when the resource is extracted
+                        required_size = -resource.size
+                        required_size += sum(f.stat().st_size for f in Path(path).rglob('*')) + Path(path).stat().st_size
+                        Path(archive_path).unlink()
                 else:
-                    Path(path).unlink()
-            DcatReadFunc.logger.debug(f"Downloading resource {resource_id} ...")
-            if is_compressed:
-                temp_path = path + resource_metadata['resource_type']
-                subprocess.check_call(f"wget -q \"{resource_metadata['resource_data_url']}\" -O {temp_path}", shell=True, close_fds=False)
-                self.uncompress(resource_metadata['resource_type'], path)
-                # adjust required_size when the resource is compressed
-                required_size = -resource.size
-                required_size += sum(f.stat().st_size for f in Path(path).rglob('*')) + Path(path).stat().st_size
-                Path(temp_path).unlink()
-            else:
-                subprocess.check_call(f"wget -q \"{resource_metadata['resource_data_url']}\" -O {path}", shell=True, close_fds=False)
-                required_size = 0
+                    # size of the resource is known once it is downloaded if the server didn't tell it before
+                    required_size = self.downloader.fetch(resource_metadata['resource_data_url'], path, size,
+                                                          resource_metadata.get('checksum')) - resource.size
+            except Exception:
+                # releasing the space reserved for the resource, the partial download is kept to be resumed later
+                with self.db.atomic('EXCLUSIVE'):
+                    resource = Resource.select().where(Resource.resource_id == resource_id).get()
+                    self.kv['current_size'] -= resource.size
+                    resource.delete_instance()
+                lock.release()
+                raise
 
             with self.db.atomic('EXCLUSIVE'):
                 self.kv['current_size'] += required_size
@@ -159,71 +305,196 @@ class ResourceManager:
                 resource.size += required_size
                 resource.is_downloading = False
                 resource.save()
+                self.kv['bytes_downloaded'] += resource.size
+            # waking up the processes waiting for the download, while keeping the resource from being evicted
+            lock.acquire(exclusive=False)
         else:
             DcatReadFunc.logger.debug(f"Skipping resource {resource_id}, found in cache")
-            if resource.is_downloading:
-                # block until some other process is done downloading the resource
+            # block until some other process is done downloading the resource
+            while True:
+                lock.acquire(exclusive=False)
+                try:
+                    resource = Resource.select().where(Resource.resource_id == resource_id).get()
+                except DoesNotExist:
+                    lock.release()
+                    raise Exception(f"Some other process/thread failed to download resource {resource_id}")
+                if not resource.is_downloading:
+                    break
+                # the lock was acquired before the download started
                 DcatReadFunc.logger.debug(f"Waiting for other process/thread to finish downloading resource {resource_id} ...")
-                while resource.is_downloading:
-                    time.sleep(self.poll_interval)
-                    with self.db.atomic('EXCLUSIVE'):
-                        resource = Resource.select().where(Resource.resource_id == resource_id).get()
+                lock.release()
+                time.sleep(self.poll_interval)
 
-        return self.path(resource_id, path, is_compressed)
+        with self.locks_lock:
+            self.locks.setdefault(resource_id, []).append(lock)
+        for listener in list(self.download_listeners):
+            listener(resource_id)
+        return self.path(resource_id, path, resource_metadata['resource_type'] if is_compressed else None)
 
     def unlink(self, resource_id):
         with self.db.atomic('EXCLUSIVE'):
-            resource = Resource.select().where(Resource.resource_id == resource_id).get()
+            try:
+                resource = Resource.select().where(Resource.resource_id == resource_id).get()
+            except DoesNotExist:
+                # the download of the resource has failed
+                return
             resource.ref_count -= 1
+            resource.last_access = datetime.now()
             resource.save()
-
-    def clear(self) -> int:
+        with self.locks_lock:
+            locks = self.locks.get(resource_id, [])
+            lock = locks.pop() if len(locks) > 0 else None
+            if len(locks) == 0:
+                self.locks.pop(resource_id, None)
+        if lock is not None:
+            lock.release()
+
+    def clear(self, required_size: int) -> Tuple[int, List[Tuple[ResourceLock, str]]]:
+        """
+        Evict unused resources from the database (in a transaction) in the order of the eviction policy, until
+        required_size bytes are freed. Their files are to be removed with `remove` afterward, resources are locked
+        exclusively until then
+        :return: size of the evicted resources, and their locks and ids
+        """
+        if self.policy == 'lru':
+            order = [Resource.last_access, Resource.id]
+        elif self.policy == 'lfu':
+            order = [Resource.hit_count, Resource.last_access, Resource.id]
+        else:
+            order = [Resource.size.desc(), Resource.last_access, Resource.id]
         size = 0
-        for resource in Resource.select().where(Resource.ref_count == 0).order_by(Resource.id):
+        evicted = []
+        for resource in Resource.select().where(Resource.ref_count == 0).order_by(*order):
+            lock = ResourceLock(str(resource.resource_id))
+            if not lock.acquire(exclusive=True, blocking=False):
+                # some process is about to use the resource
+                lock.release()
+                continue
             DcatReadFunc.logger.debug(f"Clearing resource {resource.resource_id}")
-            path = Path(os.path.join(DATA_CATALOG_DOWNLOAD_DIR, str(resource.resource_id) + '.dat'))
-            if path.exists():
-                size += path.stat().st_size
-                path.unlink()
-            else:
-                path = Path(os.path.join(DATA_CATALOG_DOWNLOAD_DIR, str(resource.resource_id)))
-                size += sum(f.stat().st_size for f in path.rglob('*')) + path.stat().st_size
-                shutil.rmtree(str(path))
+            size += resource.size
+            evicted.append((lock, str(resource.resource_id)))
             resource.delete_instance()
-            if size >= self.max_clear_size:
-                return size
-        return size
-
-    def uncompress(self, resource_type: str, path: Union[Path, str]):
-        subprocess.check_call(f"unzip {path + resource_type} -d {path}", shell=True, close_fds=False)
-        # flatten the structure (max two levels)
-        for fpath in Path(path).iterdir():
+            if size >= required_size:
+                return size, evicted
+        return size, evicted
+
+    def remove(self, evicted: List[Tuple[ResourceLock, str]]):
+        for lock, resource_id in evicted:
+            self.delete_files(resource_id)
+            lock.release()
+
+    def files(self, resource_id: str) -> List[Path]:
+        """
+        Files of a resource in the download directory: the resource (.dat), the folder it is extracted to, or its archive
+        """
+        path = os.path.join(DATA_CATALOG_DOWNLOAD_DIR, resource_id)
+        return [
+            Path(fpath)
+            for fpath in [path + '.dat', path] + [path + resource_type for resource_type in self.compressed_resource_types]
+            if os.path.exists(fpath)
+        ]
+
+    def delete_files(self, resource_id: str):
+        for fpath in self.files(resource_id):
             if fpath.is_dir():
-                for sub_file in fpath.iterdir():
-                    new_file = os.path.join(path, sub_file.name)
-                    if os.path.exists(new_file):
-                        raise Exception("Invalid resource. Shouldn't overwrite existing file")
-                    os.rename(str(sub_file), new_file)
-                shutil.rmtree(str(fpath))
-
-    def path(self, resource_id: str, path: Union[Path, str], is_compressed: bool) -> str:
-        if not is_compressed:
+                shutil.rmtree(str(fpath), ignore_errors=True)
+            else:
+                fpath.unlink()
+
+    def stats(self) -> Dict[str, Union[int, float, str]]:
+        """
+        Usage of the download directory and effectiveness of the cache since the directory was created
+        """
+        with self.db.atomic():
+            stats = {key: self.kv[key] for key in CACHE_STATS}
+            stats['current_size'] = self.kv['current_size']
+            stats['resources'] = Resource.select().count()
+        n_requests = stats['hits'] + stats['misses']
+        return {
+            'policy': self.policy,
+            'capacity': self.max_capacity,
+            'high_watermark': self.high_watermark,
+            'low_watermark': self.low_watermark,
+            **stats,
+            'hit_ratio': stats['hits'] / n_requests if n_requests > 0 else 0.0,
+        }
+
+    def uncompress(self, resource_type: str, archive_path: Union[Path, str], path: Union[Path, str]):
+        """
+        Extract an archive to the folder path, flattening its structure (max two levels): the content of its top-level
+        folders is moved up
+        """
+        path = Path(path)
+        path.mkdir(exist_ok=True, parents=True)
+        if resource_type == ".zip":
+            with zipfile.ZipFile(str(archive_path)) as archive:
+                for info in archive.infolist():
+                    if not info.is_dir():
+                        with archive.open(info) as member:
+                            self.extract_member(path, info.filename, member)
+        else:
+            # reading the members as they come, so that compressed tar files are decompressed in one pass
+            with tarfile.open(str(archive_path), "r|*") as archive:
+                for info in archive:
+                    if info.isfile():
+                        self.extract_member(path, info.name, archive.extractfile(info))
+
+    def extract_member(self, path: Path, name: str, member: BinaryIO):
+        parts = [part for part in PurePosixPath(name).parts if part not in {"", ".", "/"}]
+        if len(parts) == 0 or ".." in parts:
+            raise Exception(f"Invalid resource. It has an invalid file {name}")
+        fpath = path.joinpath(*(parts[1:] if len(parts) > 1 else parts))
+        if fpath.exists():
+            raise Exception("Invalid resource. Shouldn't overwrite existing file")
+        fpath.parent.mkdir(exist_ok=True, parents=True)
+        with open(str(fpath), "wb") as f:
+            shutil.copyfileobj(member, f, Downloader.chunk_size)
+
+    def archive_members(self, resource_type: str, archive_path: str) -> List[str]:
+        if resource_type == ".zip":
+            with zipfile.ZipFile(archive_path) as archive:
+                return [info.filename for info in archive.infolist() if not info.is_dir()]
+        with tarfile.open(archive_path, "r:*") as archive:
+            return [info.name for info in archive.getmembers() if info.isfile()]
+
+    def path(self, resource_id: str, path: Union[Path, str], resource_type: Optional[str]) -> str:
+        if resource_type is None:
             return path
-        # we need to look in the folder and find the resource
-        files = [
-            fpath for fpath in Path(path).iterdir()
-            if fpath.is_file() and not fpath.name.startswith(".")
-        ]
+        # the file of a compressed resource is found when it is first downloaded, and stored with the resource, as
+        # listing the members of an archive decompresses the whole archive for .tar.gz
+        member = Resource.select(Resource.member).where(Resource.resource_id == resource_id).scalar()
+        if member is None:
+            member = self.find_member(resource_id, path, resource_type)
+            with self.db.atomic('EXCLUSIVE'):
+                Resource.update(member=member).where(Resource.resource_id == resource_id).execute()
+        if Path(path).is_dir():
+            return str(Path(path) / member)
+        # the resource is read from its archive
+        return f"{GDAL_VSI_PREFIXES[resource_type]}{path}{resource_type}/{member}"
+
+    def find_member(self, resource_id: str, path: Union[Path, str], resource_type: str) -> str:
+        if Path(path).is_dir():
+            # we need to look in the folder and find the resource
+            files = [
+                fpath.name for fpath in Path(path).iterdir()
+                if fpath.is_file() and not fpath.name.startswith(".")
+            ]
+        else:
+            files = [
+                name for name in self.archive_members(resource_type, str(path) + resource_type)
+                # files of the top-level folders are at the top of the extracted folder
+                if len(PurePosixPath(name).parts) <= 2 and not PurePosixPath(name).name.startswith(".")
+            ]
         if len(files) == 0:
             raise Exception(f"The compressed resource {resource_id} is empty")
         elif len(files) != 1:
             # this indicates the shapefile
-            files = [f for f in files if f.name.endswith(".shp")]
+            files = [f for f in files if f.endswith(".shp")]
             if len(files) != 1:
                 raise Exception(
                     f"Cannot handle compressed resource {resource_id} because it has more than one resource"
                 )
-        return str(files[0])
+        return files[0]
 
 
 class DcatReadFunc(IFunc):
@@ -233,6 +504,7 @@ class DcatReadFunc(IFunc):
     """
     func_type = IFuncType.READER
     friendly_name: str = "Data Catalog Reader"
+    deterministic = False
     inputs = {
         "dataset_id": ArgType.String,
         "start_time": ArgType.DateTime(optional=True),
@@ -240,6 +512,7 @@ class DcatReadFunc(IFunc):
         "lazy_load_enabled": ArgType.Boolean(optional=True),
         "should_redownload": ArgType.Boolean(optional=True),
         "override_drepr": ArgType.String(optional=True),
+        "max_loaded_shards": ArgType.Number(optional=True),
     }
     outputs = {"data": ArgType.DataSet(None), "data_path": ArgType.ListString(optional=True)}
     example = {
@@ -248,7 +521,8 @@ class DcatReadFunc(IFunc):
         "end_time": "2020-03-02T12:30:55",
         "lazy_load_enabled": "False",
         "should_redownload": "False",
-        "override_drepr": "/tmp/model.yml"
+        "override_drepr": "/tmp/model.yml",
+        "max_loaded_shards": "10"
     }
     logger = logging.getLogger(__name__)
 
@@ -258,11 +532,14 @@ class DcatReadFunc(IFunc):
                  end_time: datetime = None,
                  lazy_load_enabled: bool = False,
                  should_redownload: bool = False,
-                 override_drepr: str = None
+                 override_drepr: str = None,
+                 max_loaded_shards: int = None
                  ):
         self.dataset_id = dataset_id
         self.lazy_load_enabled = lazy_load_enabled
         self.should_redownload = should_redownload
+        # maximum number of resources loaded in memory at the same time in lazy mode
+        self.max_loaded_shards = int(max_loaded_shards) if max_loaded_shards is not None else None
         self.resource_manager = ResourceManager.get_instance()
         dataset = DCatAPI.get_instance().find_dataset_by_id(dataset_id)
 
@@ -271,23 +548,30 @@ class DcatReadFunc(IFunc):
         assert not (('resource_repr' in dataset['metadata']) and ('dataset_repr' in dataset['metadata'])), \
             "Dataset has both 'resource_repr' and 'dataset_repr'"
 
-        resources = DCatAPI.get_instance().find_resources_by_dataset_id(dataset_id, start_time, end_time)
+        # resources of the time range are found in the local index of the dataset's resources
+        resources = ResourceIndex.get_instance().find_resources(dataset_id, start_time, end_time)
 
+        # standard variables of the dataset, which are the variables of all its shards
+        variables = {
+            variable['standard_variable_name']
+            for variable in DCatAPI.get_instance().find_standard_variables_by_dataset_id(dataset_id)
+        }
         self.resources = OrderedDict()
+        self.shard_metadata = {
+            resource['resource_id']: self.get_shard_metadata(resource, variables) for resource in resources
+        }
         if 'resource_repr' in dataset['metadata']:
             if override_drepr is not None:
                 self.drepr = DRepr.parse_from_file(override_drepr)
             else:
                 self.drepr = DRepr.parse(dataset['metadata']['resource_repr'])
             for resource in resources:
-                self.resources[resource['resource_id']] = {key: resource[key] for key in
-                                                           {'resource_data_url', 'resource_type'}}
+                self.resources[resource['resource_id']] = self.get_resource_metadata(resource)
             self.repr_type = 'resource_repr'
         else:
             # TODO: fix me!!
             assert len(resources) == 1
-            self.resources[resources[0]['resource_id']] = {key: resources[0][key] for key in
-                                                           {'resource_data_url', 'resource_type'}}
+            self.resources[resources[0]['resource_id']] = self.get_resource_metadata(resources[0])
             if override_drepr is not None:
                 self.drepr = DRepr.parse_from_file(override_drepr)
             else:
@@ -296,6 +580,43 @@ class DcatReadFunc(IFunc):
 
         self.logger.debug(f"Found key '{self.repr_type}'")
 
+    @staticmethod
+    def get_resource_metadata(resource: dict) -> Dict[str, str]:
+        metadata = {key: resource[key] for key in {'resource_data_url', 'resource_type'}}
+        # checksum (<algorithm>:<hexdigest>) of the resource to verify its download, if the data catalog has it
+        checksum = (resource.get('resource_metadata') or {}).get('checksum')
+        if checksum is not None:
+            metadata['checksum'] = checksum
+        return metadata
+
+    @staticmethod
+    def get_shard_metadata(resource: dict, variables: Set[str] = None) -> dict:
+        # time range (in UTC) and variables of the resource, so that consumers of the dataset can skip it without
+        # loading it. Variables are unknown if the data catalog has none for the dataset
+        temporal_coverage = (resource.get('resource_metadata') or {}).get('temporal_coverage') or {}
+        metadata = {}
+        for key in ['start_time', 'end_time']:
+            value = ResourceIndex.parse(temporal_coverage.get(key))
+            if value is not None:
+                metadata[key] = value
+        if variables:
+            metadata['variables'] = variables
+        return metadata
+
+    @classmethod
+    def estimate(cls, inputs: Dict[str, any]) -> Optional[Dict[str, Union[int, float, str]]]:
+        if 'dataset_id' not in inputs:
+            return None
+        # resources of the whole dataset are counted if the time range is wired, which is an upper bound
+        resources = ResourceIndex.get_instance().find_resources(
+            inputs['dataset_id'], inputs.get('start_time'), inputs.get('end_time'))
+        resource_manager = ResourceManager.get_instance()
+        return {
+            "resources": len(resources),
+            **resource_manager.estimate_size(resources, inputs.get('should_redownload', False)),
+            "cache_capacity": resource_manager.max_capacity,
+        }
+
     def exec(self) -> dict:
         # TODO: fix me! incorrect way to choose backend
         if self.get_preference("data") is None or self.get_preference("data") == 'array':
@@ -309,14 +630,16 @@ class DcatReadFunc(IFunc):
                 return {"data": LazyLoadBackend(backend, self.drepr, partial(self.resource_manager.download,
                                                                              resource_id, resource_metadata,
                                                                              self.should_redownload),
-                                                self.resource_manager.unlink)}
+                                                partial(self.resource_manager.unlink, resource_id))}
             else:
-                dataset = ShardedBackend(len(self.resources))
+                dataset = ShardedBackend(len(self.resources), self.max_loaded_shards)
                 for resource_id, resource_metadata in self.resources.items():
                     dataset.add(LazyLoadBackend(backend, self.drepr, partial(self.resource_manager.download,
                                                                              resource_id, resource_metadata,
                                                                              self.should_redownload),
-                                                self.resource_manager.unlink, partial(ShardedClassID, dataset.count)))
+                                                partial(self.resource_manager.unlink, resource_id),
+                                                partial(ShardedClassID, dataset.count)),
+                                self.shard_metadata[resource_id])
                 return {"data": dataset}
         else:
             # data_path is location of the resources in disk, for pipeline that wants to download the file
@@ -327,10 +650,12 @@ class DcatReadFunc(IFunc):
             else:
                 dataset = ShardedBackend(len(self.resources))
                 data_path = []
-                for resource_id, resource_metadata in self.resources.items():
-                    resource_file = self.resource_manager.download(resource_id, resource_metadata, self.should_redownload)
-                    dataset.add(backend.from_drepr(self.drepr, resource_file, dataset.inject_class_id))
-                    data_path.append(data_path)
+                # downloading all resources of the time range concurrently before reading them
+                paths = self.resource_manager.prefetch(self.resources, self.should_redownload)
+                for resource_id, resource_file in paths.items():
+                    dataset.add(backend.from_drepr(self.drepr, resource_file, dataset.inject_class_id),
+                                self.shard_metadata[resource_id])
+                    data_path.append(resource_file)
                 return {"data": dataset, "data_path": data_path}
 
     def __del__(self):
@@ -16,6 +16,7 @@ class DcatReadNoReprFunc(IFunc):
     """
     func_type = IFuncType.READER
     friendly_name: str = " Data Catalog Reader Without repr File"
+    deterministic = False
     inputs = {"dataset_id": ArgType.String}
     outputs = {"data": ArgType.String}
     example = {
@@ -0,0 +1,171 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+Local index of the resources of data catalog datasets by time, so that the resources of a time range (e.g. every window
+of a DcatRangeStream) are found without querying the data catalog
+"""
+import logging
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+from threading import Lock
+from typing import List, Optional
+
+import ujson
+from dateutil import parser
+from peewee import SqliteDatabase, Model, CharField, DateTimeField, FloatField, TextField
+from playhouse.migrate import SqliteMigrator, migrate
+
+from dtran.dcat.api import DCatAPI
+from dtran.helpers import to_utc
+
+DATA_CATALOG_DOWNLOAD_DIR = os.path.abspath(os.environ["DATA_CATALOG_DOWNLOAD_DIR"])
+# time (in seconds) after which the resources of a dataset are refreshed from the data catalog
+INDEX_TTL = float(os.environ.get('DCAT_INDEX_TTL', 3600))
+# time (in seconds) after which all resources of a dataset are fetched again instead of only the new ones, so that
+# resources updated or deleted in the data catalog are updated or removed from the index
+INDEX_FULL_TTL = float(os.environ.get('DCAT_INDEX_FULL_TTL', 86400))
+
+Path(DATA_CATALOG_DOWNLOAD_DIR).mkdir(exist_ok=True, parents=True)
+
+database = SqliteDatabase(os.path.join(DATA_CATALOG_DOWNLOAD_DIR, 'dcat_resource_index.db'), timeout=10,
+                          pragmas={'journal_mode': 'wal'})
+
+
+class IndexedDataset(Model):
+    dataset_id = CharField(unique=True)
+    # time the resources of the dataset were last fetched from the data catalog
+    refreshed_at = FloatField()
+    # time all resources of the dataset were last fetched from the data catalog
+    full_refreshed_at = FloatField(default=0)
+
+    class Meta:
+        database = database
+
+
+class IndexedResource(Model):
+    dataset_id = CharField()
+    resource_id = CharField()
+    start_time = DateTimeField(null=True)
+    end_time = DateTimeField(null=True)
+    # resource as returned by the data catalog
+    resource = TextField()
+
+    class Meta:
+        database = database
+        indexes = (
+            (('dataset_id', 'resource_id'), True),
+            (('dataset_id', 'start_time', 'end_time'), False),
+        )
+
+
+class ResourceIndex:
+    """
+    Resources of datasets indexed by their temporal coverage in a SQLite database next to the downloaded resources.
+    A dataset is indexed the first time it is queried, and refreshed incrementally (fetching only the resources starting
+    after the latest indexed one) once its index is older than DCAT_INDEX_TTL seconds. Every DCAT_INDEX_FULL_TTL
+    seconds, the refresh fetches all resources of the dataset instead, pruning those which are not in the data catalog
+    anymore
+    """
+    instance = None
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, ttl: float = INDEX_TTL, full_ttl: float = INDEX_FULL_TTL):
+        self.ttl = ttl
+        self.full_ttl = full_ttl
+        self.db = database
+        self.db.connect()
+        self.db.create_tables([IndexedDataset, IndexedResource], safe=True)
+        # adding the time of the last full refresh to indices created before it
+        if 'full_refreshed_at' not in {column.name for column in self.db.get_columns(IndexedDataset._meta.table_name)}:
+            migrate(SqliteMigrator(self.db).add_column(
+                IndexedDataset._meta.table_name, 'full_refreshed_at', FloatField(default=0)))
+        self.db.close()
+        # datasets refreshed by this process, which don't need to be checked again before the ttl
+        self.refreshed_at = {}
+        self.lock = Lock()
+
+    @staticmethod
+    def get_instance():
+        if ResourceIndex.instance is None:
+            ResourceIndex.instance = ResourceIndex()
+        return ResourceIndex.instance
+
+    def find_resources(self, dataset_id: str, start_time: datetime = None, end_time: datetime = None) -> List[dict]:
+        """
+        Find resources of a dataset whose temporal coverage is in [start_time, end_time] (inclusive), as
+        DCatAPI.find_resources_by_dataset_id does
+        """
+        self.refresh(dataset_id)
+        query = IndexedResource.select(IndexedResource.resource).where(IndexedResource.dataset_id == dataset_id)
+        if start_time is not None:
+            query = query.where(IndexedResource.start_time >= to_utc(start_time))
+        if end_time is not None:
+            query = query.where(IndexedResource.end_time <= to_utc(end_time))
+        query = query.order_by(IndexedResource.start_time, IndexedResource.id)
+        return [ujson.loads(resource) for resource, in query.tuples()]
+
+    def refresh(self, dataset_id: str, full: bool = False):
+        """
+        Fetch the resources of a dataset which are not in the index yet (all of them if full is true)
+        """
+        with self.lock:
+            if not full and time.time() - self.refreshed_at.get(dataset_id, 0) < self.ttl:
+                return
+            dataset = IndexedDataset.get_or_none(IndexedDataset.dataset_id == dataset_id)
+            if not full and dataset is not None and time.time() - dataset.refreshed_at < self.ttl:
+                self.refreshed_at[dataset_id] = dataset.refreshed_at
+                return
+
+            # the dataset is fully refreshed when it is first indexed, or when its last full refresh is too old
+            full = full or dataset is None or time.time() - dataset.full_refreshed_at >= self.full_ttl
+            start_time = None
+            if not full:
+                # resources starting at the same time as the latest one are fetched again, as some of them may be new
+                start_time = IndexedResource.select(IndexedResource.start_time).where(
+                    IndexedResource.dataset_id == dataset_id).order_by(IndexedResource.start_time.desc()).scalar()
+            refreshed_at = time.time()
+            resources = list(DCatAPI.get_instance().iter_resources_by_dataset_id(dataset_id, start_time))
+            self.logger.debug(f"Indexing {len(resources)} resources of dataset {dataset_id} (full refresh: {full})")
+
+            rows = []
+            for resource in resources:
+                temporal_coverage = (resource.get('resource_metadata') or {}).get('temporal_coverage') or {}
+                rows.append({
+                    'dataset_id': dataset_id,
+                    'resource_id': resource['resource_id'],
+                    'start_time': self.parse(temporal_coverage.get('start_time')),
+                    'end_time': self.parse(temporal_coverage.get('end_time')),
+                    'resource': ujson.dumps(resource),
+                })
+            with self.db.atomic('IMMEDIATE'):
+                if full:
+                    IndexedResource.delete().where(IndexedResource.dataset_id == dataset_id).execute()
+                # sqlite limits the number of variables of a query
+                for i in range(0, len(rows), 100):
+                    IndexedResource.insert_many(rows[i:i + 100]).on_conflict_replace().execute()
+                update = {IndexedDataset.refreshed_at: refreshed_at}
+                if full:
+                    update[IndexedDataset.full_refreshed_at] = refreshed_at
+                IndexedDataset.insert(dataset_id=dataset_id, refreshed_at=refreshed_at,
+                                      full_refreshed_at=refreshed_at).on_conflict(
+                    conflict_target=[IndexedDataset.dataset_id], update=update).execute()
+            self.refreshed_at[dataset_id] = refreshed_at
+
+    def refresh_all(self) -> List[str]:
+        """
+        Fully refresh every indexed dataset
+        :return: ids of the refreshed datasets
+        """
+        dataset_ids = [dataset_id for dataset_id, in IndexedDataset.select(IndexedDataset.dataset_id).tuples()]
+        for dataset_id in dataset_ids:
+            self.refresh(dataset_id, full=True)
+        return dataset_ids
+
+    @staticmethod
+    def parse(value: Optional[str]) -> Optional[datetime]:
+        try:
+            return to_utc(parser.parse(value))
+        except (TypeError, ValueError, OverflowError):
+            return None
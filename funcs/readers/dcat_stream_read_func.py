@@ -0,0 +1,102 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import math
+import weakref
+from asyncio import get_event_loop
+from collections import OrderedDict
+from datetime import datetime
+from typing import Union, Dict, List, Optional, AsyncGenerator
+
+from drepr.outputs import ArrayBackend, GraphBackend
+from dtran.argtype import ArgType
+from dtran.backend import ShardedBackend
+from dtran.ifunc import IFuncType
+from funcs.readers.dcat_read_func import DcatReadFunc
+
+
+class DcatStreamReadFunc(DcatReadFunc):
+    id = "dcat_stream_read_func"
+    description = """ An entry point in the pipeline.
+    Fetches a dataset from the MINT Data-Catalog as a stream of batches of its resources, so that datasets spanning long
+    time ranges are processed with bounded memory and disk space.
+    """
+    func_type = IFuncType.READER
+    friendly_name: str = "Data Catalog Stream Reader"
+    inputs = {
+        "dataset_id": ArgType.String,
+        "start_time": ArgType.DateTime(optional=True),
+        "end_time": ArgType.DateTime(optional=True),
+        "batch_size": ArgType.Number(optional=True),
+        "should_redownload": ArgType.Boolean(optional=True),
+        "override_drepr": ArgType.String(optional=True),
+    }
+    outputs = {"data": ArgType.DataSet(None), "data_path": ArgType.ListString(optional=True)}
+    example = {
+        "dataset_id": "ea0e86f3-9470-4e7e-a581-df85b4a7075d",
+        "start_time": "2020-03-02T12:30:55",
+        "end_time": "2020-03-02T12:30:55",
+        "batch_size": "1",
+        "should_redownload": "False",
+        "override_drepr": "/tmp/model.yml"
+    }
+
+    def __init__(self,
+                 dataset_id: str,
+                 start_time: datetime = None,
+                 end_time: datetime = None,
+                 batch_size: int = 1,
+                 should_redownload: bool = False,
+                 override_drepr: str = None
+                 ):
+        super().__init__(dataset_id, start_time, end_time, False, should_redownload, override_drepr)
+        self.batch_size = max(int(batch_size), 1)
+
+    @classmethod
+    def estimate(cls, inputs: Dict[str, any]) -> Optional[Dict[str, Union[int, float, str]]]:
+        estimation = super().estimate(inputs)
+        if estimation is None:
+            return None
+        return {
+            "results": math.ceil(estimation["resources"] / max(int(inputs.get("batch_size", 1)), 1)),
+            **estimation,
+        }
+
+    async def exec(self) -> AsyncGenerator[dict, None]:
+        # TODO: fix me! incorrect way to choose backend
+        if self.get_preference("data") is None or self.get_preference("data") == 'array':
+            backend = ArrayBackend
+        else:
+            backend = GraphBackend
+
+        resources = list(self.resources.items())
+        loop = get_event_loop()
+        for i in range(0, len(resources), self.batch_size):
+            batch = OrderedDict(resources[i:i + self.batch_size])
+            # downloading and reading resources out of the event loop, so that other adapters keep running meanwhile
+            data, data_path = await loop.run_in_executor(None, self.read_batch, backend, batch)
+            # the resources of the batch are released once the adapters consuming it don't hold it anymore
+            weakref.finalize(data, self.release, list(batch.keys()))
+            yield {"data": data, "data_path": data_path}
+
+    def read_batch(self, backend, batch: Dict[str, Dict[str, str]]):
+        paths = list(self.resource_manager.prefetch(batch, self.should_redownload).values())
+        try:
+            if self.repr_type == 'dataset_repr':
+                return backend.from_drepr(self.drepr, paths[0]), paths
+            dataset = ShardedBackend(len(paths))
+            for resource_id, path in zip(batch.keys(), paths):
+                dataset.add(backend.from_drepr(self.drepr, path, dataset.inject_class_id),
+                            self.shard_metadata[resource_id])
+            return dataset, paths
+        except Exception:
+            self.release(list(batch.keys()))
+            raise
+
+    def release(self, resource_ids: List[str]):
+        for resource_id in resource_ids:
+            self.resource_manager.unlink(resource_id)
+
+    def __del__(self):
+        # resources are released batch by batch
+        pass
@@ -16,6 +16,7 @@ class DcatVariableStream(IFunc):
     """
     func_type = IFuncType.READER
     friendly_name: str = "Data Catalog Standard Variable Stream"
+    deterministic = False
     inputs = {
         "dataset_id": ArgType.String
     }
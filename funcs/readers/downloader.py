@@ -0,0 +1,122 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import hashlib
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class DownloadError(Exception):
+    pass
+
+
+class Downloader:
+    """
+    Downloads files over pooled HTTP connections. Partial downloads are kept next to the destination (with a .part
+    suffix) and resumed with a Range request, and completed downloads are verified against their expected size and
+    checksum before being moved to their destination
+    """
+    logger = logging.getLogger(__name__)
+    chunk_size = 1 << 20
+
+    def __init__(self, n_workers: int = 8, verify: bool = True, max_retries: int = 3, timeout: float = 60):
+        """
+        :param n_workers: number of concurrent downloads of the pool, which is also the size of the connection pool
+        :param verify: verify the certificates of https servers
+        :param max_retries: number of times an interrupted download is resumed before giving up
+        :param timeout: timeout (in seconds) of connecting to and reading from the servers
+        """
+        self.n_workers = n_workers
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.verify = verify
+        # retrying failed connections and transient server errors, interrupted transfers are resumed by fetch
+        adapter = HTTPAdapter(pool_connections=n_workers, pool_maxsize=n_workers, max_retries=Retry(
+            total=max_retries, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=["HEAD", "GET"]))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.pool = ThreadPoolExecutor(max_workers=n_workers)
+
+    def size(self, url: str) -> Optional[int]:
+        """
+        Get the size of a remote file from its Content-Length, None if the server doesn't tell
+        """
+        resp = self.session.head(url, allow_redirects=True, timeout=self.timeout)
+        try:
+            return int(resp.headers['Content-Length'])
+        except (KeyError, ValueError):
+            return None
+
+    def fetch(self, url: str, path: Union[str, Path], size: int = None, checksum: str = None) -> int:
+        """
+        Download a file, resuming a previous partial download of it if there is one
+        :param size: expected size of the file, if it is known
+        :param checksum: expected checksum of the file as <algorithm>:<hexdigest> (e.g. sha256:...), if it is known
+        :return: size of the downloaded file
+        """
+        path = Path(path)
+        part_path = path.parent / (path.name + ".part")
+        for attempt in range(self.max_retries + 1):
+            try:
+                total_size = self.fetch_part(url, part_path, size)
+                break
+            except (requests.ConnectionError, requests.exceptions.ChunkedEncodingError, requests.Timeout) as e:
+                if attempt == self.max_retries:
+                    raise DownloadError(f"Cannot download {url}: {e}") from e
+                self.logger.warning(f"Download of {url} was interrupted ({e}), resuming it")
+
+        actual_size = part_path.stat().st_size
+        if (total_size is not None and actual_size != total_size) or (size is not None and actual_size != size):
+            part_path.unlink()
+            raise DownloadError(f"Downloaded {actual_size} bytes of {url}, expected {size or total_size} bytes")
+        if checksum is not None:
+            algorithm, digest = checksum.split(":", 1)
+            if self.checksum(part_path, algorithm) != digest.lower():
+                part_path.unlink()
+                raise DownloadError(f"Checksum of {url} doesn't match {checksum}")
+        os.replace(str(part_path), str(path))
+        return actual_size
+
+    def fetch_part(self, url: str, part_path: Path, size: int = None) -> Optional[int]:
+        """
+        Download the remaining part of a file into part_path
+        :return: total size of the file announced by the server, if any
+        """
+        offset = part_path.stat().st_size if part_path.exists() else 0
+        if size is not None and offset == size:
+            return size
+        headers = {"Range": f"bytes={offset}-"} if offset > 0 else {}
+        with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as resp:
+            if resp.status_code == 416:
+                # the partial file is already complete (or the server doesn't support ranges for it), restarting
+                part_path.unlink()
+                return self.fetch_part(url, part_path, size)
+            resp.raise_for_status()
+            if resp.status_code == 206:
+                # Content-Range: bytes <start>-<end>/<total>
+                total_size = resp.headers.get("Content-Range", "").rsplit("/", 1)[-1]
+                mode = "ab"
+            else:
+                # the server ignored the range, so the file is downloaded from the beginning again
+                total_size = resp.headers.get("Content-Length")
+                mode = "wb"
+            with open(str(part_path), mode) as f:
+                for chunk in resp.iter_content(chunk_size=self.chunk_size):
+                    f.write(chunk)
+        return int(total_size) if total_size is not None and total_size.isdigit() else None
+
+    def checksum(self, path: Path, algorithm: str) -> str:
+        hasher = hashlib.new(algorithm)
+        with open(str(path), "rb") as f:
+            for chunk in iter(lambda: f.read(self.chunk_size), b""):
+                hasher.update(chunk)
+        return hasher.hexdigest()
@@ -21,6 +21,7 @@ class ReadFunc(IFunc):
     """
     friendly_name: str = "Local File Reader"
     func_type = IFuncType.READER
+    deterministic = False
     inputs = {"repr_file": ArgType.FilePath, "resource_path": ArgType.FilePath}
     outputs = {"data": ArgType.DataSet(None)}
     example = {
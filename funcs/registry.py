@@ -0,0 +1,159 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+Manifest of the adapters exported by the funcs package (id, inputs, outputs, description, ...), so that they can be
+listed and validated without importing their modules, which pull heavy dependencies (GDAL, netCDF4, xarray, ...).
+
+The manifest is generated by parsing the source of the adapters, to be regenerated whenever an adapter changes:
+
+    python -m funcs.registry
+"""
+import ast
+import importlib
+import importlib.util
+import inspect
+import logging
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+import ujson
+
+import funcs
+from dtran.argtype import ArgType
+from dtran.ifunc import IFuncType
+
+MANIFEST_FILE = Path(__file__).parent / "manifest.json"
+# attributes of adapters stored in the manifest
+ATTRIBUTES = ["id", "description", "friendly_name", "func_type", "inputs", "outputs", "example"]
+
+logger = logging.getLogger(__name__)
+_manifest = None
+
+
+def serialize_argtype(argtype: ArgType) -> dict:
+    # keeping only the attributes which are not functions (e.g. validate, from_str) and can be saved in json
+    return {key: value for key, value in vars(argtype).items() if not callable(value) and is_json(value)}
+
+
+def is_json(value: Any) -> bool:
+    try:
+        ujson.dumps(value)
+        return True
+    except (TypeError, OverflowError):
+        return False
+
+
+def exec_type(node: ast.AST) -> str:
+    """
+    Type of the exec method of an adapter (async generator, generator, coroutine or function) from its definition
+    """
+    is_async = isinstance(node, ast.AsyncFunctionDef)
+    nodes = list(ast.iter_child_nodes(node))
+    while len(nodes) > 0:
+        child = nodes.pop()
+        if isinstance(child, (ast.Yield, ast.YieldFrom)):
+            return "async generator" if is_async else "generator"
+        # yield of nested functions/classes doesn't belong to exec
+        if not isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda, ast.ClassDef)):
+            nodes.extend(ast.iter_child_nodes(child))
+    return "coroutine" if is_async else "function"
+
+
+def parse_adapter(name: str, module: str, namespace: Dict[str, Any]) -> Optional[dict]:
+    """
+    Read the attributes of an adapter from the source of its module. Attribute values are evaluated with ArgType,
+    IFuncType and the adapters parsed before in scope, None is returned if any of them cannot be evaluated
+    """
+    spec = importlib.util.find_spec(module, funcs.__name__)
+    tree = ast.parse(Path(spec.origin).read_text(), spec.origin)
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef) and node.name == name:
+            break
+    else:
+        return None
+
+    attrs = {}
+    for stmt in node.body:
+        if isinstance(stmt, ast.Assign) and len(stmt.targets) == 1 and isinstance(stmt.targets[0], ast.Name):
+            target, value = stmt.targets[0].id, stmt.value
+        elif isinstance(stmt, ast.AnnAssign) and isinstance(stmt.target, ast.Name) and stmt.value is not None:
+            target, value = stmt.target.id, stmt.value
+        elif isinstance(stmt, (ast.FunctionDef, ast.AsyncFunctionDef)) and stmt.name == "exec":
+            attrs["exec"] = exec_type(stmt)
+            continue
+        else:
+            continue
+        if target not in ATTRIBUTES:
+            continue
+        try:
+            attrs[target] = eval(compile(ast.Expression(value), spec.origin, "eval"), dict(namespace))
+        except Exception:
+            return None
+
+    if "id" not in attrs or "exec" not in attrs:
+        return None
+    return attrs
+
+
+def load_adapter(name: str) -> dict:
+    # importing the adapter to read its attributes, if they cannot be parsed from the source
+    cls = getattr(funcs, name)
+    attrs = {attr: getattr(cls, attr) for attr in ATTRIBUTES if attr in cls.__dict__}
+    attrs["exec"] = "async generator" if inspect.isasyncgenfunction(cls.exec) else \
+        "generator" if inspect.isgeneratorfunction(cls.exec) else \
+        "coroutine" if inspect.iscoroutinefunction(cls.exec) else "function"
+    return attrs
+
+
+def build_manifest() -> List[dict]:
+    namespace = {"ArgType": ArgType, "IFuncType": IFuncType}
+    manifest = []
+    for name, module in funcs.ADAPTERS.items():
+        attrs = parse_adapter(name, module, namespace)
+        if attrs is None:
+            logger.info(f"Cannot parse adapter {name} from its source, importing it instead")
+            attrs = load_adapter(name)
+        namespace[name] = SimpleNamespace(**attrs)
+        manifest.append({
+            "name": name,
+            "module": f"{funcs.__name__}{module}",
+            "id": attrs["id"],
+            "description": attrs.get("description"),
+            "friendly_name": attrs.get("friendly_name"),
+            "func_type": attrs.get("func_type", IFuncType.OTHERS).value,
+            "inputs": {argname: serialize_argtype(argtype) for argname, argtype in attrs.get("inputs", {}).items()},
+            "outputs": {argname: serialize_argtype(argtype) for argname, argtype in attrs.get("outputs", {}).items()},
+            "example": attrs.get("example", {}),
+            "exec": attrs["exec"],
+        })
+    return manifest
+
+
+def write_manifest(path: Path = MANIFEST_FILE) -> List[dict]:
+    manifest = build_manifest()
+    with open(str(path), "w") as f:
+        ujson.dump(manifest, f, indent=4, escape_forward_slashes=False)
+    return manifest
+
+
+def load_manifest() -> List[dict]:
+    """
+    Get the manifest of the adapters, which is built from their source if the manifest file is missing or out of date
+    """
+    global _manifest
+    if _manifest is None:
+        if MANIFEST_FILE.exists():
+            with open(str(MANIFEST_FILE), "r") as f:
+                _manifest = ujson.load(f)
+            if [adapter["name"] for adapter in _manifest] != list(funcs.ADAPTERS.keys()):
+                logger.warning(f"{MANIFEST_FILE} is out of date, regenerate it with: python -m funcs.registry")
+                _manifest = None
+        if _manifest is None:
+            _manifest = build_manifest()
+    return _manifest
+
+
+if __name__ == "__main__":
+    manifest = write_manifest()
+    print(f"Wrote {len(manifest)} adapters to {MANIFEST_FILE}")
@@ -6,6 +6,7 @@ from drepr import outputs, DRepr
 from drepr.outputs.base_output_sm import BaseOutputSM
 
 from dtran import ArgType
+from dtran.backend import ShardedBackend
 from dtran.ifunc import IFunc, IFuncType
 import xarray as xr, numpy as np
 
@@ -40,58 +41,15 @@ class NetCDFWriteFunc(IFunc):
         return True
 
     def exec(self) -> dict:
-        mint = self.dataset.ns("https://mint.isi.edu/")
-        mint_geo = self.dataset.ns("https://mint.isi.edu/geo")
-        rdf = self.dataset.ns(outputs.Namespace.RDF)
-
         variables = {}
-        for c in self.dataset.c(mint.Variable):
-            # TODO: automatically discover properties and write them accordingly
-            standard_name = c.p(mint.standardName).as_ndarray([]).data
-            assert standard_name.size == 1
-            standard_name = standard_name[0]
-
-            if c.p(mint.timestamp) is not None:
-                timestamp = c.p(mint.timestamp).as_ndarray([]).data
-                assert timestamp.size == 1
-                timestamp = timestamp[0]
-            else:
-                timestamp = None
-
-            for raster_id, sc in c.group_by(mint_geo.raster):
-                gt = self.dataset.get_record_by_id(raster_id)
-                val = sc.p(rdf.value).as_ndarray([c.p(mint_geo.lat), c.p(mint_geo.long)])
-
-                assert len(val.data.shape) == 2
-                if timestamp is not None:
-                    data = val.data.reshape(1, *val.data.shape)
-                else:
-                    data = val.data
-                nodata = val.nodata.value
-                if isinstance(nodata, np.number):
-                    if isinstance(nodata, np.integer):
-                        nodata = int(nodata)
-                    else:
-                        nodata = float(nodata)
-
-                variables[f"var_{len(variables)}"] = {
-                    "data": data,
-                    "timestamp": np.asarray([timestamp]),
-                    "lat": val.index_props[0],
-                    "long": val.index_props[1],
-                    "metadata": {
-                        "standard_name": standard_name,
-                        "_FillValue": nodata,
-                        "missing_values": nodata,
-                        "dx": gt.s('mint-geo:dx'),
-                        "dy": gt.s("mint-geo:dy"),
-                        "epsg": gt.s("mint-geo:epsg"),
-                        "x_slope": gt.s("mint-geo:x_slope"),
-                        "y_slope": gt.s("mint-geo:y_slope"),
-                        "x_0": gt.s("mint-geo:x_0"),
-                        "y_0": gt.s("mint-geo:y_0")
-                    }
-                }
+        # coordinate axes of the grids, shared by the variables of the same grid
+        axes = {}
+        if isinstance(self.dataset, ShardedBackend):
+            # shards are loaded one by one, so that at most max_loaded of them are kept in memory
+            for dataset in self.dataset.iter_shards():
+                self.extract_variables(dataset, variables, axes)
+        else:
+            self.extract_variables(self.dataset, variables, axes)
 
         assert len(variables) > 0
         drepr = {
@@ -112,7 +70,7 @@ class NetCDFWriteFunc(IFunc):
         shared_dims = set()
         v0 = next(iter(variables.values()))
         for dim in ['timestamp', 'lat', 'long']:
-            if all(np.array_equal(v[dim], v0[dim]) for v in variables.values()):
+            if all(v[dim] is v0[dim] or np.array_equal(v[dim], v0[dim]) for v in variables.values()):
                 shared_dims.add(dim)
 
         # create netcdf variables
@@ -196,3 +154,71 @@ class NetCDFWriteFunc(IFunc):
         })
         ds.to_netcdf(self.outpupt_file)
         return {}
+
+    @staticmethod
+    def extract_variables(dataset: BaseOutputSM, variables: dict, axes: dict):
+        """
+        Extract the variables of a dataset (or a shard) to write them
+        """
+        mint = dataset.ns("https://mint.isi.edu/")
+        mint_geo = dataset.ns("https://mint.isi.edu/geo")
+        rdf = dataset.ns(outputs.Namespace.RDF)
+
+        for c in dataset.c(mint.Variable):
+            # TODO: automatically discover properties and write them accordingly
+            standard_name = c.p(mint.standardName).as_ndarray([]).data
+            assert standard_name.size == 1
+            standard_name = standard_name[0]
+
+            if c.p(mint.timestamp) is not None:
+                timestamp = c.p(mint.timestamp).as_ndarray([]).data
+                assert timestamp.size == 1
+                timestamp = timestamp[0]
+            else:
+                timestamp = None
+
+            for raster_id, sc in c.group_by(mint_geo.raster):
+                gt = dataset.get_record_by_id(raster_id)
+                val = sc.p(rdf.value).as_ndarray([c.p(mint_geo.lat), c.p(mint_geo.long)])
+
+                assert len(val.data.shape) == 2
+                if timestamp is not None:
+                    data = val.data.reshape(1, *val.data.shape)
+                else:
+                    data = val.data
+                nodata = val.nodata.value
+                if isinstance(nodata, np.number):
+                    if isinstance(nodata, np.integer):
+                        nodata = int(nodata)
+                    else:
+                        nodata = float(nodata)
+
+                variables[f"var_{len(variables)}"] = {
+                    "data": data,
+                    "timestamp": np.asarray([timestamp]),
+                    **NetCDFWriteFunc.get_axes(axes, gt, val),
+                    "metadata": {
+                        "standard_name": standard_name,
+                        "_FillValue": nodata,
+                        "missing_values": nodata,
+                        "dx": gt.s('mint-geo:dx'),
+                        "dy": gt.s("mint-geo:dy"),
+                        "epsg": gt.s("mint-geo:epsg"),
+                        "x_slope": gt.s("mint-geo:x_slope"),
+                        "y_slope": gt.s("mint-geo:y_slope"),
+                        "x_0": gt.s("mint-geo:x_0"),
+                        "y_0": gt.s("mint-geo:y_0")
+                    }
+                }
+
+    @staticmethod
+    def get_axes(axes: dict, gt, val) -> Dict[str, np.ndarray]:
+        """
+        Get the lat and long axes of a raster, shared by the variables of the same grid (geotransform and shape) so that
+        finding the dimensions shared by all variables compares them by identity instead of by value
+        """
+        key = (tuple(gt.s(f"mint-geo:{gt_k}") for gt_k in ["x_0", "y_0", "dx", "dy", "x_slope", "y_slope", "epsg"]),
+               val.data.shape)
+        if key not in axes:
+            axes[key] = {"lat": val.index_props[0], "long": val.index_props[1]}
+        return axes[key]
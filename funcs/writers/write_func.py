@@ -78,7 +78,8 @@ class CSVWriteFunc(IFunc):
 
         if isinstance(self.data, ShardedBackend):
 
-            for dataset in self.data.datasets:
+            # rows of the shards are written from the last added shard to the first one, as they have always been
+            for dataset in self.data.iter_shards(reverse=True):
                 id2attrs, attrs = self._sm_traverse(dataset, main_class_node, [])
 
                 main_attrs = attrs
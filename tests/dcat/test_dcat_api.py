@@ -0,0 +1,79 @@
+import json
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from threading import Thread
+
+import pytest
+
+from dtran.dcat.api import DCatAPI
+
+
+class CatalogHandler(BaseHTTPRequestHandler):
+    """
+    Stand-in of the data catalog serving the resources of one dataset
+    """
+    resources = []
+    paginated = True
+    # number of queries answered with a server error before the next one succeeds
+    n_failures = 0
+    queries = []
+
+    def do_GET(self):
+        self.reply(200, {"X-Api-Key": "key"})
+
+    def do_POST(self):
+        query = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        CatalogHandler.queries.append(query)
+        if CatalogHandler.n_failures > 0:
+            CatalogHandler.n_failures -= 1
+            self.reply(503, {"error": "unavailable"})
+            return
+        offset = query.get("offset", 0) if CatalogHandler.paginated else 0
+        self.reply(200, {"resources": CatalogHandler.resources[offset:offset + query["limit"]]})
+
+    def reply(self, status: int, body: dict):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def dcat(monkeypatch):
+    CatalogHandler.resources = [{"resource_id": f"r{i}"} for i in range(25)]
+    CatalogHandler.paginated = True
+    CatalogHandler.n_failures = 0
+    CatalogHandler.queries = []
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), CatalogHandler)
+    Thread(target=httpd.serve_forever, daemon=True).start()
+    yield DCatAPI(f"http://127.0.0.1:{httpd.server_address[1]}", max_retries=3, timeout=5)
+    httpd.shutdown()
+
+
+def test_resources_are_fetched_page_by_page(dcat):
+    resources = list(dcat.iter_resources_by_dataset_id("dataset", page_size=10))
+    assert resources == CatalogHandler.resources
+    assert [query["offset"] for query in CatalogHandler.queries] == [0, 10, 20]
+
+
+def test_all_resources_are_fetched_if_the_catalog_ignores_the_offset(dcat):
+    CatalogHandler.paginated = False
+    resources = list(dcat.iter_resources_by_dataset_id("dataset", page_size=10))
+    assert resources == CatalogHandler.resources
+    assert CatalogHandler.queries[-1]["limit"] == DCatAPI.UNPAGINATED_LIMIT
+
+
+def test_server_errors_are_retried_with_backoff(dcat, monkeypatch):
+    delays = []
+    monkeypatch.setattr("dtran.dcat.api.time.sleep", delays.append)
+    CatalogHandler.n_failures = 2
+    assert dcat.find_resources_by_dataset_id("dataset") == CatalogHandler.resources
+    assert delays == [0.5, 1.0]
+
+    CatalogHandler.n_failures = dcat.max_retries + 1
+    with pytest.raises(AssertionError):
+        dcat.find_resources_by_dataset_id("dataset")
@@ -0,0 +1,140 @@
+import json
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from threading import Thread
+
+import pytest
+
+from dtran.dcat.api import DCatAPI
+from dtran.dcat.publisher import Publisher
+
+
+class UploadCatalogHandler(BaseHTTPRequestHandler):
+    """
+    Stand-in of the upload server (PUT /upload/<name>) and of the registration endpoints of the data catalog
+    """
+    # names of the files whose upload fails
+    failed_uploads = set()
+    # number of batches of resources registered before the next registration fails
+    n_registrations = None
+    uploads = []
+    requests = []
+
+    def do_GET(self):
+        self.reply(200, {"X-Api-Key": "key"})
+
+    def do_PUT(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        name = self.path.rsplit("/", 1)[-1]
+        if name in UploadCatalogHandler.failed_uploads:
+            self.reply(500, {"error": "upload failed"})
+            return
+        UploadCatalogHandler.uploads.append(name)
+        self.send_response(201)
+        self.send_header("Location", f"http://files/{name}")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        endpoint = self.path.rsplit("/", 1)[-1]
+        UploadCatalogHandler.requests.append((endpoint, body))
+        if endpoint == "register_datasets":
+            self.reply(200, {"datasets": [{"record_id": "dataset"}]})
+        elif endpoint == "register_standard_variables":
+            self.reply(200, {"standard_variables": [
+                {"uri": var["uri"], "record_id": f"sv-{var['name']}"} for var in body["standard_variables"]]})
+        elif endpoint == "register_variables":
+            self.reply(200, {"variables": [
+                {"record_id": f"var-{var['name']}", **var} for var in body["variables"]]})
+        elif endpoint == "register_resources":
+            if UploadCatalogHandler.n_registrations == 0:
+                self.reply(400, {"error": "registration failed"})
+                return
+            if UploadCatalogHandler.n_registrations is not None:
+                UploadCatalogHandler.n_registrations -= 1
+            self.reply(200, {"resources": [
+                {"record_id": f"res-{resource['name']}", **resource} for resource in body["resources"]]})
+
+    def reply(self, status: int, body: dict):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def publisher():
+    UploadCatalogHandler.failed_uploads = set()
+    UploadCatalogHandler.n_registrations = None
+    UploadCatalogHandler.uploads = []
+    UploadCatalogHandler.requests = []
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), UploadCatalogHandler)
+    Thread(target=httpd.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{httpd.server_address[1]}"
+    dcat = DCatAPI(url, max_retries=0, timeout=5)
+    dcat.BATCH_SIZE = 2
+    # uploading one file at a time, so that the uploads before a failed one have all completed
+    yield Publisher(dcat, f"{url}/upload", n_workers=1)
+    httpd.shutdown()
+
+
+def registrations(endpoint: str) -> list:
+    return [body for name, body in UploadCatalogHandler.requests if name == endpoint]
+
+
+def test_publication_is_resumed_from_manifest(publisher, tmp_path):
+    files = []
+    for i in range(5):
+        files.append(tmp_path / f"f{i}.nc")
+        files[-1].write_bytes(b"x" * 100)
+    manifest_path = tmp_path / "manifest.json"
+    variable_data = {"standard_variables": [{"ontology": "ScientificVariablesOntology", "name": "rainfall",
+                                             "uri": "http://example.org/rainfall"}],
+                     "variable_names": ["rainfall"]}
+
+    def publish():
+        return publisher.publish("provenance", "dataset", "description", files, manifest_path, "NetCDF",
+                                 variable_data)
+
+    # the upload of the last file fails, the others are kept in the manifest
+    UploadCatalogHandler.failed_uploads = {"f4.nc"}
+    with pytest.raises(Exception):
+        publish()
+    manifest = Publisher.load_manifest(manifest_path)
+    assert sorted(manifest["uploaded"]) == ["f0.nc", "f1.nc", "f2.nc", "f3.nc"]
+    assert manifest["dataset"] is None
+    assert registrations("register_datasets") == []
+
+    # only the missing file is uploaded, then the registration of the second batch of resources fails
+    UploadCatalogHandler.failed_uploads = set()
+    UploadCatalogHandler.uploads = []
+    UploadCatalogHandler.n_registrations = 1
+    with pytest.raises(Exception, match="Bad request"):
+        publish()
+    assert UploadCatalogHandler.uploads == ["f4.nc"]
+    manifest = Publisher.load_manifest(manifest_path)
+    assert manifest["uploaded"]["f4.nc"] == "http://files/f4.nc"
+    assert manifest["dataset"]["record_id"] == "dataset"
+    assert [variable["record_id"] for variable in manifest["variables"]] == ["var-rainfall"]
+    assert manifest["registered"] == ["f0.nc", "f1.nc"]
+
+    # nothing is uploaded or registered twice
+    UploadCatalogHandler.uploads = []
+    UploadCatalogHandler.n_registrations = None
+    manifest = publish()
+    assert UploadCatalogHandler.uploads == []
+    assert len(registrations("register_datasets")) == 1
+    assert len(registrations("register_variables")) == 1
+    resources = [resource for body in registrations("register_resources") for resource in body["resources"]]
+    # the failed batch is registered again when the publication is resumed
+    assert [resource["name"] for resource in resources] == ["f0.nc", "f1.nc", "f2.nc", "f3.nc", "f2.nc", "f3.nc",
+                                                            "f4.nc"]
+    assert manifest["registered"] == [file.name for file in files]
+    assert {resource["data_url"] for resource in resources} == {f"http://files/{file.name}" for file in files}
+    assert all(resource["dataset_id"] == "dataset" and resource["variable_ids"] == ["var-rainfall"]
+               for resource in resources)
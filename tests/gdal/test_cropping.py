@@ -0,0 +1,94 @@
+import glob
+import os
+from uuid import uuid4
+
+import numpy as np
+import pytest
+
+gdal = pytest.importorskip("osgeo.gdal")
+
+from funcs.gdal.raster import Raster, GeoTransform, BoundingBox, ReSample, CropPlan, Cutline
+
+
+def global_raster(res: float, nodata: float = -9999.0) -> Raster:
+    n_rows, n_cols = int(round(180 / res)), int(round(360 / res))
+    data = np.random.RandomState(0).rand(n_rows, n_cols).astype(np.float32) * 100
+    data[::7, ::11] = nodata
+    return Raster(data, GeoTransform(x_0=-180, y_0=90, dx=res, dy=-res), 4326, nodata)
+
+
+def warp(raster: Raster, **options) -> np.ndarray:
+    tmp_file = f"/vsimem/{uuid4()}.tif"
+    ds = gdal.Warp(tmp_file, raster.raster, format="GTiff", xRes=raster.geotransform.dx,
+                   yRes=raster.geotransform.dy, srcNodata=raster.nodata, resampleAlg="bilinear", errorThreshold=0,
+                   **options)
+    data = ds.ReadAsArray()
+    ds = None
+    gdal.Unlink(tmp_file)
+    return data
+
+
+@pytest.mark.parametrize("res, bounds", [
+    # bounds aligned with the grid
+    (1.0, BoundingBox(32, 3, 48, 15)),
+    (0.5, BoundingBox(-180, -90, -170, -80)),
+    # ethiopia envelope
+    (0.25, BoundingBox(32.75418, 3.22206, 47.98942, 15.15943)),
+    (0.1, BoundingBox(32.75418, 3.22206, 47.98942, 15.15943)),
+    # bounds shifted by a fraction of a pixel
+    (0.5, BoundingBox(10.3, 20.1, 15.3, 25.1)),
+])
+def test_crop_bounds_matches_warp(res, bounds):
+    raster = global_raster(res)
+    expected = warp(raster, outputBounds=bounds.to_gdal())
+    cropped = Raster.crop_many([raster, raster], bounds, ReSample.BILINEAR)
+    for result in cropped:
+        assert result.data.shape == expected.shape
+        np.testing.assert_allclose(result.data, expected, rtol=1e-5, atol=1e-4)
+
+
+def test_crop_plan_aligned_bounds():
+    # the right neighbours of aligned target pixels have no weight and are past the window
+    plan = CropPlan(GeoTransform(x_0=0, y_0=3, dx=1, dy=-1), (3, 3), BoundingBox(0, 0, 3, 3), ReSample.BILINEAR)
+    data = np.arange(9, dtype=np.float32).reshape(3, 3)
+    np.testing.assert_array_equal(plan.apply(data), data)
+
+
+def test_crop_shape_matches_warp():
+    raster = global_raster(0.25)
+    # rough outline of ethiopia
+    polygon = [[[33.0, 8.4], [34.1, 10.6], [35.3, 12.9], [36.5, 14.3], [38.4, 14.4], [40.0, 14.5], [41.6, 13.4],
+                [42.4, 12.5], [43.1, 11.5], [42.8, 10.9], [44.2, 9.0], [47.8, 8.0], [44.9, 5.0], [41.9, 3.9],
+                [40.8, 4.3], [39.6, 3.4], [38.1, 3.6], [36.9, 4.4], [35.9, 4.6], [35.3, 5.5], [34.7, 6.6],
+                [33.6, 8.0], [33.0, 8.4]]]
+    cutline = Cutline(polygon, 4326)
+    vector_file = f"/tmp/{uuid4()}.shp"
+    cutline.to_shapefile(vector_file)
+    try:
+        expected = warp(raster, cutlineDSName=vector_file, cropToCutline=True, targetAlignedPixels=True,
+                        warpOptions=["CUTLINE_ALL_TOUCHED=TRUE"])
+    finally:
+        for f in glob.glob(f"{vector_file[:-4]}*"):
+            os.remove(f)
+
+    result, = Raster.crop_many([raster], resampling_algo=ReSample.BILINEAR, cutline=cutline)
+    assert result.data.shape == expected.shape
+    np.testing.assert_allclose(result.data, expected, rtol=1e-5, atol=1e-4)
+
+
+def test_crop_many_reads_lazy_rasters_only_when_cropped():
+    raster = global_raster(1.0)
+    bounds = BoundingBox(32, 3, 48, 15)
+    reads = []
+
+    def loader():
+        reads.append(1)
+        return raster.data
+
+    lazy_rasters = [Raster(None, raster.geotransform, raster.epsg, raster.nodata, loader=loader,
+                           shape=raster.data.shape, dtype=raster.data.dtype) for _ in range(3)]
+    assert lazy_rasters[0].shape == raster.data.shape and len(reads) == 0
+    expected, = Raster.crop_many([raster], bounds, ReSample.BILINEAR)
+    for result in Raster.crop_many(lazy_rasters, bounds, ReSample.BILINEAR):
+        np.testing.assert_array_equal(result.data, expected.data)
+    assert len(reads) == 3
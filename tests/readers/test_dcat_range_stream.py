@@ -0,0 +1,102 @@
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+from functools import partial
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+from pathlib import Path
+from threading import Thread
+
+import pytest
+
+os.environ.setdefault("DATA_CATALOG_DOWNLOAD_DIR", tempfile.mkdtemp())
+os.environ.setdefault("NO_CHECK_CERTIFICATE", "false")
+
+from dtran.argtype import ArgType
+from dtran.ifunc import IFunc
+from dtran.pipeline import Pipeline, AdapterOptions
+
+try:
+    from funcs.readers.dcat_range_stream import DcatRangeStream
+    from funcs.readers.dcat_read_func import ResourceManager, DcatReadFunc, Resource
+    from funcs.readers.dcat_resource_index import ResourceIndex
+except ImportError as e:
+    # the data catalog readers require drepr
+    pytest.skip(f"Cannot import the data catalog readers: {e}", allow_module_level=True)
+
+START_TIME = datetime(2020, 1, 1)
+RESOURCE_SIZE = 100000
+
+
+class WindowReader(IFunc):
+    """
+    Reads the resource of a window slowly, so that the stream runs ahead of it
+    """
+    id = "window_reader"
+    inputs = {"start_time": ArgType.DateTime, "end_time": ArgType.DateTime}
+    outputs = {}
+    windows = []
+
+    def __init__(self, start_time: datetime, end_time: datetime):
+        self.start_time = start_time
+        self.end_time = end_time
+
+    def exec(self) -> dict:
+        resource_manager = ResourceManager.get_instance()
+        for resource in ResourceIndex.get_instance().find_resources("dataset", self.start_time, self.end_time):
+            path = resource_manager.download(resource["resource_id"], DcatReadFunc.get_resource_metadata(resource), False)
+            time.sleep(0.1)
+            WindowReader.windows.append(Path(path).stat().st_size)
+            resource_manager.unlink(resource["resource_id"])
+        return {}
+
+    def validate(self) -> bool:
+        return True
+
+
+@pytest.fixture
+def server(tmp_path):
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), partial(SimpleHTTPRequestHandler, directory=str(tmp_path)))
+    Thread(target=httpd.serve_forever, daemon=True).start()
+    yield tmp_path, f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+
+
+def test_prefetched_windows_are_kept_until_read(server, monkeypatch):
+    directory, url = server
+    n_windows = 8
+    resources = []
+    for i in range(n_windows):
+        (directory / f"w{i}.bin").write_bytes(os.urandom(RESOURCE_SIZE))
+        resources.append({"resource_id": f"00000000-0000-0000-0000-{i:012d}", "resource_type": ".bin",
+                          "resource_data_url": f"{url}/w{i}.bin"})
+
+    def find_resources(self, dataset_id, start_time=None, end_time=None):
+        return [resources[(start_time - START_TIME).days]]
+
+    monkeypatch.setattr(ResourceIndex, "find_resources", find_resources)
+    monkeypatch.setattr(ResourceIndex, "get_instance", staticmethod(lambda: ResourceIndex.__new__(ResourceIndex)))
+    resource_manager = ResourceManager.get_instance()
+    # the cache only holds 4 resources, so resources released before they are read are evicted by the next downloads
+    monkeypatch.setattr(resource_manager, "max_capacity", 4 * RESOURCE_SIZE)
+    misses = resource_manager.kv["misses"]
+    WindowReader.windows = []
+
+    # the stream runs up to buffer_size windows ahead of the reader, and prefetches read_ahead windows ahead of itself
+    pipeline = Pipeline([DcatRangeStream, WindowReader], [
+        DcatRangeStream.O.start_time == WindowReader.I.start_time,
+        DcatRangeStream.O.end_time == WindowReader.I.end_time,
+    ], [AdapterOptions(), AdapterOptions(buffer_size=3, executor="thread")])
+    pipeline.exec({
+        "dcat_range_stream__1__dataset_id": "dataset",
+        "dcat_range_stream__1__start_time": START_TIME,
+        "dcat_range_stream__1__end_time": START_TIME + timedelta(days=n_windows),
+        "dcat_range_stream__1__step_time": "P1D",
+        "dcat_range_stream__1__read_ahead": 2,
+        "dcat_range_stream__1__read_ahead_size": f"{3 * RESOURCE_SIZE}",
+    })
+
+    assert WindowReader.windows == [RESOURCE_SIZE] * n_windows
+    # every resource is downloaded once, by the prefetcher or by the reader
+    assert resource_manager.kv["misses"] - misses == n_windows
+    assert all(resource.ref_count == 0 for resource in Resource.select())
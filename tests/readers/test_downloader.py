@@ -0,0 +1,94 @@
+import hashlib
+import os
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from threading import Thread
+
+import pytest
+
+from funcs.readers.downloader import Downloader, DownloadError
+
+CONTENT = os.urandom(1 << 18)
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    """
+    Serves CONTENT with support for Range requests. The first n_interruptions responses are cut after half of the
+    requested bytes, as if the connection was lost
+    """
+    n_interruptions = 0
+    ranges = []
+
+    def do_GET(self):
+        header = self.headers.get("Range")
+        RangeHandler.ranges.append(header)
+        start = int(header[len("bytes="):].rstrip("-")) if header else 0
+        body = CONTENT[start:]
+        self.send_response(206 if header else 200)
+        if header:
+            self.send_header("Content-Range", f"bytes {start}-{len(CONTENT) - 1}/{len(CONTENT)}")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if RangeHandler.n_interruptions > 0:
+            RangeHandler.n_interruptions -= 1
+            self.wfile.write(body[:len(body) // 2])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    RangeHandler.n_interruptions = 0
+    RangeHandler.ranges = []
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), RangeHandler)
+    Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}/file.bin"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_interrupted_download_is_resumed(server, tmp_path, monkeypatch):
+    # the bytes of an interrupted chunk are lost, so the content is cut at chunk boundaries
+    monkeypatch.setattr(Downloader, "chunk_size", 1024)
+    RangeHandler.n_interruptions = 2
+    path = tmp_path / "file.bin"
+    checksum = "sha256:" + hashlib.sha256(CONTENT).hexdigest()
+
+    assert Downloader(n_workers=1).fetch(server, path, len(CONTENT), checksum) == len(CONTENT)
+    assert path.read_bytes() == CONTENT
+    assert not (tmp_path / "file.bin.part").exists()
+    # each attempt resumes from the bytes received by the previous ones
+    half, quarter = len(CONTENT) // 2, len(CONTENT) // 4
+    assert RangeHandler.ranges == [None, f"bytes={half}-", f"bytes={half + quarter}-"]
+
+
+def test_partial_download_is_resumed(server, tmp_path):
+    path = tmp_path / "file.bin"
+    (tmp_path / "file.bin.part").write_bytes(CONTENT[:1000])
+
+    assert Downloader(n_workers=1).fetch(server, path) == len(CONTENT)
+    assert path.read_bytes() == CONTENT
+    assert RangeHandler.ranges == ["bytes=1000-"]
+
+
+def test_checksum_mismatch(server, tmp_path):
+    path = tmp_path / "file.bin"
+    checksum = "sha256:" + hashlib.sha256(b"something else").hexdigest()
+
+    with pytest.raises(DownloadError, match="Checksum"):
+        Downloader(n_workers=1).fetch(server, path, checksum=checksum)
+    # the corrupted download is discarded rather than resumed by the next attempt
+    assert not path.exists()
+    assert not (tmp_path / "file.bin.part").exists()
+
+
+def test_download_gives_up_after_max_retries(server, tmp_path):
+    RangeHandler.n_interruptions = 10
+
+    with pytest.raises(DownloadError, match="Cannot download"):
+        Downloader(n_workers=1, max_retries=2).fetch(server, tmp_path / "file.bin")
+    assert len(RangeHandler.ranges) == 3
@@ -0,0 +1,89 @@
+import multiprocessing
+import os
+import tempfile
+import time
+
+import pytest
+
+os.environ.setdefault("DATA_CATALOG_DOWNLOAD_DIR", tempfile.mkdtemp())
+os.environ.setdefault("NO_CHECK_CERTIFICATE", "false")
+
+try:
+    from funcs.readers.dcat_read_func import ResourceLock
+except ImportError as e:
+    # the data catalog readers require drepr
+    pytest.skip(f"Cannot import the data catalog readers: {e}", allow_module_level=True)
+
+RESOURCE_ID = "00000000-0000-0000-0000-000000000000"
+# the locks are held by processes forked from the test, which inherit the lock directory
+context = multiprocessing.get_context("fork")
+
+
+def hold_lock(exclusive: bool, acquired, release):
+    lock = ResourceLock(RESOURCE_ID)
+    lock.acquire(exclusive)
+    acquired.set()
+    release.wait(10)
+    lock.release()
+
+
+@pytest.fixture
+def holder():
+    processes = []
+
+    def start(exclusive: bool):
+        acquired, release = context.Event(), context.Event()
+        process = context.Process(target=hold_lock, args=(exclusive, acquired, release))
+        process.start()
+        processes.append((process, release))
+        assert acquired.wait(10)
+        return release
+
+    yield start
+    for process, release in processes:
+        release.set()
+        process.join(10)
+
+
+def test_exclusive_lock_excludes_other_processes(holder):
+    release = holder(True)
+    lock = ResourceLock(RESOURCE_ID)
+    try:
+        assert not lock.acquire(exclusive=False, blocking=False)
+        assert not lock.acquire(exclusive=True, blocking=False)
+        release.set()
+        # a process waiting for the lock wakes up as soon as it is released
+        start = time.time()
+        assert lock.acquire(exclusive=True)
+        assert time.time() - start < 5
+    finally:
+        lock.release()
+
+
+def test_shared_locks_are_shared_between_processes(holder):
+    release = holder(False)
+    lock = ResourceLock(RESOURCE_ID)
+    try:
+        assert lock.acquire(exclusive=False, blocking=False)
+        # the resource cannot be evicted while another process uses it
+        lock.release()
+        assert not lock.acquire(exclusive=True, blocking=False)
+        release.set()
+        assert lock.acquire(exclusive=True)
+    finally:
+        lock.release()
+
+
+def test_exclusive_lock_converted_to_shared(holder):
+    lock = ResourceLock(RESOURCE_ID)
+    try:
+        assert lock.acquire(exclusive=True)
+        # a downloaded resource is kept locked (shared) by the process which downloaded it
+        assert lock.acquire(exclusive=False)
+        # other processes can then use it, but not evict it
+        holder(False)
+        other = ResourceLock(RESOURCE_ID)
+        assert not other.acquire(exclusive=True, blocking=False)
+        other.release()
+    finally:
+        lock.release()
@@ -0,0 +1,34 @@
+import pytest
+
+from dtran.pipeline import Pipeline, AdapterOptions
+from toy_adapters import Numbers, Square, Pairs, reset
+
+
+@pytest.fixture(autouse=True)
+def clean():
+    reset()
+    yield
+    reset()
+
+
+def pairs_pipeline(buffer_size: int) -> Pipeline:
+    # pairs reads all the squares before the numbers, so the numbers have to wait in its buffer
+    return Pipeline([Numbers, Square, Pairs], [
+        Numbers.O.x == Square.I.x,
+        Square.O.y == Pairs.I.x,
+        Numbers.O.x == Pairs.I.y,
+    ], [AdapterOptions(), AdapterOptions(), AdapterOptions(buffer_size=buffer_size)])
+
+
+def test_deadlock_is_reported():
+    with pytest.raises(RuntimeError, match="Pipeline went into a deadlock") as e:
+        pairs_pipeline(buffer_size=1).exec({"numbers__1__n": 5})
+    message = str(e.value)
+    assert "pairs__1 is waiting for input pairs__1__x from square__1" in message
+    assert "square__1 is waiting for input square__1__x from numbers__1" in message
+    assert "numbers__1 is waiting for pairs__1 to consume input pairs__1__y" in message
+
+
+def test_buffer_size_avoids_the_deadlock():
+    pairs_pipeline(buffer_size=5).exec({"numbers__1__n": 5})
+    assert Pairs.values == [(0, 0), (1, 1), (4, 2), (9, 3), (16, 4)]
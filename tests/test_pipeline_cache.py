@@ -0,0 +1,39 @@
+import pytest
+
+from dtran.cache import ResultCache
+from dtran.pipeline import Pipeline, AdapterOptions
+from toy_adapters import Numbers, Square, Collect, reset
+
+
+@pytest.fixture(autouse=True)
+def clean():
+    reset()
+    yield
+    reset()
+
+
+def squares_pipeline(cache: ResultCache, square_options: AdapterOptions = None) -> Pipeline:
+    return Pipeline([Numbers, Square, Collect], [
+        Numbers.O.x == Square.I.x,
+        Square.O.y == Collect.I.y,
+    ], [AdapterOptions(), square_options or AdapterOptions(), AdapterOptions()], cache=cache)
+
+
+def test_results_are_served_from_the_cache_on_rerun(tmp_path):
+    squares_pipeline(ResultCache(tmp_path)).exec({"numbers__1__n": 3})
+    assert Square.calls == [0, 1, 2]
+
+    reset()
+    pipeline = squares_pipeline(ResultCache(tmp_path))
+    pipeline.exec({"numbers__1__n": 3})
+    assert Square.calls == []
+    assert pipeline.instrumentation.adapters["square__1"].cache_hits == 3
+    # adapters without outputs are executed on every run
+    assert Collect.values == [0, 1, 4]
+
+
+def test_adapters_can_opt_out_of_the_cache(tmp_path):
+    squares_pipeline(ResultCache(tmp_path), AdapterOptions(cache=False)).exec({"numbers__1__n": 3})
+    reset()
+    squares_pipeline(ResultCache(tmp_path), AdapterOptions(cache=False)).exec({"numbers__1__n": 3})
+    assert Square.calls == [0, 1, 2]
@@ -0,0 +1,52 @@
+import pytest
+
+from dtran.pipeline import Pipeline, AdapterOptions, load_stream
+from toy_adapters import Numbers, AsyncNumbers, Square, Collect, Interrupted, reset
+
+
+@pytest.fixture(autouse=True)
+def clean():
+    reset()
+    yield
+    reset()
+
+
+@pytest.mark.parametrize("source", [Numbers, AsyncNumbers])
+def test_resume_replays_completed_invocations(tmp_path, source):
+    # squaring runs in a thread, so that the squares computed before the interruption are collected meanwhile
+    pipeline = Pipeline([source, Square, Collect], [
+        source.O.x == Square.I.x,
+        Square.O.y == Collect.I.y,
+    ], [AdapterOptions(), AdapterOptions(executor="thread"), AdapterOptions()])
+    Square.fail_on = {3}
+    Square.delays = {3: 0.2}
+    with pytest.raises(Interrupted):
+        pipeline.exec({f"{source.id}__1__n": 6}, checkpoint_dir=tmp_path)
+    assert Collect.values == [0, 1, 4]
+
+    reset()
+    Pipeline.resume(tmp_path)
+    # the invocations before the interruption are replayed, their inputs are neither squared nor collected again
+    assert Square.calls == [3, 4, 5]
+    assert Collect.values == [9, 16, 25]
+
+
+@pytest.mark.parametrize("source", [Numbers, AsyncNumbers])
+def test_resume_replays_results_of_an_interrupted_stream(tmp_path, source):
+    # the generator runs in a thread, so that the numbers emitted before the interruption are squared meanwhile
+    pipeline = Pipeline([source, Square], [source.O.x == Square.I.x], [
+        AdapterOptions(executor="thread" if source is Numbers else None), AdapterOptions()])
+    Numbers.fail_at = 3
+    with pytest.raises(Interrupted):
+        pipeline.exec({f"{source.id}__1__n": 5}, checkpoint_dir=tmp_path)
+    assert Square.calls == [0, 1, 2]
+    # the results of the interrupted stream are stored as they are emitted
+    key = pipeline.cache_key(0, {"n": 5})
+    assert [result["x"] for result in load_stream(pipeline.checkpoint_store, key)] == [0, 1, 2]
+
+    reset()
+    Pipeline.resume(tmp_path)
+    # the stream is executed again from its beginning, but its results emitted before are replayed from the checkpoint
+    # and not emitted again, so their consumers' invocations are replayed as well
+    assert Numbers.emitted == 5
+    assert Square.calls == [3, 4]
@@ -0,0 +1,63 @@
+import threading
+
+import pytest
+from marshmallow import ValidationError
+
+from dtran.pipeline import Pipeline, AdapterOptions
+from dtran.ifunc import IFunc
+from dtran.argtype import ArgType
+from toy_adapters import Numbers, Square, Collect, reset
+
+
+@pytest.fixture(autouse=True)
+def clean():
+    reset()
+    yield
+    reset()
+
+
+@pytest.mark.parametrize("executor", [None, "thread", "process"])
+def test_executors_produce_the_same_results(executor):
+    pipeline = Pipeline([Numbers, Square, Collect], [
+        Numbers.O.x == Square.I.x,
+        Square.O.y == Collect.I.y,
+    ], [AdapterOptions(), AdapterOptions(executor=executor), AdapterOptions()], max_workers=2)
+    pipeline.exec({"numbers__1__n": 5})
+    assert Collect.values == [0, 1, 4, 9, 16]
+
+
+class CurrentThread(IFunc):
+    """
+    Adapter recording the thread executing it
+    """
+    id = "current_thread"
+    inputs = {"x": ArgType.Number}
+    outputs = {}
+    threads = []
+
+    def __init__(self, x: int):
+        self.x = x
+
+    def exec(self) -> dict:
+        CurrentThread.threads.append(threading.current_thread())
+        return {}
+
+    def validate(self) -> bool:
+        return True
+
+    def change_metadata(self, metadata):
+        return metadata
+
+
+def test_thread_executor_runs_outside_of_the_event_loop():
+    CurrentThread.threads = []
+    pipeline = Pipeline([Numbers, CurrentThread], [Numbers.O.x == CurrentThread.I.x], [
+        AdapterOptions(), AdapterOptions(executor="thread")])
+    pipeline.exec({"numbers__1__n": 3})
+    assert len(CurrentThread.threads) == 3
+    assert threading.main_thread() not in CurrentThread.threads
+
+
+def test_invalid_executor():
+    with pytest.raises(ValidationError, match="Invalid executor"):
+        Pipeline([Numbers, Square], [Numbers.O.x == Square.I.x], [AdapterOptions(), AdapterOptions(executor="gpu")])
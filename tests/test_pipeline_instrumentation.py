@@ -0,0 +1,50 @@
+import urllib.request
+
+import pytest
+import ujson
+
+from dtran.instrumentation import Instrumentation
+from dtran.pipeline import Pipeline
+from toy_adapters import Numbers, Square, Collect, reset
+
+
+@pytest.fixture(autouse=True)
+def clean():
+    reset()
+    yield
+    reset()
+
+
+def test_statistics_of_adapters_and_edges(tmp_path):
+    Square.delays = {0: 0.1}
+    pipeline = Pipeline([Numbers, Square, Collect], [
+        Numbers.O.x == Square.I.x,
+        Square.O.y == Collect.I.y,
+    ])
+    pipeline.exec({"numbers__1__n": 3})
+    pipeline.instrumentation.save(tmp_path / "report.json")
+    with open(str(tmp_path / "report.json"), "r") as f:
+        report = ujson.load(f)
+
+    square = report["adapters"]["square__1"]
+    assert (square["executions"], square["items_in"], square["items_out"]) == (3, 3, 3)
+    assert square["exec_time"] >= 0.1
+    assert report["adapters"]["numbers__1"]["items_out"] == 3
+    assert report["adapters"]["collect__1"]["items_in"] == 3
+    edges = {(edge["from"], edge["to"]): edge["items"] for edge in report["edges"]}
+    assert edges == {("numbers__1__x", "square__1__x"): 3, ("square__1__y", "collect__1__y"): 3}
+    assert report["wall_time"] >= 0.1 and report["peak_rss"] > 0
+
+
+def test_statistics_are_exposed_to_prometheus():
+    instrumentation = Instrumentation()
+    pipeline = Pipeline([Numbers, Square], [Numbers.O.x == Square.I.x])
+    pipeline.exec({"numbers__1__n": 2}, instrumentation=instrumentation)
+    instrumentation.serve(0)
+    try:
+        port = instrumentation.server.server_address[1]
+        metrics = urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5).read().decode()
+    finally:
+        instrumentation.shutdown()
+    assert 'dtran_adapter_executions{adapter="square__1"} 2' in metrics
+    assert 'dtran_edge_items{from="numbers__1__x",to="square__1__x"} 2' in metrics
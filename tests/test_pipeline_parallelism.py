@@ -0,0 +1,36 @@
+import time
+
+import pytest
+
+from dtran.pipeline import Pipeline, AdapterOptions
+from toy_adapters import Numbers, Square, Collect, reset
+
+
+@pytest.fixture(autouse=True)
+def clean():
+    reset()
+    yield
+    reset()
+
+
+def squares_pipeline(ordered: bool) -> Pipeline:
+    return Pipeline([Numbers, Square, Collect], [
+        Numbers.O.x == Square.I.x,
+        Square.O.y == Collect.I.y,
+    ], [AdapterOptions(), AdapterOptions(parallelism=4, ordered=ordered), AdapterOptions()])
+
+
+def test_parallel_results_are_emitted_in_order():
+    # the first numbers take the longest to square
+    Square.delays = {0: 0.3, 1: 0.2, 2: 0.1}
+    start_time = time.time()
+    squares_pipeline(ordered=True).exec({"numbers__1__n": 6})
+    assert Collect.values == [0, 1, 4, 9, 16, 25]
+    # the numbers are squared concurrently
+    assert time.time() - start_time < 0.5
+
+
+def test_unordered_results_are_emitted_as_they_complete():
+    Square.delays = {0: 0.3, 1: 0.2, 2: 0.1}
+    squares_pipeline(ordered=False).exec({"numbers__1__n": 4})
+    assert Collect.values == [9, 4, 1, 0]
@@ -0,0 +1,149 @@
+"""
+Toy adapters of the pipeline tests. They are defined in a module (rather than in the tests) so that they can be
+pickled by reference, as the adapters of a checkpointed pipeline or of a process pool are
+"""
+import asyncio
+import time
+
+from dtran.argtype import ArgType
+from dtran.ifunc import IFunc
+
+
+class Interrupted(Exception):
+    pass
+
+
+class Numbers(IFunc):
+    """
+    Generator adapter emitting the numbers from 0 to n - 1
+    """
+    id = "numbers"
+    inputs = {"n": ArgType.Number}
+    outputs = {"x": ArgType.Number}
+    # number of numbers emitted, in all executions
+    emitted = 0
+    # number before which the executions fail, to interrupt the pipeline once the numbers emitted before are consumed
+    fail_at = None
+    fail_delay = 0.2
+
+    def __init__(self, n: int):
+        self.n = int(n)
+
+    def exec(self):
+        for i in range(self.n):
+            if i == Numbers.fail_at:
+                time.sleep(Numbers.fail_delay)
+                raise Interrupted(f"Execution of {self.id} is interrupted at {i}")
+            Numbers.emitted += 1
+            yield {"x": i}
+
+    def validate(self) -> bool:
+        return True
+
+    def change_metadata(self, metadata):
+        return metadata
+
+
+class AsyncNumbers(Numbers):
+    """
+    Async generator adapter emitting the numbers from 0 to n - 1
+    """
+    id = "async_numbers"
+
+    async def exec(self):
+        for i in range(self.n):
+            if i == Numbers.fail_at:
+                await asyncio.sleep(Numbers.fail_delay)
+                raise Interrupted(f"Execution of {self.id} is interrupted at {i}")
+            Numbers.emitted += 1
+            yield {"x": i}
+
+
+class Square(IFunc):
+    """
+    Regular adapter squaring its input, after sleeping delays[x] seconds
+    """
+    id = "square"
+    inputs = {"x": ArgType.Number}
+    outputs = {"y": ArgType.Number}
+    # inputs of the executions, in all executions
+    calls = []
+    delays = {}
+    # inputs whose execution fails, to interrupt the pipeline
+    fail_on = set()
+
+    def __init__(self, x: int):
+        self.x = x
+
+    def exec(self) -> dict:
+        Square.calls.append(self.x)
+        time.sleep(Square.delays.get(self.x, 0))
+        if self.x in Square.fail_on:
+            raise Interrupted(f"Execution of {self.x} is interrupted")
+        return {"y": self.x * self.x}
+
+    def validate(self) -> bool:
+        return True
+
+    def change_metadata(self, metadata):
+        return metadata
+
+
+class Collect(IFunc):
+    """
+    Writer-like adapter collecting its inputs
+    """
+    id = "collect"
+    inputs = {"y": ArgType.Number}
+    outputs = {}
+    values = []
+
+    def __init__(self, y: int):
+        self.y = y
+
+    def exec(self) -> dict:
+        Collect.values.append(self.y)
+        return {}
+
+    def validate(self) -> bool:
+        return True
+
+    def change_metadata(self, metadata):
+        return metadata
+
+
+class Pairs(IFunc):
+    """
+    Async generator adapter reading all of its x inputs before its y inputs
+    """
+    id = "pairs"
+    inputs = {"x": ArgType.Number, "y": ArgType.Number}
+    outputs = {}
+    values = []
+
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+    async def exec(self):
+        xs = [x async for x in self.x]
+        ys = [y async for y in self.y]
+        Pairs.values = list(zip(xs, ys))
+        if False:
+            yield {}
+
+    def validate(self) -> bool:
+        return True
+
+    def change_metadata(self, metadata):
+        return metadata
+
+
+def reset():
+    Numbers.emitted = 0
+    Numbers.fail_at = None
+    Square.calls = []
+    Square.delays = {}
+    Square.fail_on = set()
+    Collect.values = []
+    Pairs.values = []
@@ -5,9 +5,10 @@ from flask import Blueprint, jsonify
 
 import funcs
 from dtran.ifunc import IFuncType
+from funcs.registry import load_manifest
 
 KEY_DESC = 'description'
-KEY_MODL = '__module__'
+KEY_MODL = 'module'
 KEY_IDENTIFIER = 'id'
 KEY_INPUTS = 'inputs'
 KEY_OUTPUTS = 'outputs'
@@ -197,55 +198,36 @@ class AdapterDB:
         self.initialize_adapters()
 
     def get_adapter_object_from_name(self, adp_name):
-        """ Get an Adapter object (class) from the name of the adapter. """
+        """ Get an Adapter object (class) from the name of the adapter, importing it on first use. """
         if adp_name in self.name2object:
-            return self.name2object[adp_name]
+            return getattr(funcs, adp_name)
         return None
 
     def initialize_adapters(self):
-        """ Initialize adapters in AdapterDB by reading the 'funcs' python module. """
-        for a_name, a_cls in funcs.__dict__.items():
-            if isinstance(a_cls, type):
-                cls_dict    = a_cls.__dict__
-                module_type = cls_dict[KEY_MODL].split('.')[-1]
-                identifier  = cls_dict[KEY_IDENTIFIER]
-
-                # Get description
-                description = None
-                if KEY_DESC in cls_dict:
-                    description = cls_dict[KEY_DESC]
-
-                # Get function type
-                func_type = IFuncType.OTHERS.value
-                if KEY_FUNC_TYPE in cls_dict:
-                    func_type = cls_dict[KEY_FUNC_TYPE].value
-
-                # Get friendly name
-                friendly_name = None
-                if KEY_FRIENDLY_NAME in cls_dict:
-                    friendly_name = cls_dict[KEY_FRIENDLY_NAME]
-
-                # Get inputs/outputs
-                inputs_dict  = cls_dict[KEY_INPUTS]
-                outputs_dict = cls_dict[KEY_OUTPUTS]
-                inputs, outputs = dict(), dict()
-                for arg_name, arg_attr in inputs_dict.items():
-                    inputs[arg_name] = {'id': arg_attr.__dict__['id'], \
-                        'val': arg_attr.__dict__['val'], 'optional': arg_attr.__dict__['optional']}
-                for arg_name, arg_attr in outputs_dict.items():
-                    outputs[arg_name] = {'id': arg_attr.__dict__['id'], \
-                        'val': arg_attr.__dict__['val'], 'optional': arg_attr.__dict__['optional']}
-
-                # Get example
-                example = {}
-                if KEY_EXAMPLE in cls_dict:
-                    example = cls_dict[KEY_EXAMPLE]
-
-                self.adapters.append(AdapterElement(
-                    a_name, module_type, identifier, description, inputs,
-                    outputs, friendly_name, func_type, example
-                ))
-                self.name2object[a_name] = a_cls
+        """ Initialize adapters in AdapterDB by reading the manifest of the 'funcs' python module,
+        without importing the adapters. """
+        for adapter in load_manifest():
+            a_name      = adapter['name']
+            module_type = adapter[KEY_MODL].split('.')[-1]
+            identifier  = adapter[KEY_IDENTIFIER]
+            description = adapter[KEY_DESC]
+            func_type   = adapter[KEY_FUNC_TYPE] or IFuncType.OTHERS.value
+            friendly_name = adapter[KEY_FRIENDLY_NAME]
+
+            # Get inputs/outputs
+            inputs, outputs = dict(), dict()
+            for arg_name, arg_attr in adapter[KEY_INPUTS].items():
+                inputs[arg_name] = {'id': arg_attr['id'], 'val': arg_attr['val'], 'optional': arg_attr['optional']}
+            for arg_name, arg_attr in adapter[KEY_OUTPUTS].items():
+                outputs[arg_name] = {'id': arg_attr['id'], 'val': arg_attr['val'], 'optional': arg_attr['optional']}
+
+            example = adapter[KEY_EXAMPLE]
+
+            self.adapters.append(AdapterElement(
+                a_name, module_type, identifier, description, inputs,
+                outputs, friendly_name, func_type, example
+            ))
+            self.name2object[a_name] = adapter[KEY_MODL]
 
     def get_list_of_adapters(self):
         """ Get the list of AdapterElements in the AdapterDB. """
@@ -0,0 +1,235 @@
+import heapq
+import itertools
+import logging
+import multiprocessing
+import os
+import socket
+import sys
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import redirect_stdout, redirect_stderr
+from datetime import datetime
+from pathlib import Path
+from threading import Condition, Thread
+from typing import *
+
+import ujson
+
+TIME_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+
+def get_boot_id() -> str:
+    # identifier of the current boot of the machine, so that a pid recorded before a reboot isn't mistaken for a live one
+    try:
+        return Path("/proc/sys/kernel/random/boot_id").read_text().strip()
+    except OSError:
+        return ""
+
+
+def warm_up():
+    """
+    Initializer of the worker processes: importing the engine and every adapter once, so that pipelines only pay for
+    their actual work
+    """
+    import funcs
+    from dtran.config_parser import ConfigParser
+
+    for name in funcs.ADAPTERS:
+        try:
+            getattr(funcs, name)
+        except Exception as e:
+            print(f"Cannot import adapter {name}: {e}", file=sys.stderr)
+
+
+def execute(config: dict, log_file: str) -> Tuple[str, str]:
+    """
+    Execute a pipeline in a worker process, writing its output and logs to the log file
+    :return: status (finished or failed) and end time
+    """
+    from dtran.config_parser import ConfigParser
+
+    with open(log_file, "a", buffering=1) as f, redirect_stdout(f), redirect_stderr(f):
+        handler = logging.StreamHandler(f)
+        logging.getLogger().addHandler(handler)
+        try:
+            pipeline, inputs = ConfigParser().parse(conf_obj=config)
+            pipeline.exec(inputs)
+            status = "finished"
+        except Exception:
+            traceback.print_exc()
+            status = "failed"
+        finally:
+            logging.getLogger().removeHandler(handler)
+    return status, datetime.now().strftime(TIME_FORMAT)
+
+
+class PipelineRunner:
+    """
+    Runs pipelines in a persistent pool of warm worker processes. Pipelines are queued by priority (higher first, then
+    in submission order) and at most max_concurrency of them run at the same time. Their status and output are kept in
+    the store directory: {id}.json for the status and {id}.log for the output
+    """
+    instance = None
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, store_dir: str, n_workers: int = 2, max_concurrency: int = None):
+        self.store_dir = Path(store_dir)
+        self.store_dir.mkdir(exist_ok=True, parents=True)
+        self.n_workers = n_workers
+        self.max_concurrency = min(max_concurrency or n_workers, n_workers)
+        # queue of (-priority, sequence number, pipeline id)
+        self.queue = []
+        self.seq = itertools.count()
+        self.n_running = 0
+        self.condition = Condition()
+
+        # process owning the pipelines submitted to this runner, recorded in their status
+        self.owner = {"host": socket.gethostname(), "boot_id": get_boot_id(), "pid": os.getpid()}
+
+        # pipelines which were queued or running when their runner stopped will never finish, but those of runners
+        # which are still alive (other server processes sharing the store directory) are left to them
+        for path in self.store_dir.glob("*.json"):
+            data = self.read(path.stem)
+            if data.get("status") in {"queued", "running"} and not self.is_alive(data.get("owner")):
+                self.update(path.stem, status="failed", end=datetime.now().strftime(TIME_FORMAT))
+
+        self.pool = self.create_pool()
+        Thread(target=self.dispatch, daemon=True).start()
+
+    @staticmethod
+    def get_instance() -> 'PipelineRunner':
+        if PipelineRunner.instance is None:
+            n_workers = int(os.environ.get("PIPELINE_WORKERS", 2))
+            max_concurrency = os.environ.get("PIPELINE_CONCURRENCY")
+            PipelineRunner.instance = PipelineRunner(
+                os.environ.get("PIPELINE_STORE_DIR", "/tmp/mintdt"), n_workers,
+                int(max_concurrency) if max_concurrency is not None else None)
+        return PipelineRunner.instance
+
+    def is_alive(self, owner: Optional[dict]) -> bool:
+        """
+        Check if the runner owning a pipeline is still alive. Runners of other hosts can't be checked, so they are
+        assumed to be alive
+        """
+        if not owner:
+            return False
+        if owner.get("host") != self.owner["host"]:
+            return True
+        # a runner is created once per process, so pipelines of this process's pid are from a process which is gone and
+        # whose pid is reused
+        if owner.get("boot_id") != self.owner["boot_id"] or owner.get("pid") == self.owner["pid"]:
+            return False
+        try:
+            os.kill(owner["pid"], 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            # the process exists, but belongs to another user
+            return True
+        return True
+
+    def create_pool(self) -> ProcessPoolExecutor:
+        # spawning fresh interpreters, as forking the web server's threads is unsafe
+        pool = ProcessPoolExecutor(max_workers=self.n_workers, mp_context=multiprocessing.get_context("spawn"),
+                                   initializer=warm_up)
+        # starting the workers now, so that they are warm when the first pipeline comes
+        for _ in range(self.n_workers):
+            pool.submit(int)
+        return pool
+
+    def submit(self, id: str, name: str, description: str, config: dict, priority: int = 0):
+        self.write(id, {
+            "config": config,
+            "start": {
+                "name": name,
+                "description": description,
+                "start_time": datetime.now().strftime(TIME_FORMAT),
+            },
+            "end": "",
+            "status": "queued",
+            "priority": priority,
+            "owner": self.owner,
+        })
+        with self.condition:
+            heapq.heappush(self.queue, (-priority, next(self.seq), id))
+            self.condition.notify()
+
+    def dispatch(self):
+        while True:
+            with self.condition:
+                while len(self.queue) == 0 or self.n_running >= self.max_concurrency:
+                    self.condition.wait()
+                _, _, id = heapq.heappop(self.queue)
+                self.n_running += 1
+            self.update(id, status="running")
+            try:
+                future = self.pool.submit(execute, self.read(id)["config"], str(self.log_path(id)))
+            except BrokenProcessPool:
+                # a pipeline has crashed a worker (e.g. segfault in a native library), replacing the pool
+                self.logger.error("Worker pool is broken, restarting it")
+                self.pool = self.create_pool()
+                future = self.pool.submit(execute, self.read(id)["config"], str(self.log_path(id)))
+            future.add_done_callback(lambda future, id=id: self.on_done(id, future))
+
+    def on_done(self, id: str, future):
+        try:
+            status, end_time = future.result()
+        except Exception as e:
+            with open(str(self.log_path(id)), "a") as f:
+                f.write(f"Pipeline worker failed: {e}\n")
+            status, end_time = "failed", datetime.now().strftime(TIME_FORMAT)
+        self.update(id, status=status, end=end_time)
+        with self.condition:
+            self.n_running -= 1
+            self.condition.notify()
+
+    def status_path(self, id: str) -> Path:
+        return self.store_dir / f"{id}.json"
+
+    def log_path(self, id: str) -> Path:
+        return self.store_dir / f"{id}.log"
+
+    def read(self, id: str) -> dict:
+        try:
+            with open(str(self.status_path(id)), "r") as f:
+                return ujson.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def write(self, id: str, data: dict):
+        # writing to a temporary file first, so that readers never see a partially written status
+        tmp_path = self.status_path(id).with_suffix(".tmp")
+        with open(str(tmp_path), "w") as f:
+            ujson.dump(data, f)
+        os.replace(str(tmp_path), str(self.status_path(id)))
+
+    def update(self, id: str, **kwargs):
+        with self.condition:
+            data = self.read(id)
+            data.update(kwargs)
+            self.write(id, data)
+
+    def get(self, id: str, with_output: bool = True) -> Optional[dict]:
+        data = self.read(id)
+        if len(data) == 0:
+            return None
+        output = ""
+        if with_output and self.log_path(id).exists():
+            output = self.log_path(id).read_text()
+        start = data.get("start", {})
+        return {
+            "id": id,
+            "name": start.get("name", ""),
+            "description": start.get("description", ""),
+            "start_timestamp": start.get("start_time", ""),
+            "end_timestamp": data.get("end", ""),
+            "config": data.get("config"),
+            "output": output,
+            "status": data.get("status", "unknown"),
+        }
+
+    def list(self) -> List[dict]:
+        ids = sorted((path.stem for path in self.store_dir.glob("*.json")),
+                     key=lambda id: self.status_path(id).stat().st_mtime, reverse=True)
+        return [pipeline for pipeline in (self.get(id, with_output=False) for id in ids) if pipeline is not None]